@@ -0,0 +1,43 @@
+import ipaddress
+import logging
+from functools import lru_cache
+from typing import Tuple
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from rest_framework.permissions import BasePermission
+
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _networks(entries: Tuple[str, ...]):
+    networks = []
+    for entry in entries:
+        try:
+            networks.append(ipaddress.ip_network(entry.strip(), strict=False))
+        except ValueError:
+            logger.warning("Ignoring invalid network %r in INTERNAL_NETWORKS", entry)
+    return tuple(networks)
+
+
+def is_internal_request(request) -> bool:
+    """Whether the client address (REMOTE_ADDR, as the proxy in front of Django sets it) is in INTERNAL_NETWORKS."""
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(address in network for network in _networks(tuple(settings.INTERNAL_NETWORKS)))
+
+
+def has_metrics_token(request) -> bool:
+    token = settings.METRICS_BEARER_TOKEN
+    header = request.headers.get("Authorization", "")
+    return bool(token) and header.startswith("Bearer ") and constant_time_compare(header[len("Bearer "):], token)
+
+
+class MetricsAccess(BasePermission):
+    """Scrapes from INTERNAL_NETWORKS, or anywhere with `Authorization: Bearer <METRICS_BEARER_TOKEN>`."""
+
+    def has_permission(self, request, view):
+        return is_internal_request(request) or has_metrics_token(request)
@@ -1,6 +1,8 @@
 from django.contrib import admin
-from .models import MediaFile, Message
+from .models import MediaFile, Message, ProfileCapture, UploadQuota
 
 
 admin.site.register(MediaFile)
-admin.site.register(Message)
\ No newline at end of file
+admin.site.register(Message)
+admin.site.register(UploadQuota)
+admin.site.register(ProfileCapture)
\ No newline at end of file
@@ -0,0 +1,143 @@
+import logging
+import shutil
+import socket
+import tempfile
+import time
+from datetime import timedelta
+from typing import Optional, Tuple
+from celery import current_app
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, Throttled
+from .models import Backup, UploadQuota
+from .utils import redis_client
+
+
+QUEUE_DEPTH_CACHE_KEY = "admission:queue-depth"
+QUEUE_DEPTH_CACHE_SECONDS = 5
+
+SCRATCH_USAGE_KEY = "admission:worker-scratch"
+# Reports older than this come from workers that stopped and are ignored.
+SCRATCH_REPORT_TTL_SECONDS = 60
+
+# Backups still unprocessed after this long are treated as stuck, not in flight.
+PENDING_WINDOW = timedelta(hours=24)
+
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The server is busy processing other backups, try again later."
+    default_code = "overloaded"
+
+    def __init__(self, detail=None, wait: Optional[int] = None):
+        super().__init__(detail)
+        # DRF's exception handler turns `wait` into a Retry-After header.
+        self.wait = wait
+
+
+def queue_depth() -> int:
+    """Messages waiting on the backup processing queues, cached briefly so a burst doesn't hammer the broker."""
+
+    def measure():
+        depth = 0
+        with current_app.connection_for_read() as connection:
+            connection.ensure_connection(max_retries=1)
+            channel = connection.default_channel
+            for queue in (settings.BACKUP_SMALL_QUEUE, settings.BACKUP_LARGE_QUEUE):
+                depth += channel.queue_declare(queue=queue).message_count
+        return depth
+
+    try:
+        return cache.get_or_set(QUEUE_DEPTH_CACHE_KEY, measure, QUEUE_DEPTH_CACHE_SECONDS)
+    except Exception as e:
+        logger.warning("Could not measure queue depth: %s", e)
+        try:
+            cache.set(QUEUE_DEPTH_CACHE_KEY, 0, QUEUE_DEPTH_CACHE_SECONDS)
+        except Exception:
+            pass
+        return 0
+
+
+def pending_backups(user=None) -> Tuple[int, int]:
+    """(count, bytes) of recent backups that are uploaded or uploading but not processed yet."""
+    queryset = Backup.objects.filter(
+        processed=False, error_message__isnull=True, uploaded_at__gte=timezone.now() - PENDING_WINDOW
+    )
+    if user is not None:
+        queryset = queryset.filter(user=user)
+    totals = queryset.aggregate(count=Count("id"), size=Sum("size_bytes"))
+    return totals["count"], totals["size"] or 0
+
+
+def report_scratch_usage(hostname: Optional[str] = None) -> None:
+    """Publish the used fraction of this worker's temp disk; called from the worker heartbeat."""
+    usage = shutil.disk_usage(tempfile.gettempdir())
+    try:
+        redis_client.hset(SCRATCH_USAGE_KEY, hostname or socket.gethostname(), f"{usage.used / usage.total}:{time.time()}")
+    except Exception as e:
+        logger.warning("Could not report scratch usage: %s", e)
+
+
+def scratch_usage() -> float:
+    """Highest temp disk usage fraction reported by a live worker."""
+    try:
+        reports = redis_client.hgetall(SCRATCH_USAGE_KEY)
+    except Exception as e:
+        logger.warning("Could not read worker scratch usage: %s", e)
+        return 0.0
+
+    cutoff = time.time() - SCRATCH_REPORT_TTL_SECONDS
+    usage = 0.0
+    for value in reports.values():
+        fraction, reported_at = value.decode().split(":")
+        if float(reported_at) >= cutoff:
+            usage = max(usage, float(fraction))
+    return usage
+
+
+def user_limits(user) -> Tuple[int, int]:
+    quota = UploadQuota.objects.filter(user=user).first()
+    max_backups = settings.ADMISSION_USER_MAX_PENDING_BACKUPS
+    max_bytes = settings.ADMISSION_USER_MAX_PENDING_BYTES
+    if quota is not None:
+        max_backups = quota.max_pending_backups if quota.max_pending_backups is not None else max_backups
+        max_bytes = quota.max_pending_bytes if quota.max_pending_bytes is not None else max_bytes
+    return max_backups, max_bytes
+
+
+def declared_size(request) -> int:
+    """Content-Length of the request, 0 when missing or malformed (as Django treats it)."""
+    try:
+        return max(int(request.headers.get("Content-Length") or 0), 0)
+    except ValueError:
+        return 0
+
+
+def check_admission(user, incoming_bytes: int) -> None:
+    """
+    Refuse a new upload of `incoming_bytes` when the user is over their own limits (429)
+    or the processing pipeline is saturated (503). Both carry Retry-After. Byte limits
+    only apply on top of pending work, so a single upload larger than a limit still gets in.
+    """
+    wait = settings.ADMISSION_RETRY_AFTER_SECONDS
+
+    max_backups, max_bytes = user_limits(user)
+    count, size = pending_backups(user)
+    if count >= max_backups:
+        raise Throttled(wait=wait, detail=f"You already have {count} backups waiting to be processed.")
+    if size and size + incoming_bytes > max_bytes:
+        raise Throttled(wait=wait, detail="Too many bytes of your backups are waiting to be processed.")
+
+    if queue_depth() >= settings.ADMISSION_MAX_QUEUE_DEPTH:
+        raise ServiceOverloaded(wait=wait)
+    if scratch_usage() >= settings.ADMISSION_MAX_SCRATCH_USAGE:
+        raise ServiceOverloaded(wait=wait)
+    inflight_bytes = pending_backups()[1]
+    if inflight_bytes and inflight_bytes + incoming_bytes > settings.ADMISSION_MAX_INFLIGHT_BYTES:
+        raise ServiceOverloaded(wait=wait)
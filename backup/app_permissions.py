@@ -0,0 +1,47 @@
+from typing import List, Optional
+from django.db import connection
+
+
+ANDROID_PERMISSION_PREFIX = "android.permission."
+
+
+def normalize_permission(value: str) -> str:
+    value = (value or "").strip()
+    if value and "." not in value:
+        return ANDROID_PERMISSION_PREFIX + value.upper()
+    return value
+
+
+def filter_apps_by_permission(queryset, permission: str):
+    # jsonb @> '["<permission>"]', answered by the jsonb_path_ops GIN index on App.permissions.
+    return queryset.filter(permissions__contains=[normalize_permission(permission)])
+
+
+PERMISSION_HISTOGRAM_SQL = """
+    SELECT p.permission, COUNT(*) AS app_count, COUNT(DISTINCT a.backup_id) AS backup_count
+    FROM backup_app a
+    JOIN backup_backup b ON b.id = a.backup_id
+    CROSS JOIN LATERAL jsonb_array_elements_text(
+        CASE WHEN jsonb_typeof(a.permissions) = 'array' THEN a.permissions ELSE '[]'::jsonb END
+    ) AS p(permission)
+    WHERE b.user_id = %s {backup_filter}
+    GROUP BY p.permission
+    ORDER BY app_count DESC, p.permission
+    LIMIT %s
+"""
+
+
+def permission_histogram(user_id: int, backup_id: Optional[int] = None, limit: int = 500) -> List[dict]:
+    params = [user_id]
+    backup_filter = ""
+    if backup_id is not None:
+        backup_filter = "AND a.backup_id = %s"
+        params.append(backup_id)
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(PERMISSION_HISTOGRAM_SQL.format(backup_filter=backup_filter), params)
+        return [
+            {"permission": permission, "app_count": app_count, "backup_count": backup_count}
+            for permission, app_count, backup_count in cursor.fetchall()
+        ]
@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import pre_delete
+
+
+def _hand_over_rows(sender, instance, **kwargs):
+    # Imported on use, so loading the app does not load the parsing helpers.
+    from .incremental import RECORD_DATASETS, hand_over_rows
+    for model in RECORD_DATASETS:
+        hand_over_rows(instance, model)
 
 
 class BackupConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backup'
+
+    def ready(self):
+        # Later backups of a device can rely on rows an earlier one stored (see backup.incremental).
+        pre_delete.connect(_hand_over_rows, sender='backup.Backup', dispatch_uid='backup.hand_over_rows')
@@ -0,0 +1,152 @@
+import json
+import platform
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from . import storage
+from .models import Backup
+from .parser import apk_parser
+from .profiling import PeakRSS
+from .reparse import PARSERS
+from .synthetic import SyntheticBackup, write_synthetic_ab
+from .utils import BUCKET_NAME, process_ab_file
+
+
+BASELINES_PATH = Path(__file__).with_name("benchmark_baselines.json")
+DEFAULT_TOLERANCE = 0.35
+DEFAULT_REPEAT = 3
+# Stages that ran shorter than this in the baseline are too noisy to compare.
+MIN_COMPARED_SECONDS = 0.5
+
+# Objects each parser reads: (category prefix, name filter), for its MB/s and entries/s.
+PARSER_INPUTS: Dict[str, Tuple[str, Callable[[str], bool]]] = {
+    "photo": ("photos", lambda name: True),
+    "video": ("videos", lambda name: True),
+    "audio": ("audios", lambda name: True),
+    "document": ("documents", lambda name: True),
+    "sms": ("others", lambda name: "sms" in name.lower()),
+    "apk": ("others", lambda name: name.lower().endswith(".apk")),
+    "calllog": ("databases", lambda name: name.lower().endswith((".db", ".sqlite"))),
+    "contacts": ("databases", lambda name: name.lower().endswith((".db", ".sqlite"))),
+}
+# Field of SyntheticBackup holding how many rows a parser should store.
+EXPECTED_ROWS = {
+    "photo": "photos", "video": "videos", "audio": "audios", "document": "documents",
+    "sms": "sms", "apk": "apks", "calllog": "calls", "contacts": "contacts",
+}
+# Higher is better for throughput, lower for memory.
+THROUGHPUT_METRICS = ("mb_per_s", "entries_per_s", "rows_per_s")
+MEMORY_METRICS = ("peak_rss_mib",)
+
+
+def baseline_key(size_mb: int, seed: int) -> str:
+    return f"{size_mb}mb-seed{seed}"
+
+
+def _measure(fn: Callable[[], int], size_bytes: int, entries: int, expected: Optional[int] = None) -> Dict:
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        rows = fn()
+        seconds = time.perf_counter() - started
+    return {
+        "seconds": seconds,
+        "bytes": size_bytes,
+        "entries": entries,
+        "rows": rows,
+        "expected_rows": expected,
+        "mb_per_s": size_bytes / 2**20 / seconds,
+        "entries_per_s": entries / seconds,
+        "rows_per_s": rows / seconds,
+        "peak_rss_mib": rss.peak / 2**20,
+    }
+
+
+def _inputs(backup: Backup, parser: str) -> Tuple[int, int]:
+    category, selects = PARSER_INPUTS[parser]
+    objects = [
+        obj for obj in storage.get_storage().list(BUCKET_NAME, f"{backup.id}/{category}/")
+        if selects(obj.object_name.rsplit("/", 1)[-1])
+    ]
+    return sum(obj.size for obj in objects), len(objects)
+
+
+def _run_once(synthetic: SyntheticBackup, storage_root: Path) -> Dict[str, Dict]:
+    results = {}
+    try:
+        with override_settings(BACKUP_STORAGE_ENGINE="backup.storage.LocalStorage", BACKUP_STORAGE_ROOT=storage_root):
+            storage.get_storage.cache_clear()
+            with transaction.atomic():
+                user, _ = User.objects.get_or_create(username="ingest-benchmark")
+                backup = Backup.objects.create(user=user, original_minio_path=f"benchmark/{synthetic.path.name}")
+
+                process = lambda: sum(process_ab_file(str(synthetic.path), backup.id).values())
+                results["process"] = _measure(process, synthetic.path.stat().st_size, synthetic.files, synthetic.files)
+                for parser, spec in PARSERS.items():
+                    size_bytes, entries = _inputs(backup, parser)
+                    expected = getattr(synthetic, EXPECTED_ROWS[parser])
+                    results[parser] = _measure(lambda: spec.run(backup), size_bytes, entries, expected)
+                transaction.set_rollback(True)
+    finally:
+        storage.get_storage.cache_clear()
+        shutil.rmtree(storage_root, ignore_errors=True)
+    return results
+
+
+def run_benchmark(size_mb: int, seed: int = 0, repeat: int = DEFAULT_REPEAT, work_dir=None) -> Tuple[SyntheticBackup, Dict[str, Dict]]:
+    """
+    Generate a synthetic .ab, then time process_ab_file and every parser on it against
+    the local storage engine in a scratch directory, keeping the fastest of `repeat` runs
+    per stage. Rows go into the configured database inside a transaction that is rolled back.
+    """
+    scratch = Path(tempfile.mkdtemp(prefix="ingest-benchmark-", dir=work_dir))
+    try:
+        synthetic = write_synthetic_ab(scratch / "synthetic.ab", size_mb * 2**20, seed)
+        # Load androguard up front so its multi-second import is not timed as APK parsing.
+        apk_parser._apk_class()
+        runs = [_run_once(synthetic, scratch / f"storage-{i}") for i in range(max(repeat, 1))]
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    # Slower runs of a stage measure other load on the machine, not the code.
+    return synthetic, {stage: min((run[stage] for run in runs), key=lambda r: r["seconds"]) for stage in runs[0]}
+
+
+def load_baselines(path=BASELINES_PATH) -> Dict:
+    path = Path(path)
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def save_baseline(results: Dict[str, Dict], key: str, path=BASELINES_PATH) -> None:
+    baselines = load_baselines(path)
+    baselines[key] = {
+        "recorded_at": timezone.now().isoformat(timespec="seconds"),
+        "machine": f"{platform.platform()}, python {platform.python_version()}",
+        "stages": {
+            stage: {metric: round(values[metric], 3) for metric in ("seconds",) + THROUGHPUT_METRICS + MEMORY_METRICS}
+            for stage, values in results.items()
+        },
+    }
+    Path(path).write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+
+
+def compare(results: Dict[str, Dict], baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[Dict]:
+    """Metrics that got worse than the baseline by more than `tolerance` (a fraction)."""
+    regressions = []
+    for stage, values in results.items():
+        recorded = baseline.get("stages", {}).get(stage, {})
+        if recorded.get("seconds", 0) < MIN_COMPARED_SECONDS:
+            continue
+        for metric in THROUGHPUT_METRICS + MEMORY_METRICS:
+            before = recorded.get(metric)
+            if not before:
+                continue
+            change = values[metric] / before - 1
+            worse = change < -tolerance if metric in THROUGHPUT_METRICS else change > tolerance
+            if worse:
+                regressions.append({"stage": stage, "metric": metric, "baseline": before, "current": values[metric], "change": change})
+    return regressions
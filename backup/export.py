@@ -0,0 +1,89 @@
+import csv
+import json
+import zlib
+from datetime import datetime
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import Message, Contact, CallLog, App, MediaFile
+from .incremental import RECORD_DATASETS, backup_rows
+
+
+EXPORT_CHUNK_SIZE = 2000
+WRITE_BUFFER_SIZE = 64 * 1024
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+EXPORT_DATASETS = {
+    "messages": (Message, ["id", "sender", "receiver", "content", "sent_at", "received_at", "message_type", "status", "created_at"]),
+    "contacts": (Contact, ["id", "name", "phone_number", "email", "group", "address", "created_at"]),
+    "calllogs": (CallLog, ["id", "phone_number", "call_type", "call_date", "duration_seconds", "created_at"]),
+    "apps": (App, ["id", "package_name", "app_name", "version_code", "version_name", "minio_path", "permissions", "created_at"]),
+    "media": (MediaFile, ["id", "file_name", "media_type", "mime_type", "size_bytes", "minio_path", "added_at"]),
+}
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def iter_dataset_rows(backup, dataset: str):
+    model, fields = EXPORT_DATASETS[dataset]
+    queryset = backup_rows(model, backup) if model in RECORD_DATASETS else model.objects.filter(backup=backup)
+    queryset = queryset.order_by("id").values(*fields)
+    return queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _ndjson_lines(rows, fields):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(row) + "\n"
+
+
+def _csv_value(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_lines(rows, fields):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([_csv_value(row[field]) for field in fields])
+
+
+def _buffered(lines):
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        buffer.append(data)
+        size += len(data)
+        if size >= WRITE_BUFFER_SIZE:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def _gzipped(blocks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(backup, dataset: str, export_format: str, gzip: bool = False):
+    _, fields = EXPORT_DATASETS[dataset]
+    rows = iter_dataset_rows(backup, dataset)
+    lines = _csv_lines(rows, fields) if export_format == "csv" else _ndjson_lines(rows, fields)
+    blocks = _buffered(lines)
+    return _gzipped(blocks) if gzip else blocks
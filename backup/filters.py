@@ -0,0 +1,112 @@
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from .serializers import CALL_TYPES
+from .utils import normalize_phone, parse_datetime_flexible
+
+
+MESSAGE_DIRECTIONS = {"incoming", "outgoing"}
+
+
+def _datetime_param(params, name):
+    raw = params.get(name)
+    if not raw:
+        return None
+    value = parse_datetime_flexible(raw)
+    if value is None:
+        raise ValidationError({name: "Expected an ISO 8601 datetime or a unix timestamp."})
+    return value
+
+
+def _int_param(params, name):
+    raw = params.get(name)
+    if raw in (None, ""):
+        return None
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValidationError({name: "Expected an integer."})
+    if value < 0:
+        raise ValidationError({name: "Must be a non-negative integer."})
+    return value
+
+
+class CallLogFilterBackend(BaseFilterBackend):
+    """
+    ?phone=  ?call_type=incoming|outgoing|missed  ?min_duration= ?max_duration=
+    ?date_from= ?date_to=  (served by the (backup, phone_number, call_date) and (backup, call_date) indexes)
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        phone = normalize_phone(params.get("phone"))
+        if phone:
+            queryset = queryset.filter(phone_number=phone)
+
+        call_type = params.get("call_type")
+        if call_type:
+            call_type = call_type.lower()
+            if call_type not in CALL_TYPES:
+                raise ValidationError({"call_type": f"Must be one of {', '.join(sorted(CALL_TYPES))}."})
+            queryset = queryset.filter(call_type=call_type)
+
+        min_duration = _int_param(params, "min_duration")
+        if min_duration is not None:
+            queryset = queryset.filter(duration_seconds__gte=min_duration)
+        max_duration = _int_param(params, "max_duration")
+        if max_duration is not None:
+            queryset = queryset.filter(duration_seconds__lte=max_duration)
+
+        date_from = _datetime_param(params, "date_from")
+        if date_from is not None:
+            queryset = queryset.filter(call_date__gte=date_from)
+        date_to = _datetime_param(params, "date_to")
+        if date_to is not None:
+            queryset = queryset.filter(call_date__lte=date_to)
+
+        return queryset
+
+
+class MessageFilterBackend(BaseFilterBackend):
+    """
+    ?phone=  ?direction=incoming|outgoing  ?sent_from= ?sent_to=  ?received_from= ?received_to=
+    (served by the (backup, sender, sent_at) and (backup, receiver, sent_at) indexes)
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        direction = params.get("direction")
+        if direction:
+            direction = direction.lower()
+            if direction not in MESSAGE_DIRECTIONS:
+                raise ValidationError({"direction": "Must be 'incoming' or 'outgoing'."})
+
+        phone = normalize_phone(params.get("phone"))
+        if phone and direction == "incoming":
+            queryset = queryset.filter(sender=phone)
+        elif phone and direction == "outgoing":
+            queryset = queryset.filter(receiver=phone)
+        elif phone:
+            queryset = queryset.filter(Q(sender=phone) | Q(receiver=phone))
+        elif direction == "incoming":
+            queryset = queryset.filter(sender__isnull=False)
+        elif direction == "outgoing":
+            queryset = queryset.filter(receiver__isnull=False)
+
+        sent_from = _datetime_param(params, "sent_from")
+        if sent_from is not None:
+            queryset = queryset.filter(sent_at__gte=sent_from)
+        sent_to = _datetime_param(params, "sent_to")
+        if sent_to is not None:
+            queryset = queryset.filter(sent_at__lte=sent_to)
+
+        received_from = _datetime_param(params, "received_from")
+        if received_from is not None:
+            queryset = queryset.filter(received_at__gte=received_from)
+        received_to = _datetime_param(params, "received_to")
+        if received_to is not None:
+            queryset = queryset.filter(received_at__lte=received_to)
+
+        return queryset
@@ -0,0 +1,204 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List
+from django.db import connections, router
+from django.db.models import Exists, Min, OuterRef, Q
+from .models import Backup, BackupRecord, CallLog, Contact, Conversation, Message
+from .utils import content_hash, normalize_phone, BULK_INSERT_BATCH_SIZE
+
+
+KNOWN_HASH_BATCH_SIZE = 1000
+
+# BackupRecord.dataset of the rows a backup can share with earlier backups of its device.
+RECORD_DATASETS = {Message: "messages", Contact: "contacts", CallLog: "calllogs"}
+
+
+def _timestamp_key(value) -> str:
+    return str(int(value.timestamp() * 1000)) if value else ""
+
+
+def message_hash(address, received_at, body, outgoing: bool) -> str:
+    return content_hash(normalize_phone(address), _timestamp_key(received_at), body or "", "out" if outgoing else "in")
+
+
+def calllog_hash(data: dict) -> str:
+    return content_hash(
+        normalize_phone(data["phone_number"]), _timestamp_key(data["call_date"]), data["call_type"], data["duration_seconds"]
+    )
+
+
+def contact_hash(data: dict) -> str:
+    return content_hash(data.get("name") or "", normalize_phone(data["phone_number"]), data.get("email") or "")
+
+
+def previous_device_backup_ids(backup: Backup) -> List[int]:
+    """Earlier backups of the same device and user; empty when the backup has no device_id."""
+    if not backup.device_id:
+        return []
+    return list(
+        Backup.objects.filter(user_id=backup.user_id, device_id=backup.device_id, pk__lt=backup.pk)
+        .values_list("id", flat=True)
+    )
+
+
+def _unique(rows: List, key: str) -> List:
+    """`rows` without those repeating the `key` of an earlier row; rows with an empty key are all kept."""
+    unique, seen = [], set()
+    for row in rows:
+        value = getattr(row, key)
+        if value:
+            if value in seen:
+                continue
+            seen.add(value)
+        unique.append(row)
+    return unique
+
+
+def insert_new_rows(model, rows: List, key: str) -> List:
+    """
+    INSERT ... ON CONFLICT DO NOTHING RETURNING id, `key`, so callers count only the rows
+    that were actually stored. Rows repeating the `key` of an earlier row are dropped first;
+    the returned rows have their pk set, the others are left without one. Rows with an
+    empty `key` are outside the unique constraints and always inserted.
+    """
+    unique = _unique(rows, key)
+    keyed = [row for row in unique if getattr(row, key)]
+    unkeyed = [row for row in unique if not getattr(row, key)]
+
+    using = router.db_for_write(model)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    opts = model._meta
+    fields = [field for field in opts.concrete_fields if not field.primary_key]
+    key_field = opts.get_field(key)
+    row_sql = "(" + ", ".join(["%s"] * len(fields)) + ")"
+
+    inserted = []
+    for start in range(0, len(keyed), BULK_INSERT_BATCH_SIZE):
+        batch = keyed[start:start + BULK_INSERT_BATCH_SIZE]
+        sql = "INSERT INTO {} ({}) VALUES {} ON CONFLICT DO NOTHING RETURNING {}, {}".format(
+            quote(opts.db_table),
+            ", ".join(quote(field.column) for field in fields),
+            ", ".join([row_sql] * len(batch)),
+            quote(opts.pk.column),
+            quote(key_field.column),
+        )
+        params = [field.get_db_prep_save(field.pre_save(row, True), connection) for row in batch for field in fields]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            # RETURNING order is unspecified; keys are unique within the batch, so match on them.
+            ids = {row_key: pk for pk, row_key in cursor.fetchall()}
+
+        for row in batch:
+            pk = ids.get(key_field.get_db_prep_save(getattr(row, key), connection))
+            if pk is None:
+                continue
+            row.pk = pk
+            row._state.adding = False
+            row._state.db = using
+            inserted.append(row)
+
+    if unkeyed:
+        inserted += model.objects.using(using).bulk_create(unkeyed, batch_size=BULK_INSERT_BATCH_SIZE)
+    return inserted
+
+
+def stored_row_ids(model, backup: Backup, hashes: Iterable[str]) -> Dict[str, int]:
+    """{hash: row id} of the `hashes` already stored for this backup or an earlier backup of the same device."""
+    backup_ids = previous_device_backup_ids(backup) + [backup.pk]
+    hashes = [h for h in set(hashes) if h]
+
+    stored = {}
+    for start in range(0, len(hashes), KNOWN_HASH_BATCH_SIZE):
+        batch = hashes[start:start + KNOWN_HASH_BATCH_SIZE]
+        rows = (
+            model.objects.filter(content_hash__in=batch, backup_id__in=backup_ids)
+            .order_by("backup_id").values_list("content_hash", "id")
+        )
+        for row_hash, row_id in rows:
+            stored.setdefault(row_hash, row_id)
+    return stored
+
+
+def store_records(model, backup: Backup, rows: List) -> List:
+    """
+    Make the parsed `rows` part of `backup` and return those that were not part of it yet.
+    Rows already stored for an earlier backup of the same device are not stored again; the
+    BackupRecord of this backup points at the stored row instead.
+    """
+    rows = _unique(rows, "content_hash")
+    stored = stored_row_ids(model, backup, (row.content_hash for row in rows))
+    inserted = insert_new_rows(model, [row for row in rows if row.content_hash not in stored], "content_hash")
+    for row in inserted:
+        if row.content_hash:
+            stored[row.content_hash] = row.pk
+
+    # A row lost to a concurrent run of this backup is not in `stored`; that run records it.
+    dataset = RECORD_DATASETS[model]
+    records = [
+        BackupRecord(backup=backup, dataset=dataset, content_hash=row.content_hash, row_id=stored[row.content_hash])
+        for row in rows if row.content_hash in stored
+    ]
+    added = {record.content_hash for record in insert_new_rows(BackupRecord, records, "content_hash")}
+    return [row for row in rows if row.content_hash in added or (not row.content_hash and row.pk is not None)]
+
+
+def backup_rows(model, backup: Backup):
+    """
+    Rows making up `backup`: its own plus those an earlier backup of the same device stored
+    for it. A backup without earlier ones holds all its rows itself.
+    """
+    if not previous_device_backup_ids(backup):
+        return model.objects.filter(backup=backup)
+    records = BackupRecord.objects.filter(backup=backup, dataset=RECORD_DATASETS[model]).values("row_id")
+    return model.objects.filter(Q(backup=backup) | Q(pk__in=records))
+
+
+def conversation_messages(conversation: Conversation):
+    """Messages of a conversation, including those an earlier backup of the device stored."""
+    backup = conversation.backup
+    if not previous_device_backup_ids(backup):
+        return Message.objects.filter(conversation=conversation)
+    return backup_rows(Message, backup).filter(conversation__counterpart=conversation.counterpart)
+
+
+def rows_missing_from(model, backup_id: int, other_backup_id: int):
+    """Rows of `backup_id` whose content hash is not recorded for `other_backup_id` (anti-join on the record index)."""
+    dataset = RECORD_DATASETS[model]
+    missing = (
+        BackupRecord.objects.filter(backup_id=backup_id, dataset=dataset)
+        .filter(~Exists(BackupRecord.objects.filter(backup_id=other_backup_id, dataset=dataset, content_hash=OuterRef("content_hash"))))
+    )
+    return model.objects.filter(pk__in=missing.values("row_id"))
+
+
+def hand_over_rows(backup: Backup, model) -> None:
+    """
+    Give the rows of `backup` that later backups of the device have records for to the
+    earliest of them, so deleting or re-parsing `backup` does not take them along.
+    """
+    owners = (
+        BackupRecord.objects.filter(dataset=RECORD_DATASETS[model], row_id__in=model.objects.filter(backup=backup).values("id"))
+        .exclude(backup=backup)
+        .values("row_id")
+        .annotate(owner=Min("backup_id"))
+    )
+    rows_by_owner = defaultdict(list)
+    for item in owners.iterator():
+        rows_by_owner[item["owner"]].append(item["row_id"])
+
+    for owner, row_ids in rows_by_owner.items():
+        for start in range(0, len(row_ids), BULK_INSERT_BATCH_SIZE):
+            model.objects.filter(pk__in=row_ids[start:start + BULK_INSERT_BATCH_SIZE]).update(backup_id=owner)
+        if model is Message:
+            # Moved messages join the new owner's conversation with the same counterpart.
+            for counterpart, conversation_id in Conversation.objects.filter(backup_id=owner).values_list("counterpart", "id"):
+                Message.objects.filter(
+                    backup_id=owner, conversation__backup=backup, conversation__counterpart=counterpart
+                ).update(conversation_id=conversation_id)
+
+
+def reset_records(backup: Backup, model) -> None:
+    """Drop the `model` rows and records of `backup` before a re-parse, handing over the rows later backups rely on."""
+    hand_over_rows(backup, model)
+    BackupRecord.objects.filter(backup=backup, dataset=RECORD_DATASETS[model]).delete()
+    model.objects.filter(backup=backup).delete()
@@ -0,0 +1,165 @@
+import json
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+import django
+from django.db import connections
+from .models import Backup
+from .serializers import ORIGINAL_BUCKET_NAME, ensure_original_bucket, original_key
+from .tasks import enqueue_backup_processing, process_backup_task
+from .storage import get_storage
+
+
+MANIFEST_NAME = ".ingest-manifest.jsonl"
+REGISTER_BATCH_SIZE = 500
+
+REGISTERED = "registered"
+UPLOADED = "uploaded"
+QUEUED = "queued"
+PROCESSED = "processed"
+
+
+logger = logging.getLogger(__name__)
+
+
+class IngestManifest:
+    """
+    Append-only JSON lines log of the last completed stage of every file, so an
+    interrupted ingest resumes where it stopped instead of registering files twice.
+    Failed uploads stay "registered" and failed processing stays "uploaded", so a re-run retries them.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries: Dict[str, dict] = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line of a killed run
+                    self.entries.setdefault(record["path"], {}).update(record)
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+
+    def get(self, rel_path: str) -> dict:
+        return self.entries.get(rel_path, {})
+
+    def record(self, rel_path: str, **fields) -> None:
+        with self._lock:
+            self.entries.setdefault(rel_path, {"path": rel_path}).update(fields)
+            self._file.write(json.dumps({"path": rel_path, **fields}) + "\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def discover(directory: Path) -> List[str]:
+    return sorted(str(path.relative_to(directory)) for path in directory.rglob("*.ab") if path.is_file())
+
+
+def register_backups(user, directory: Path, rel_paths: Iterable[str], manifest: IngestManifest, device_id: str = "") -> int:
+    """Create Backup rows for files the manifest has not seen yet, REGISTER_BATCH_SIZE per INSERT."""
+    pending = [rel for rel in rel_paths if not manifest.get(rel).get("backup_id")]
+    for start in range(0, len(pending), REGISTER_BATCH_SIZE):
+        batch = pending[start:start + REGISTER_BATCH_SIZE]
+        backups = Backup.objects.bulk_create([
+            Backup(
+                user=user,
+                original_file_name=Path(rel).name,
+                device_id=device_id,
+                size_bytes=(directory / rel).stat().st_size,
+            )
+            for rel in batch
+        ])
+        for backup in backups:
+            backup.original_minio_path = original_key(backup.id, backup.original_file_name)
+        Backup.objects.bulk_update(backups, ["original_minio_path"], batch_size=REGISTER_BATCH_SIZE)
+
+        for rel, backup in zip(batch, backups):
+            manifest.record(rel, backup_id=backup.id, key=backup.original_minio_path, stage=REGISTERED)
+    return len(pending)
+
+
+def _upload(directory: Path, rel_path: str, key: str) -> int:
+    path = directory / rel_path
+    get_storage().put_file(ORIGINAL_BUCKET_NAME, key, path)
+    return path.stat().st_size
+
+
+def upload_originals(directory: Path, rel_paths: List[str], manifest: IngestManifest, workers: int,
+                     progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    """Stream registered files into MinIO on `workers` threads. Returns {"files", "bytes", "failed"}."""
+    ensure_original_bucket()
+    totals = {"files": 0, "bytes": 0, "failed": 0}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_upload, directory, rel, manifest.get(rel)["key"]): rel for rel in rel_paths}
+        for future in as_completed(futures):
+            rel = futures[future]
+            try:
+                size = future.result()
+            except Exception as e:
+                logger.error("Upload of %s failed: %s", rel, e)
+                manifest.record(rel, error=str(e))
+                Backup.objects.filter(pk=manifest.get(rel)["backup_id"]).update(error_message=f"Upload failed: {e}")
+                totals["failed"] += 1
+                size = 0
+            else:
+                if manifest.get(rel).get("error"):
+                    Backup.objects.filter(pk=manifest.get(rel)["backup_id"]).update(error_message=None)
+                manifest.record(rel, stage=UPLOADED, size=size, error=None)
+                totals["files"] += 1
+                totals["bytes"] += size
+            if progress:
+                progress(size, 1)
+    return totals
+
+
+def _init_worker() -> None:
+    django.setup()
+
+
+def _process(backup_id: int) -> dict:
+    return process_backup_task(backup_id)
+
+
+def process_backups(rel_paths: List[str], manifest: IngestManifest, mode: str, workers: int,
+                    progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    """
+    Drive processing of uploaded files: "celery" enqueues them on the size-based queues,
+    "pool" runs process_backup_task on `workers` local processes. Returns {"done", "failed"}.
+    """
+    totals = {"done": 0, "failed": 0}
+
+    if mode == "celery":
+        for rel in rel_paths:
+            enqueue_backup_processing(manifest.get(rel)["backup_id"], manifest.get(rel)["size"])
+            manifest.record(rel, stage=QUEUED)
+            totals["done"] += 1
+            if progress:
+                progress(0, 1)
+        return totals
+
+    # Forked workers must not share the parent's database connections.
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(_process, manifest.get(rel)["backup_id"]): rel for rel in rel_paths}
+        for future in as_completed(futures):
+            rel = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"status": "error", "error": str(e)}
+            if result.get("status") == "success":
+                manifest.record(rel, stage=PROCESSED, error=None)
+                totals["done"] += 1
+            else:
+                manifest.record(rel, error=result.get("error"))
+                totals["failed"] += 1
+            if progress:
+                progress(0, 1)
+    return totals
@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from .utils import redis_client
+
+
+LEASE_KEY_PREFIX = "lease"
+RESULT_KEY_PREFIX = "lease-result"
+
+# A lease expires this long after its holder's last heartbeat, e.g. when the worker was killed.
+LEASE_TTL_SECONDS = 60
+HEARTBEAT_SECONDS = LEASE_TTL_SECONDS / 3
+# How long a duplicate request waits for the running job before giving up with 409.
+ATTACH_TIMEOUT_SECONDS = 10 * 60
+ATTACH_POLL_SECONDS = 1
+# How long a finished job's result stays available to requests that attached to it.
+RESULT_TTL_SECONDS = 10 * 60
+# Retry-After sent to a request that found its job already running and did not wait for it.
+RUNNING_RETRY_AFTER_SECONDS = 10
+
+PROCESS_STAGE = "process"
+
+
+logger = logging.getLogger(__name__)
+
+
+# A lease held for the same non-empty job (a retry of a Celery task keeps its id) is taken over.
+_ACQUIRE = redis_client.register_script("""
+if redis.call('EXISTS', KEYS[1]) == 1 and (ARGV[2] == '' or redis.call('HGET', KEYS[1], 'job') ~= ARGV[2]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'token', ARGV[1], 'job', ARGV[2], 'started_at', ARGV[3])
+redis.call('PEXPIRE', KEYS[1], ARGV[4])
+return 1
+""")
+
+_RENEW = redis_client.register_script("""
+if redis.call('HGET', KEYS[1], 'token') == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+""")
+
+_RELEASE = redis_client.register_script("""
+if redis.call('HGET', KEYS[1], 'token') == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+
+class JobInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "This backup is already being processed by another request, try again later."
+    default_code = "job_in_progress"
+
+    def __init__(self, detail=None, wait: Optional[int] = None):
+        super().__init__(detail)
+        self.wait = wait
+
+
+class JobRunning(JobInProgress):
+    """The same job is running elsewhere; answered with 202, the running job's id and Retry-After."""
+    status_code = status.HTTP_202_ACCEPTED
+    default_detail = "This job is already running, check back later."
+    default_code = "job_running"
+
+    def __init__(self, job: str, wait: int = RUNNING_RETRY_AFTER_SECONDS):
+        super().__init__({"status": "running", "job": job, "detail": self.default_detail}, wait)
+
+
+class JobFailed(RuntimeError):
+    """The run a duplicate attached to failed; the message is the holder's error."""
+
+
+class Lease:
+    """
+    Redis lease on one (backup, stage). The holder renews it from a heartbeat thread,
+    so it outlives slow jobs but expires LEASE_TTL_SECONDS after the holder dies.
+    """
+
+    def __init__(self, backup_id, stage: str, job: str = ""):
+        self.key = f"{LEASE_KEY_PREFIX}:{backup_id}:{stage}"
+        self.token = uuid.uuid4().hex
+        self.job = job
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def acquire(self) -> bool:
+        acquired = bool(_ACQUIRE(
+            keys=[self.key], args=[self.token, self.job, time.time(), LEASE_TTL_SECONDS * 1000]
+        ))
+        if acquired:
+            self._heartbeat = threading.Thread(target=self._renew, name=f"heartbeat {self.key}", daemon=True)
+            self._heartbeat.start()
+        return acquired
+
+    def _renew(self) -> None:
+        while not self._stop.wait(HEARTBEAT_SECONDS):
+            try:
+                if not _RENEW(keys=[self.key], args=[self.token, LEASE_TTL_SECONDS * 1000]):
+                    logger.warning("Lost lease %s; another run may start", self.key)
+                    return
+            except Exception as e:
+                logger.warning("Could not renew lease %s: %s", self.key, e)
+
+    def _stop_heartbeat(self) -> None:
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+
+    def hand_over(self, seconds: float) -> None:
+        """
+        Stop renewing but keep the lease for `seconds` (plus the usual TTL), so a retry of
+        the same job can take it over while duplicates still find the job running.
+        """
+        self._stop_heartbeat()
+        try:
+            _RENEW(keys=[self.key], args=[self.token, int((seconds + LEASE_TTL_SECONDS) * 1000)])
+        except Exception as e:
+            logger.warning("Could not extend lease %s: %s", self.key, e)
+
+    def release(self) -> None:
+        self._stop_heartbeat()
+        try:
+            _RELEASE(keys=[self.key], args=[self.token])
+        except Exception as e:
+            logger.warning("Could not release lease %s: %s", self.key, e)
+
+    def holder(self) -> Optional[dict]:
+        """{"token", "job", "started_at"} of the current holder, or None when the lease is free."""
+        values = redis_client.hgetall(self.key)
+        return {k.decode(): v.decode() for k, v in values.items()} or None
+
+
+def parse_stage(parser: str) -> str:
+    return f"parse:{parser}"
+
+
+def current_job(backup_id, stage: str) -> Optional[str]:
+    """Job id (e.g. Celery task id) recorded by whoever holds the (backup, stage) lease."""
+    try:
+        holder = Lease(backup_id, stage).holder()
+    except Exception as e:
+        logger.warning("Could not read lease of backup %s (%s): %s", backup_id, stage, e)
+        return None
+    return holder.get("job") if holder else None
+
+
+def _result_key(lease: Lease, token: str) -> str:
+    return f"{RESULT_KEY_PREFIX}:{lease.key}:{token}"
+
+
+def run_exclusive(backup_id, stage: str, fn: Callable, timeout: float = ATTACH_TIMEOUT_SECONDS, job: str = "", attach: bool = True):
+    """
+    Run `fn` unless the same (backup, stage) is already running, in which case wait for
+    that run and return its result instead of doing the work twice (JobFailed if it failed,
+    JobInProgress after `timeout` seconds). With attach=False a running job raises JobRunning
+    at once instead. Runs unlocked if Redis is unreachable.
+    """
+    lease = Lease(backup_id, stage, job)
+    deadline = time.monotonic() + timeout
+
+    while True:
+        try:
+            acquired = lease.acquire()
+            holder = None if acquired else lease.holder()
+        except Exception as e:
+            logger.warning("Lease for backup %s (%s) unavailable, running unlocked: %s", backup_id, stage, e)
+            return fn()
+
+        if acquired:
+            try:
+                result = fn()
+            except Exception as e:
+                cache.set(_result_key(lease, lease.token), {"error": str(e)}, RESULT_TTL_SECONDS)
+                raise
+            else:
+                cache.set(_result_key(lease, lease.token), {"result": result}, RESULT_TTL_SECONDS)
+                return result
+            finally:
+                lease.release()
+
+        if holder is None:
+            continue  # released between our two calls
+        if not attach:
+            raise JobRunning(holder.get("job", ""))
+
+        # Attach: wait for the running job to finish, then hand back its outcome.
+        while (lease.holder() or {}).get("token") == holder["token"]:
+            if time.monotonic() >= deadline:
+                raise JobInProgress(wait=LEASE_TTL_SECONDS)
+            time.sleep(ATTACH_POLL_SECONDS)
+
+        outcome = cache.get(_result_key(lease, holder["token"]))
+        if outcome is None:
+            continue  # the holder died without finishing; try to take over
+        if "error" in outcome:
+            raise JobFailed(outcome["error"])
+        return outcome["result"]
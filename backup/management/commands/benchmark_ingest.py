@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from backup.benchmark import BASELINES_PATH, DEFAULT_REPEAT, DEFAULT_TOLERANCE, baseline_key, compare, load_baselines, run_benchmark, save_baseline
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic .ab and time process_ab_file and every parser on it: MB/s, entries/s, "
+        "rows/s and peak memory, compared against the stored baseline for the same size and seed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size-mb", type=int, default=64, help="Uncompressed size of the synthetic backup (default 64).")
+        parser.add_argument("--seed", type=int, default=0, help="Generator seed; the same size and seed give the same archive.")
+        parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                            help=f"Runs per stage; the fastest is reported (default {DEFAULT_REPEAT}).")
+        parser.add_argument("--baselines", default=str(BASELINES_PATH), help="Baselines file (default: the one in the repo).")
+        parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline instead of comparing.")
+        parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                            help=f"Allowed slowdown or memory growth as a fraction (default {DEFAULT_TOLERANCE}).")
+        parser.add_argument("--work-dir", help="Directory for the archive and storage scratch files (default: system temp).")
+
+    def handle(self, *args, **options):
+        key = baseline_key(options["size_mb"], options["seed"])
+        synthetic, results = run_benchmark(options["size_mb"], options["seed"], options["repeat"], options["work_dir"])
+        self.stdout.write(
+            f"{key}: {synthetic.files} files, {synthetic.size_bytes / 2**20:.1f} MiB uncompressed, "
+            f"{results['process']['bytes'] / 2**20:.1f} MiB archive"
+        )
+
+        baseline = load_baselines(options["baselines"]).get(key, {})
+        self.stdout.write(
+            f"{'stage':<10} {'seconds':>8} {'MB/s':>9} {'entries/s':>10} {'rows':>7} {'expected':>8} {'rows/s':>9} "
+            f"{'peak MiB':>9} {'vs base':>8}"
+        )
+        for stage, r in results.items():
+            recorded = baseline.get("stages", {}).get(stage, {})
+            metric = "mb_per_s" if stage == "process" else "rows_per_s"
+            versus = f"{r[metric] / recorded[metric] - 1:+.0%}" if recorded.get(metric) else "-"
+            expected = "-" if r["expected_rows"] is None else r["expected_rows"]
+            self.stdout.write(
+                f"{stage:<10} {r['seconds']:>8.2f} {r['mb_per_s']:>9.1f} {r['entries_per_s']:>10.1f} {r['rows']:>7} "
+                f"{expected:>8} {r['rows_per_s']:>9.1f} {r['peak_rss_mib']:>9.1f} {versus:>8}"
+            )
+
+        if options["save_baseline"]:
+            save_baseline(results, key, options["baselines"])
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline {key} to {options['baselines']}."))
+            return
+        if not baseline:
+            self.stdout.write(f"No baseline for {key}; run with --save-baseline to record one.")
+            return
+
+        regressions = compare(results, baseline, options["tolerance"])
+        for r in regressions:
+            self.stdout.write(
+                self.style.ERROR(f"{r['stage']} {r['metric']}: {r['current']:.3g} vs baseline {r['baseline']:.3g} ({r['change']:+.0%})")
+            )
+        if regressions:
+            raise CommandError(f"{len(regressions)} metric(s) regressed beyond {options['tolerance']:.0%} of baseline {key}.")
+        self.stdout.write(self.style.SUCCESS(f"Within {options['tolerance']:.0%} of baseline {key} ({baseline['recorded_at']})."))
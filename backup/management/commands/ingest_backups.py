@@ -0,0 +1,119 @@
+import os
+import time
+from pathlib import Path
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from backup.ingest import (
+    MANIFEST_NAME, PROCESSED, QUEUED, REGISTERED, UPLOADED, IngestManifest, discover, process_backups, register_backups, upload_originals,
+)
+
+
+DEFAULT_UPLOAD_WORKERS = 8
+PROCESSING_MODES = ("celery", "pool", "none")
+
+
+class Progress:
+    """Single-line progress bar redrawn in place on the command's stdout."""
+
+    width = 30
+
+    def __init__(self, stdout, label: str, total: int):
+        self.stdout = stdout
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+
+    def __call__(self, size: int, count: int) -> None:
+        self.done += count
+        self.bytes += size
+        filled = int(self.width * self.done / self.total) if self.total else self.width
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        rate = f"{self.done / elapsed:.1f} files/s"
+        if self.bytes:
+            rate += f", {self.bytes / elapsed / 2**20:.1f} MiB/s"
+        self.stdout.write(
+            f"\r{self.label:<10} [{'#' * filled}{'.' * (self.width - filled)}] {self.done}/{self.total} ({rate})",
+            ending="",
+        )
+        self.stdout.flush()
+
+    def finish(self) -> float:
+        self.stdout.write("")
+        return time.monotonic() - self.started
+
+
+class Command(BaseCommand):
+    help = "Register every .ab file under a directory as a backup, upload the originals to MinIO and process them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Directory searched recursively for .ab files.")
+        parser.add_argument("--user", required=True, help="Username that will own the backups.")
+        parser.add_argument("--device-id", default="", help="Device id set on every registered backup.")
+        parser.add_argument("--manifest", help=f"Resume manifest path (default <directory>/{MANIFEST_NAME}).")
+        parser.add_argument("--upload-workers", type=int, default=DEFAULT_UPLOAD_WORKERS,
+                            help=f"Parallel uploads to MinIO (default {DEFAULT_UPLOAD_WORKERS}).")
+        parser.add_argument("--processing", choices=PROCESSING_MODES, default="celery",
+                            help="Enqueue processing on Celery (default), run it in a local process pool, or skip it.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Processes used by --processing pool (default: CPU count).")
+
+    def handle(self, *args, **options):
+        directory = Path(options["directory"]).resolve()
+        if not directory.is_dir():
+            raise CommandError(f"{directory} is not a directory.")
+        if options["upload_workers"] < 1 or options["workers"] < 1:
+            raise CommandError("--upload-workers and --workers must be at least 1.")
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist.")
+
+        manifest = IngestManifest(options["manifest"] or directory / MANIFEST_NAME)
+        try:
+            self._ingest(directory, user, manifest, options)
+        finally:
+            manifest.close()
+
+    def _ingest(self, directory, user, manifest, options):
+        files = discover(directory)
+        self.stdout.write(f"Found {len(files)} .ab files in {directory}")
+
+        started = time.monotonic()
+        registered = register_backups(user, directory, files, manifest, options["device_id"])
+        self.stdout.write(f"Registered {registered} new backups in {time.monotonic() - started:.1f}s")
+
+        finished = sum(1 for rel in files if manifest.get(rel).get("stage") in (QUEUED, PROCESSED))
+        to_upload = [rel for rel in files if manifest.get(rel).get("stage") == REGISTERED]
+        upload_totals = {"files": 0, "bytes": 0, "failed": 0}
+        upload_seconds = 0.0
+        if to_upload:
+            progress = Progress(self.stdout, "Uploading", len(to_upload))
+            upload_totals = upload_originals(directory, to_upload, manifest, options["upload_workers"], progress)
+            upload_seconds = progress.finish()
+
+        to_process = [rel for rel in files if manifest.get(rel).get("stage") == UPLOADED]
+        process_totals = {"done": 0, "failed": 0}
+        process_seconds = 0.0
+        if to_process and options["processing"] != "none":
+            label = "Queueing" if options["processing"] == "celery" else "Processing"
+            progress = Progress(self.stdout, label, len(to_process))
+            process_totals = process_backups(to_process, manifest, options["processing"], options["workers"], progress)
+            process_seconds = progress.finish()
+
+        self.stdout.write(
+            f"Upload: {upload_totals['files']} files, {upload_totals['bytes'] / 2**20:.1f} MiB in {upload_seconds:.1f}s"
+            f" ({upload_totals['bytes'] / max(upload_seconds, 1e-6) / 2**20:.1f} MiB/s), {upload_totals['failed']} failed"
+        )
+        if options["processing"] != "none":
+            self.stdout.write(
+                f"Processing ({options['processing']}): {process_totals['done']} backups in {process_seconds:.1f}s"
+                f" ({process_totals['done'] / max(process_seconds, 1e-6):.2f}/s), {process_totals['failed']} failed"
+            )
+        self.stdout.write(f"Already done in an earlier run: {finished}")
+
+        if upload_totals["failed"] or process_totals["failed"]:
+            self.stdout.write(self.style.WARNING("Some files failed; run the command again to retry them."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Ingest complete."))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from backup.reparse import PARSERS, find_stale, reparse_backup, shard
+from backup.tasks import reparse_backups_task
+
+
+DEFAULT_SHARDS = 4
+
+
+class Command(BaseCommand):
+    help = "Re-run parsers whose recorded version is older than the current one, sharded across Celery workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--parser", action="append", choices=sorted(PARSERS), dest="parsers",
+                            help="Only these parsers (repeatable). Defaults to all.")
+        parser.add_argument("--backup", action="append", type=int, dest="backup_ids",
+                            help="Only these backup ids (repeatable).")
+        parser.add_argument("--force", action="store_true",
+                            help="Re-parse even when the recorded version is current.")
+        parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS,
+                            help="Number of Celery tasks to split the work into, i.e. the most backups "
+                                 f"re-parsed at once (default {DEFAULT_SHARDS}).")
+        parser.add_argument("--sync", action="store_true",
+                            help="Run in this process instead of queueing Celery tasks.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only list what would be re-parsed.")
+
+    def handle(self, *args, **options):
+        if options["shards"] < 1:
+            raise CommandError("--shards must be at least 1.")
+
+        parsers = options["parsers"] or list(PARSERS)
+        jobs = find_stale(parsers, options["backup_ids"], force=options["force"])
+        if not jobs:
+            self.stdout.write("Nothing to re-parse.")
+            return
+
+        for backup_id, names in jobs.items():
+            self.stdout.write(f"Backup {backup_id}: {', '.join(names)}")
+        if options["dry_run"]:
+            self.stdout.write(f"{len(jobs)} backups would be re-parsed.")
+            return
+
+        if options["sync"]:
+            for backup_id, names in jobs.items():
+                counts = reparse_backup(backup_id, names)
+                self.stdout.write(f"Backup {backup_id} re-parsed: {counts}")
+            return
+
+        shards = shard(jobs, options["shards"])
+        for jobs_shard in shards:
+            result = reparse_backups_task.delay(jobs_shard)
+            self.stdout.write(f"Queued {len(jobs_shard)} backups as task {result.id}")
+        self.stdout.write(self.style.SUCCESS(f"{len(jobs)} backups queued in {len(shards)} shards."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from backup.request_profiling import reset_report, slow_endpoint_report
+
+
+class Command(BaseCommand):
+    help = "Show per-endpoint query, serializer and storage totals of profiled requests, slowest first."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=20, help="Number of endpoints to show (default 20).")
+        parser.add_argument("--reset", action="store_true", help="Clear the collected totals afterwards.")
+
+    def handle(self, *args, **options):
+        rows = slow_endpoint_report()[:options["top"]]
+        if not rows:
+            self.stdout.write("No profiled requests yet. Set REQUEST_PROFILING or send X-Profile-Request: 1.")
+        else:
+            self.stdout.write(
+                f"{'endpoint':<50} {'reqs':>6} {'slow':>5} {'avg ms':>8} {'queries':>8} {'sql ms':>8} "
+                f"{'ser ms':>8} {'storage':>8} {'stor ms':>8}"
+            )
+            for row in rows:
+                n = row["requests"]
+                self.stdout.write(
+                    f"{row['endpoint']:<50} {n:>6.0f} {row['slow']:>5.0f} {row['total_ms'] / n:>8.1f} "
+                    f"{row['sql_queries'] / n:>8.1f} {row['sql_ms'] / n:>8.1f} {row['serializer_ms'] / n:>8.1f} "
+                    f"{row['storage_calls'] / n:>8.1f} {row['storage_ms'] / n:>8.1f}"
+                )
+            self.stdout.write("Columns after 'slow' are averages per request.")
+
+        if options["reset"]:
+            reset_report()
@@ -0,0 +1,145 @@
+import io
+import logging
+import posixpath
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .storage import get_storage
+
+
+BUCKET_NAME = "backups"
+
+ZIP_FETCH_CONCURRENCY = 4
+ZIP_READ_SIZE = 256 * 1024
+# Bodies fetched ahead are kept in memory up to this size each, and spooled to a temporary file beyond it.
+ZIP_SPOOL_MEMORY_BYTES = 8 * 2**20
+
+
+logger = logging.getLogger(__name__)
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, non-seekable buffer that zipfile writes into and the response generator drains."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _archive_name(media, used: set) -> str:
+    """Object path below the backup id, with " (n)" added before the extension if already in the archive."""
+    name = media.minio_path.split("/", 1)[-1].lstrip("/")
+    stem, ext = posixpath.splitext(name)
+    candidate, n = name, 1
+    while candidate in used:
+        candidate = f"{stem} ({n}){ext}"
+        n += 1
+    used.add(candidate)
+    return candidate
+
+
+def _zip_info(media, name: str) -> zipfile.ZipInfo:
+    date_time = media.added_at.timetuple()[:6] if media.added_at else (1980, 1, 1, 0, 0, 0)
+    if date_time[0] < 1980:
+        date_time = (1980, 1, 1, 0, 0, 0)
+    info = zipfile.ZipInfo(name, date_time=date_time)
+    info.compress_type = zipfile.ZIP_STORED
+    return info
+
+
+def _fetch(object_name: str):
+    """Download the whole object on a pool thread, so bodies transfer while earlier entries are written."""
+    spool = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MEMORY_BYTES)
+    try:
+        body = get_storage().open(BUCKET_NAME, object_name)
+        try:
+            for chunk in body.stream(ZIP_READ_SIZE):
+                spool.write(chunk)
+        finally:
+            _release(body)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def _release(response) -> None:
+    try:
+        response.close()
+    except Exception:
+        pass
+
+
+def _release_future(future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        _release(future.result())
+
+
+def stream_media_zip(media_files):
+    """
+    Yield a zip64 archive of the given MediaFile rows, built on the fly.
+
+    Up to ZIP_FETCH_CONCURRENCY objects after the one being written are downloaded
+    in full on a thread pool (see _fetch), bounding what is held ahead of the client.
+    """
+    sink = _ZipSink()
+    media_iter = iter(media_files)
+    pending = deque()
+    names = set()
+
+    with ThreadPoolExecutor(max_workers=ZIP_FETCH_CONCURRENCY) as pool:
+
+        def fill():
+            while len(pending) < ZIP_FETCH_CONCURRENCY:
+                media = next(media_iter, None)
+                if media is None:
+                    return
+                pending.append((media, pool.submit(_fetch, media.minio_path)))
+
+        try:
+            with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+                fill()
+                while pending:
+                    media, future = pending.popleft()
+                    fill()
+                    try:
+                        body = future.result()
+                    except Exception as e:
+                        logger.error("Skipping %s in media archive: %s", media.minio_path, e)
+                        continue
+
+                    try:
+                        with archive.open(_zip_info(media, _archive_name(media, names)), mode="w", force_zip64=True) as entry:
+                            for chunk in iter(lambda: body.read(ZIP_READ_SIZE), b""):
+                                entry.write(chunk)
+                                data = sink.drain()
+                                if data:
+                                    yield data
+                    finally:
+                        _release(body)
+
+                    data = sink.drain()
+                    if data:
+                        yield data
+        finally:
+            for _, future in pending:
+                if not future.cancel():
+                    future.add_done_callback(_release_future)
+
+    data = sink.drain()
+    if data:
+        yield data
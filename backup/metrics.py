@@ -0,0 +1,190 @@
+import functools
+import logging
+import math
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+from redis import RedisError
+
+
+# Every worker and web process adds into one Redis hash, so /metrics shows the totals of all of them.
+METRICS_KEY = "metrics"
+
+DURATION_BUCKETS = (0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600, math.inf)
+BYTES_PER_SECOND_BUCKETS = (1e5, 1e6, 1e7, 5e7, 1e8, 2.5e8, 5e8, 1e9, math.inf)
+ENTRIES_PER_SECOND_BUCKETS = (1, 10, 100, 1000, 10000, 100000, math.inf)
+
+HISTOGRAMS = {
+    "backup_stage_duration_seconds": ("Time spent in one run of a processing or parsing stage.", DURATION_BUCKETS),
+    "backup_stage_bytes_per_second": ("Bytes handled per second by one run of a stage.", BYTES_PER_SECOND_BUCKETS),
+    "backup_stage_entries_per_second": ("Files or records handled per second by one run of a stage.", ENTRIES_PER_SECOND_BUCKETS),
+}
+COUNTERS = {
+    "backup_stage_runs_total": "Completed runs of a stage.",
+    "backup_stage_bytes_total": "Bytes handled by a stage.",
+    "backup_stage_entries_total": "Files or records handled by a stage.",
+    "backup_rows_inserted_total": "Rows a parser inserted.",
+    "backup_failures_total": "Failures by stage and category.",
+}
+UP_METRIC = "backup_metrics_up"
+
+
+logger = logging.getLogger(__name__)
+
+
+def _redis():
+    # Imported on use: utils records metrics itself, so importing it here at load time would be circular.
+    from .utils import redis_client
+    return redis_client
+
+
+def _field(metric: str, labels: Dict[str, str], suffix: str = "") -> str:
+    return "|".join([metric + suffix] + [f"{k}={v}" for k, v in sorted(labels.items())])
+
+
+def _write(increments: Dict[str, float]) -> None:
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        for field, amount in increments.items():
+            pipe.hincrbyfloat(METRICS_KEY, field, amount)
+        pipe.execute()
+    except RedisError as e:
+        # Metrics are best effort; a Redis outage must not fail the task or request being measured.
+        logger.warning("Could not record metrics: %s", e)
+
+
+def _observe(increments: Dict[str, float], metric: str, labels: Dict[str, str], value: float) -> None:
+    # Untouched buckets are incremented by 0 so every label set exposes the full bucket list.
+    for bound in HISTOGRAMS[metric][1]:
+        increments[_field(metric, {**labels, "le": _format(bound)}, "_bucket")] = 1 if value <= bound else 0
+    increments[_field(metric, labels, "_count")] = 1
+    increments[_field(metric, labels, "_sum")] = value
+
+
+def inc(metric: str, amount: float = 1, **labels) -> None:
+    if amount:
+        _write({_field(metric, labels): amount})
+
+
+def record_failure(stage: str, category: str, amount: int = 1) -> None:
+    inc("backup_failures_total", amount, stage=stage, category=category)
+
+
+def record_rows(parser: str, rows: int) -> None:
+    inc("backup_rows_inserted_total", rows, parser=parser)
+
+
+class StageTimer:
+    """
+    Times one run of a stage. Set `bytes` and `entries` inside the block to also get
+    throughput; an exception escaping the block counts as a failure of its class.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.bytes: Optional[int] = None
+        self.entries: Optional[int] = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        labels = {"stage": self.stage}
+        increments = {}
+        if exc_type is not None:
+            increments[_field("backup_failures_total", {**labels, "category": exc_type.__name__})] = 1
+        else:
+            increments[_field("backup_stage_runs_total", labels)] = 1
+            _observe(increments, "backup_stage_duration_seconds", labels, elapsed)
+            if self.bytes is not None:
+                increments[_field("backup_stage_bytes_total", labels)] = self.bytes
+                if elapsed > 0:
+                    _observe(increments, "backup_stage_bytes_per_second", labels, self.bytes / elapsed)
+            if self.entries is not None:
+                increments[_field("backup_stage_entries_total", labels)] = self.entries
+                if elapsed > 0:
+                    _observe(increments, "backup_stage_entries_per_second", labels, self.entries / elapsed)
+        _write(increments)
+        return False
+
+
+def timed_stage(stage):
+    """
+    Decorator form of StageTimer. `stage` is a name or a function of the call's arguments;
+    an int (or sized) return value is recorded as the number of entries handled.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with StageTimer(stage(*args, **kwargs) if callable(stage) else stage) as timer:
+                result = fn(*args, **kwargs)
+                if isinstance(result, int):
+                    timer.entries = result
+                elif hasattr(result, "__len__"):
+                    timer.entries = len(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def _parse_field(field: str):
+    name, *pairs = field.split("|")
+    return name, dict(pair.split("=", 1) for pair in pairs)
+
+
+def _labels_text(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in sorted(labels.items())
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def render() -> str:
+    """
+    All recorded metrics in the Prometheus text exposition format. Without Redis only
+    `backup_metrics_up 0` is reported, so the scrape still succeeds.
+    """
+    try:
+        recorded = _redis().hgetall(METRICS_KEY)
+    except RedisError as e:
+        logger.warning("Could not read metrics: %s", e)
+        recorded = None
+
+    samples = defaultdict(list)
+    for field, value in (recorded or {}).items():
+        name, labels = _parse_field(field.decode())
+        samples[name].append((labels, float(value)))
+
+    lines = [
+        f"# HELP {UP_METRIC} Whether the recorded metrics could be read.",
+        f"# TYPE {UP_METRIC} gauge",
+        f"{UP_METRIC} {0 if recorded is None else 1}",
+    ]
+    for metric, (doc, _) in HISTOGRAMS.items():
+        lines += [f"# HELP {metric} {doc}", f"# TYPE {metric} histogram"]
+        for suffix in ("_bucket", "_sum", "_count"):
+            for labels, value in sorted(samples[metric + suffix], key=_sample_order):
+                lines.append(f"{metric}{suffix}{_labels_text(labels)} {_format(value)}")
+    for metric, doc in COUNTERS.items():
+        lines += [f"# HELP {metric} {doc}", f"# TYPE {metric} counter"]
+        for labels, value in sorted(samples[metric], key=_sample_order):
+            lines.append(f"{metric}{_labels_text(labels)} {_format(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _sample_order(sample):
+    labels, _ = sample
+    le = labels.get("le")
+    bound = math.inf if le == "+Inf" else float(le) if le is not None else 0
+    return sorted((k, v) for k, v in labels.items() if k != "le"), bound
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup', '0003_remove_backup_original_file_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counterpart', models.CharField(max_length=255)),
+                ('message_count', models.IntegerField(default=0)),
+                ('first_message_at', models.DateTimeField(blank=True, null=True)),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('last_snippet', models.CharField(blank=True, default='', max_length=255)),
+                ('backup', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to='backup.backup')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='conversation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='messages', to='backup.conversation'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', '-received_at', '-id'], name='message_conversation_recv_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['backup', '-last_message_at', '-id'], name='conversation_backup_last_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('backup', 'counterpart'), name='uniq_conversation_backup_counterpart'),
+        ),
+    ]
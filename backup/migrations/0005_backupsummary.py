@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup', '0004_conversation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupSummary',
+            fields=[
+                ('backup', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='backup.backup')),
+                ('message_count', models.IntegerField(default=0)),
+                ('contact_count', models.IntegerField(default=0)),
+                ('call_count', models.IntegerField(default=0)),
+                ('app_count', models.IntegerField(default=0)),
+                ('media_count', models.IntegerField(default=0)),
+                ('total_bytes', models.BigIntegerField(default=0)),
+                ('media_type_counts', models.JSONField(default=dict)),
+                ('call_type_counts', models.JSONField(default=dict)),
+                ('monthly_counts', models.JSONField(default=dict)),
+                ('interaction_counts', models.JSONField(default=dict)),
+                ('top_contacts', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup', '0005_backupsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backup',
+            name='data_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
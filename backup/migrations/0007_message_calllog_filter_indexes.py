@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup', '0006_backup_data_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calllog',
+            index=models.Index(fields=['backup', 'phone_number', 'call_date'], name='calllog_backup_phone_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calllog',
+            index=models.Index(fields=['backup', 'call_date'], name='calllog_backup_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['backup', 'sender', 'sent_at'], name='message_backup_sender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['backup', 'receiver', 'sent_at'], name='message_backup_receiver_idx'),
+        ),
+    ]
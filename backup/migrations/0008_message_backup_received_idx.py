@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup', '0007_message_calllog_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['backup', 'received_at', 'id'], name='message_backup_received_idx'),
+        ),
+    ]
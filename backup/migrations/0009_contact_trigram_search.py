@@ -0,0 +1,56 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:39
+
+import re
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+from django.db.models.functions import Upper
+
+
+def phone_search_key(value):
+    # Frozen copy of backup.utils.phone_search_key at the time of this migration.
+    digits = re.sub(r"\D", "", str(value or ""))
+    if digits.startswith("0098"):
+        digits = digits[2:]
+    if digits.startswith("98"):
+        return digits[2:]
+    return digits.lstrip("0")
+
+
+def fill_phone_search(apps, schema_editor):
+    Contact = apps.get_model('backup', 'Contact')
+    batch = []
+    for contact in Contact.objects.only('id', 'phone_number').iterator(chunk_size=2000):
+        contact.phone_search = phone_search_key(contact.phone_number)
+        batch.append(contact)
+        if len(batch) >= 2000:
+            Contact.objects.bulk_update(batch, ['phone_search'])
+            batch = []
+    if batch:
+        Contact.objects.bulk_update(batch, ['phone_search'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup', '0008_message_backup_received_idx'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='contact',
+            name='phone_search',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.RunPython(fill_phone_search, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='contact',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(Upper('name'), name='gin_trgm_ops'), name='contact_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['phone_search'], name='contact_phone_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:41
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup', '0009_contact_trigram_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='app',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['permissions'], name='app_permissions_gin_idx', opclasses=['jsonb_path_ops']),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup', '0010_app_permissions_gin_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backup',
+            name='device_id',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='calllog',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddIndex(
+            model_name='calllog',
+            index=models.Index(fields=['content_hash', 'backup'], name='calllog_hash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['content_hash', 'backup'], name='contact_hash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['content_hash', 'backup'], name='message_hash_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:43
+
+from django.db import migrations, models
+
+
+DEDUPLICATE_SQL = [
+    "DELETE FROM backup_mediafile a USING backup_mediafile b "
+    "WHERE a.backup_id = b.backup_id AND a.minio_path = b.minio_path AND a.id > b.id",
+    "DELETE FROM backup_app a USING backup_app b "
+    "WHERE a.backup_id = b.backup_id AND a.minio_path = b.minio_path AND a.id > b.id",
+    "DELETE FROM backup_message a USING backup_message b "
+    "WHERE a.backup_id = b.backup_id AND a.content_hash = b.content_hash AND a.content_hash <> '' AND a.id > b.id",
+    "DELETE FROM backup_calllog a USING backup_calllog b "
+    "WHERE a.backup_id = b.backup_id AND a.content_hash = b.content_hash AND a.content_hash <> '' AND a.id > b.id",
+    "DELETE FROM backup_contact a USING backup_contact b "
+    "WHERE a.backup_id = b.backup_id AND a.content_hash = b.content_hash AND a.content_hash <> '' AND a.id > b.id",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup', '0011_incremental_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DEDUPLICATE_SQL, migrations.RunSQL.noop),
+        migrations.RemoveIndex(
+            model_name='calllog',
+            name='calllog_hash_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='contact',
+            name='contact_hash_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_hash_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='app',
+            constraint=models.UniqueConstraint(fields=('backup', 'minio_path'), name='uniq_app_backup_path'),
+        ),
+        migrations.AddConstraint(
+            model_name='calllog',
+            constraint=models.UniqueConstraint(condition=models.Q(('content_hash', ''), _negated=True), fields=('backup', 'content_hash'), name='uniq_calllog_backup_hash'),
+        ),
+        migrations.AddConstraint(
+            model_name='contact',
+            constraint=models.UniqueConstraint(condition=models.Q(('content_hash', ''), _negated=True), fields=('backup', 'content_hash'), name='uniq_contact_backup_hash'),
+        ),
+        migrations.AddConstraint(
+            model_name='mediafile',
+            constraint=models.UniqueConstraint(fields=('backup', 'minio_path'), name='uniq_mediafile_backup_path'),
+        ),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(condition=models.Q(('content_hash', ''), _negated=True), fields=('backup', 'content_hash'), name='uniq_message_backup_hash'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def record_existing_runs(apps, schema_editor):
+    """Rows parsed before parsers were versioned are recorded as version 0, so `reparse` picks them up."""
+    ParserRun = apps.get_model('backup', 'ParserRun')
+    counts = {}
+
+    MediaFile = apps.get_model('backup', 'MediaFile')
+    for row in MediaFile.objects.values('backup_id', 'media_type').annotate(n=Count('id')):
+        if row['media_type']:
+            counts[(row['backup_id'], row['media_type'])] = row['n']
+
+    for model_name, parser in (('Message', 'sms'), ('App', 'apk'), ('CallLog', 'calllog'), ('Contact', 'contacts')):
+        model = apps.get_model('backup', model_name)
+        for row in model.objects.values('backup_id').annotate(n=Count('id')):
+            counts[(row['backup_id'], parser)] = row['n']
+
+    ParserRun.objects.bulk_create(
+        [ParserRun(backup_id=backup_id, parser=parser, version=0, row_count=n) for (backup_id, parser), n in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup', '0012_natural_key_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParserRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parser', models.CharField(max_length=50)),
+                ('version', models.PositiveIntegerField()),
+                ('parsed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('backup', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parser_runs', to='backup.backup')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['parser', 'version'], name='parserrun_parser_version_idx')],
+                'constraints': [models.UniqueConstraint(fields=('backup', 'parser'), name='uniq_parserrun_backup_parser')],
+            },
+        ),
+        migrations.RunPython(record_existing_runs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup', '0014_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backup',
+            name='size_bytes',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
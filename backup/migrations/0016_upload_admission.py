@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('backup', '0015_backup_size'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadQuota',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='upload_quota', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('max_pending_backups', models.PositiveIntegerField(blank=True, null=True)),
+                ('max_pending_bytes', models.BigIntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='backup',
+            index=models.Index(condition=models.Q(('error_message__isnull', True), ('processed', False)), fields=['user', 'uploaded_at'], name='backup_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup', '0016_upload_admission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backup',
+            name='profile',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ProfileCapture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(max_length=50)),
+                ('job', models.CharField(blank=True, default='', max_length=255)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('duration_seconds', models.FloatField()),
+                ('peak_rss_bytes', models.BigIntegerField(default=0)),
+                ('profile_path', models.CharField(max_length=512)),
+                ('report_path', models.CharField(max_length=512)),
+                ('backup', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='profiles', to='backup.backup')),
+            ],
+        ),
+    ]
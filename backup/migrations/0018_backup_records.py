@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Rows already stored are part of the backup that stored them.
+FILL_RECORDS_SQL = [
+    f"INSERT INTO backup_backuprecord (backup_id, dataset, content_hash, row_id) "
+    f"SELECT backup_id, '{dataset}', content_hash, id FROM {table} WHERE content_hash <> ''"
+    for dataset, table in (("messages", "backup_message"), ("contacts", "backup_contact"), ("calllogs", "backup_calllog"))
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup', '0017_profile_captures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dataset', models.CharField(choices=[('messages', 'Messages'), ('contacts', 'Contacts'), ('calllogs', 'Call logs')], max_length=20)),
+                ('content_hash', models.CharField(max_length=40)),
+                ('row_id', models.BigIntegerField()),
+                ('backup', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='records', to='backup.backup')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dataset', 'row_id'], name='backuprecord_row_idx')],
+                'constraints': [models.UniqueConstraint(fields=('backup', 'dataset', 'content_hash'), name='uniq_backuprecord_backup_hash')],
+            },
+        ),
+        migrations.RunSQL(FILL_RECORDS_SQL, migrations.RunSQL.noop),
+    ]
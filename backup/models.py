@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
 from django.contrib.auth.models import User
 from django.utils import timezone
 import os
@@ -7,9 +9,23 @@ class Backup(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     original_minio_path = models.CharField(max_length=512)
     original_file_name = models.CharField(max_length=255, blank=True)
+    device_id = models.CharField(max_length=255, blank=True, default="", db_index=True)
+    size_bytes = models.BigIntegerField(default=0)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     error_message = models.TextField(blank=True, null=True)
     processed = models.BooleanField(default=False)
+    data_version = models.PositiveIntegerField(default=0)
+    # Run every processing and parse job of this backup under the profiler (see backup.profiling).
+    profile = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'uploaded_at'],
+                condition=models.Q(processed=False, error_message__isnull=True),
+                name='backup_pending_idx',
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         if self.original_minio_path and not self.original_file_name:
@@ -25,14 +41,46 @@ class Contact(models.Model):
     backup = models.ForeignKey(Backup, on_delete=models.CASCADE, related_name='contacts')
     name = models.CharField(max_length=255)
     phone_number = models.CharField(max_length=50)
+    phone_search = models.CharField(max_length=50, blank=True, default="")
+    content_hash = models.CharField(max_length=40, blank=True, default="")
     email = models.EmailField(blank=True, null=True)
     group = models.CharField(max_length=255, blank=True, null=True)
     address = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='contact_name_trgm_idx'),
+            GinIndex(fields=['phone_search'], opclasses=['gin_trgm_ops'], name='contact_phone_trgm_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['backup', 'content_hash'], condition=~models.Q(content_hash=''), name='uniq_contact_backup_hash'),
+        ]
+
+
+class Conversation(models.Model):
+    backup = models.ForeignKey(Backup, on_delete=models.CASCADE, related_name='conversations')
+    counterpart = models.CharField(max_length=255)
+    message_count = models.IntegerField(default=0)
+    first_message_at = models.DateTimeField(blank=True, null=True)
+    last_message_at = models.DateTimeField(blank=True, null=True)
+    last_snippet = models.CharField(max_length=255, blank=True, default="")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['backup', 'counterpart'], name='uniq_conversation_backup_counterpart'),
+        ]
+        indexes = [
+            models.Index(fields=['backup', '-last_message_at', '-id'], name='conversation_backup_last_idx'),
+        ]
+
+    def __str__(self):
+        return f"Conversation {self.counterpart} ({self.message_count})"
+
 
 class Message(models.Model):
     backup = models.ForeignKey(Backup, on_delete=models.CASCADE, related_name='messages')
+    conversation = models.ForeignKey(Conversation, on_delete=models.SET_NULL, related_name='messages', blank=True, null=True)
     external_id = models.CharField(max_length=255, blank=True, null=True)
     sender = models.CharField(max_length=255, blank=True, null=True)
     receiver = models.CharField(max_length=255, blank=True, null=True)
@@ -41,8 +89,20 @@ class Message(models.Model):
     received_at = models.DateTimeField(blank=True, null=True)
     message_type = models.CharField(max_length=20, choices=[('sms', 'SMS'), ('mms', 'MMS')], blank=True, null=True)
     status = models.CharField(max_length=20, blank=True, null=True)
+    content_hash = models.CharField(max_length=40, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['conversation', '-received_at', '-id'], name='message_conversation_recv_idx'),
+            models.Index(fields=['backup', 'sender', 'sent_at'], name='message_backup_sender_idx'),
+            models.Index(fields=['backup', 'receiver', 'sent_at'], name='message_backup_receiver_idx'),
+            models.Index(fields=['backup', 'received_at', 'id'], name='message_backup_received_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['backup', 'content_hash'], condition=~models.Q(content_hash=''), name='uniq_message_backup_hash'),
+        ]
+
 
 class CallLog(models.Model):
     backup = models.ForeignKey(Backup, on_delete=models.CASCADE, related_name='call_logs')
@@ -50,8 +110,36 @@ class CallLog(models.Model):
     call_type = models.CharField(max_length=20, choices=[('incoming', 'Incoming'), ('outgoing', 'Outgoing'), ('missed', 'Missed')])
     call_date = models.DateTimeField(blank=True, null=True)
     duration_seconds = models.IntegerField(default=0)
+    content_hash = models.CharField(max_length=40, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['backup', 'phone_number', 'call_date'], name='calllog_backup_phone_date_idx'),
+            models.Index(fields=['backup', 'call_date'], name='calllog_backup_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['backup', 'content_hash'], condition=~models.Q(content_hash=''), name='uniq_calllog_backup_hash'),
+        ]
+
+
+class BackupRecord(models.Model):
+    """A message, contact or call that is part of a backup; the row holding it may belong to an earlier backup of the same device."""
+    DATASET_CHOICES = [('messages', 'Messages'), ('contacts', 'Contacts'), ('calllogs', 'Call logs')]
+
+    backup = models.ForeignKey(Backup, on_delete=models.CASCADE, related_name='records')
+    dataset = models.CharField(max_length=20, choices=DATASET_CHOICES)
+    content_hash = models.CharField(max_length=40)
+    row_id = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['backup', 'dataset', 'content_hash'], name='uniq_backuprecord_backup_hash'),
+        ]
+        indexes = [
+            models.Index(fields=['dataset', 'row_id'], name='backuprecord_row_idx'),
+        ]
+
 
 class App(models.Model):
     backup = models.ForeignKey(Backup, on_delete=models.CASCADE, related_name='apps')
@@ -65,6 +153,14 @@ class App(models.Model):
     installed_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=['permissions'], opclasses=['jsonb_path_ops'], name='app_permissions_gin_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['backup', 'minio_path'], name='uniq_app_backup_path'),
+        ]
+
     def __str__(self):
         return f"{self.app_name or self.package_name} ({self.version_name})"
 
@@ -82,6 +178,101 @@ class MediaFile(models.Model):
     added_at = models.DateTimeField(default=timezone.now)
     minio_path = models.CharField(max_length=500, blank=True, null=True)  
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['backup', 'minio_path'], name='uniq_mediafile_backup_path'),
+        ]
+
+
+
+class BackupSummary(models.Model):
+    backup = models.OneToOneField(Backup, on_delete=models.CASCADE, related_name='summary', primary_key=True)
+    message_count = models.IntegerField(default=0)
+    contact_count = models.IntegerField(default=0)
+    call_count = models.IntegerField(default=0)
+    app_count = models.IntegerField(default=0)
+    media_count = models.IntegerField(default=0)
+    total_bytes = models.BigIntegerField(default=0)
+    media_type_counts = models.JSONField(default=dict)
+    call_type_counts = models.JSONField(default=dict)
+    monthly_counts = models.JSONField(default=dict)
+    interaction_counts = models.JSONField(default=dict)
+    top_contacts = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Summary of backup {self.backup_id}"
+
+
+
+class UploadQuota(models.Model):
+    """Per-user overrides of the ADMISSION_USER_* upload limits; empty fields use the defaults."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='upload_quota', primary_key=True)
+    max_pending_backups = models.PositiveIntegerField(blank=True, null=True)
+    max_pending_bytes = models.BigIntegerField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Upload quota of {self.user.username}"
+
+
+
+class UploadSession(models.Model):
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('completed', 'Completed'),
+        ('aborted', 'Aborted'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    backup = models.OneToOneField(Backup, on_delete=models.CASCADE, related_name='upload_session')
+    object_key = models.CharField(max_length=512)
+    upload_id = models.CharField(max_length=255)
+    file_name = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    part_size = models.BigIntegerField()
+    part_count = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Upload session {self.id} ({self.status}) for backup {self.backup_id}"
+
+
+
+class ProfileCapture(models.Model):
+    backup = models.ForeignKey(Backup, on_delete=models.CASCADE, related_name='profiles')
+    stage = models.CharField(max_length=50)
+    job = models.CharField(max_length=255, blank=True, default="")
+    started_at = models.DateTimeField(default=timezone.now)
+    duration_seconds = models.FloatField()
+    peak_rss_bytes = models.BigIntegerField(default=0)
+    profile_path = models.CharField(max_length=512)
+    report_path = models.CharField(max_length=512)
+
+    def __str__(self):
+        return f"Profile of {self.stage} on backup {self.backup_id}"
+
+
+
+class ParserRun(models.Model):
+    backup = models.ForeignKey(Backup, on_delete=models.CASCADE, related_name='parser_runs')
+    parser = models.CharField(max_length=50)
+    version = models.PositiveIntegerField()
+    parsed_at = models.DateTimeField(default=timezone.now)
+    row_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['backup', 'parser'], name='uniq_parserrun_backup_parser'),
+        ]
+        indexes = [
+            models.Index(fields=['parser', 'version'], name='parserrun_parser_version_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.parser} v{self.version} on backup {self.backup_id}"
+
 
 
 class SystemSetting(models.Model):
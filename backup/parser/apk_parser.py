@@ -1,55 +1,73 @@
 from ..serializers import AppParserSerializer
-from ..models import Backup
+from ..models import App, Backup
+import functools
 import logging
 import tempfile
-from androguard.core.apk import APK
-from ..utils import minio_client
+from ..storage import get_storage
+from ..summary import SummaryDelta
+from ..response_cache import bump_data_version
+from ..incremental import insert_new_rows
+from ..parser_runs import record_parser_run
+from ..metrics import record_failure, timed_stage
 
 
 BUCKET_NAME = "backups"
 
-
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+PARSER_NAME = "apk"
+PARSER_VERSION = 1
 
 
-logging.getLogger("androguard").setLevel(logging.WARNING)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.getLogger("minio").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
 
 
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
+@functools.lru_cache(maxsize=None)
+def _apk_class():
+    """androguard takes seconds to import, so it is loaded (and its logging set up) on the first APK parse."""
+    logger.setLevel(logging.INFO)
+    logging.getLogger("androguard").setLevel(logging.WARNING)
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+    logging.getLogger("minio").setLevel(logging.WARNING)
 
-formatter = logging.Formatter("%(levelname)s - %(message)s")
-console_handler.setFormatter(formatter)
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(logging.Formatter("%(levelname)s - %(message)s"))
+    if not logger.handlers:
+        logger.addHandler(console_handler)
 
-if not logger.handlers:
-    logger.addHandler(console_handler)
+    from androguard.core.apk import APK
+    return APK
 
 
+@timed_stage(f"parse:{PARSER_NAME}")
 def parse_apks_with_minio(backup_instance: Backup):
+    APK = _apk_class()
     parsed_count = 0
     processed_count = 0
     failed_count = 0
+    delta = SummaryDelta()
 
     prefix = f"{backup_instance.id}/others/"
-    objects = minio_client.list_objects(BUCKET_NAME, prefix=prefix, recursive=True)
+    objects = get_storage().list(BUCKET_NAME, prefix)
+    stored = set(
+        App.objects.filter(backup=backup_instance, minio_path__startswith=prefix).values_list("minio_path", flat=True)
+    )
+    skipped_count = 0
 
     for obj in objects:
         file_name = obj.object_name.split("/")[-1]
         if not file_name.lower().endswith(".apk"):
             continue
+        if obj.object_name in stored:
+            skipped_count += 1
+            continue
 
         processed_count += 1
 
         try:
-            response = minio_client.get_object(BUCKET_NAME, obj.object_name)
-            apk_binary = response.read()
-            response.close()
-            response.release_conn()
+            apk_binary = get_storage().get(BUCKET_NAME, obj.object_name)
         except Exception as e:
             logger.error(f"[DOWNLOAD FAILED] {obj.object_name}: {e}")
+            record_failure(f"parse:{PARSER_NAME}", "read")
             failed_count += 1
             continue
 
@@ -82,19 +100,30 @@ def parse_apks_with_minio(backup_instance: Backup):
                 )
 
                 if serializer.is_valid():
-                    serializer.save()
-                    parsed_count += 1
+                    app = App(**serializer.validated_data)
+                    if insert_new_rows(App, [app], "minio_path"):
+                        delta.add_app(app)
+                        parsed_count += 1
+                    else:
+                        skipped_count += 1
                 else:
                     logger.warning(f"[SERIALIZER INVALID] {file_name}: {serializer.errors}")
                     failed_count += 1
 
             except Exception as e:
                 logger.error(f"[APK PARSE FAILED] {file_name}: {e}")
+                record_failure(f"parse:{PARSER_NAME}", "invalid_apk")
                 failed_count += 1
 
+    delta.apply(backup_instance)
+    record_parser_run(backup_instance, PARSER_NAME, PARSER_VERSION, parsed_count)
+    if parsed_count:
+        bump_data_version(backup_instance.id)
+
     logger.info(
         f"Processed APKs: {processed_count}, "
         f"Successfully Parsed: {parsed_count}, "
+        f"Already Stored: {skipped_count}, "
         f"Failed: {failed_count}"
     )
     return parsed_count
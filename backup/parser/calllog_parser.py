@@ -1,14 +1,23 @@
-from ..models import Backup
+from ..models import Backup, CallLog
 from ..serializers import CallLogParserSerializer
 from datetime import datetime, timezone as dt_timezone
 import sqlite3
 import tempfile
 import re
 from typing import Dict, Iterable, List, Optional
-from ..utils import minio_client, normalize_phone, parse_datetime_flexible, pick_first
+from ..utils import normalize_phone, parse_datetime_flexible, pick_first
+from ..storage import get_storage
+from ..metrics import record_failure, timed_stage
+from ..summary import SummaryDelta
+from ..response_cache import bump_data_version
+from ..incremental import calllog_hash, store_records
+from ..parser_runs import record_parser_run
 
 BUCKET_NAME = "backups"
 
+PARSER_NAME = "calllog"
+PARSER_VERSION = 1
+
 CALLLOG_PHONE_KEYS = {"phone_number", "number", "mobile", "tel", "msisdn"}
 CALLLOG_TYPE_KEYS = {"call_type", "type", "direction"}
 CALLLOG_DATE_KEYS = {"call_date", "date", "timestamp", "time", "created_at"}
@@ -61,23 +70,22 @@ def _extract_calllog_row(row: Dict[str, object]) -> Optional[Dict[str, object]]:
     }
 
 
+@timed_stage(f"parse:{PARSER_NAME}")
 def scan_and_extract_calllogs_minio(backup: Backup) -> List[Dict]:
     prefix = f"{backup.id}/databases/"
     calls: List[Dict] = []
     seen_calls = set()
 
-    objects = minio_client.list_objects(BUCKET_NAME, prefix=prefix, recursive=True)
+    objects = get_storage().list(BUCKET_NAME, prefix)
 
     for obj in objects:
         if not obj.object_name.lower().endswith((".db", ".sqlite")):
             continue
 
         try:
-            response = minio_client.get_object(BUCKET_NAME, obj.object_name)
-            file_bytes = response.read()
-            response.close()
-            response.release_conn()
+            file_bytes = get_storage().get(BUCKET_NAME, obj.object_name)
         except Exception:
+            record_failure(f"parse:{PARSER_NAME}", "read")
             continue
 
         with tempfile.NamedTemporaryFile(delete=False, suffix=".db") as tmp_file:
@@ -112,11 +120,10 @@ def scan_and_extract_calllogs_minio(backup: Backup) -> List[Dict]:
                     if not data:
                         continue
                     data["backup"] = backup.id
-                    ts = int(data["call_date"].timestamp()) if data["call_date"] else 0
-                    key = (data["phone_number"], ts, data["call_type"], data["duration_seconds"])
-                    if key in seen_calls:
+                    data["content_hash"] = calllog_hash(data)
+                    if data["content_hash"] in seen_calls:
                         continue
-                    seen_calls.add(key)
+                    seen_calls.add(data["content_hash"])
                     calls.append(data)
 
         finally:
@@ -128,8 +135,17 @@ def scan_and_extract_calllogs_minio(backup: Backup) -> List[Dict]:
     return calls
 
 
+@timed_stage(f"store:{PARSER_NAME}")
 def store_calllogs(backup: Backup, calls: List[Dict]) -> int:
     serializer = CallLogParserSerializer(data=calls, many=True)
     serializer.is_valid(raise_exception=True)
-    serializer.save(backup=backup)
-    return len(serializer.data)
+    rows = store_records(CallLog, backup, [CallLog(**{**item, "backup": backup}) for item in serializer.validated_data])
+
+    delta = SummaryDelta()
+    for call in rows:
+        delta.add_call(call)
+    delta.apply(backup)
+    record_parser_run(backup, PARSER_NAME, PARSER_VERSION, len(rows))
+    if rows:
+        bump_data_version(backup.id)
+    return len(rows)
@@ -4,14 +4,23 @@ import sqlite3
 import re
 from typing import Dict, Iterable, List, Optional
 from ..serializers import ContactParserSerializer
-from ..models import Backup
+from ..models import Backup, Contact
 import tempfile
 import logging
-from ..utils import minio_client, normalize_phone, parse_datetime_flexible, pick_first
+from ..utils import normalize_phone, parse_datetime_flexible, pick_first, phone_search_key
+from ..storage import get_storage
+from ..metrics import record_failure, timed_stage
+from ..summary import SummaryDelta
+from ..response_cache import bump_data_version
+from ..incremental import contact_hash, store_records
+from ..parser_runs import record_parser_run
 
 
 BUCKET_NAME = "backups"
 
+PARSER_NAME = "contacts"
+PARSER_VERSION = 1
+
 logger = logging.getLogger(__name__)
 
 CONTACT_NAME_KEYS = {"name", "display_name", "full_name", "given_name", "first_name"}
@@ -38,6 +47,7 @@ def _extract_contact_row(row: Dict[str, object]) -> Optional[Dict[str, object]]:
     return {
         "name": pick_first(row, CONTACT_NAME_KEYS) or "",
         "phone_number": phone,
+        "phone_search": phone_search_key(phone),
         "email": pick_first(row, EMAIL_KEYS),
         "group": pick_first(row, GROUP_KEYS),
         "address": pick_first(row, ADDRESS_KEYS),
@@ -45,13 +55,14 @@ def _extract_contact_row(row: Dict[str, object]) -> Optional[Dict[str, object]]:
     }
 
 
+@timed_stage(f"parse:{PARSER_NAME}")
 def scan_and_extract_contacts_minio(backup_instance: Backup) -> List[Dict]:
     prefix = f"{backup_instance.id}/databases/"
     contacts = []
     seen_contacts = set()
 
     logger.info("[*] Scanning Minio for contacts in prefix:", prefix)
-    objects = minio_client.list_objects(BUCKET_NAME, prefix=prefix, recursive=True)
+    objects = get_storage().list(BUCKET_NAME, prefix)
 
     for obj in objects:
         logger.info("[+] Found object: %s (size:%s)",obj.object_name, obj.size)
@@ -61,13 +72,11 @@ def scan_and_extract_contacts_minio(backup_instance: Backup) -> List[Dict]:
             continue
 
         try:
-            response = minio_client.get_object(BUCKET_NAME, obj.object_name)
-            file_bytes = response.read()
-            response.close()
-            response.release_conn()
+            file_bytes = get_storage().get(BUCKET_NAME, obj.object_name)
             logger.info("[+] Successfully read %s bytes from %s", len(file_bytes), obj.object_name)
         except Exception as e:
             logger.error("[!] Error reading object %s from Minio: %s", obj.object_name, e)
+            record_failure(f"parse:{PARSER_NAME}", "read")
             continue
 
         with tempfile.NamedTemporaryFile(delete=False, suffix=".db") as tmp_file:
@@ -102,10 +111,10 @@ def scan_and_extract_contacts_minio(backup_instance: Backup) -> List[Dict]:
                     if not data:
                         continue
                     data["backup"] = backup_instance.id
-                    key = (data["name"], data["phone_number"])
-                    if key in seen_contacts:
+                    data["content_hash"] = contact_hash(data)
+                    if data["content_hash"] in seen_contacts:
                         continue
-                    seen_contacts.add(key)
+                    seen_contacts.add(data["content_hash"])
                     contacts.append(data)
 
         except Exception as e:
@@ -121,8 +130,17 @@ def scan_and_extract_contacts_minio(backup_instance: Backup) -> List[Dict]:
     return contacts
 
 
+@timed_stage(f"store:{PARSER_NAME}")
 def store_contacts(backup: Backup, contacts: List[Dict]) -> int:
     serializer = ContactParserSerializer(data=contacts, many=True)
     serializer.is_valid(raise_exception=True)
-    serializer.save(backup=backup)
-    return len(serializer.data)
+    rows = store_records(Contact, backup, [Contact(**{**item, "backup": backup}) for item in serializer.validated_data])
+
+    delta = SummaryDelta()
+    for contact in rows:
+        delta.add_contact(contact)
+    delta.apply(backup)
+    record_parser_run(backup, PARSER_NAME, PARSER_VERSION, len(rows))
+    if rows:
+        bump_data_version(backup.id)
+    return len(rows)
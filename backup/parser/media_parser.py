@@ -1,9 +1,14 @@
 import mimetypes
 import re
 from django.utils import timezone
-from ..models import Backup
+from ..models import Backup, MediaFile
 from ..serializers import MediaParserSerializer
-from ..utils import minio_client
+from ..incremental import insert_new_rows
+from ..storage import get_storage
+from ..summary import SummaryDelta
+from ..response_cache import bump_data_version
+from ..parser_runs import record_parser_run
+from ..metrics import record_failure, timed_stage
 import logging
 
 INVALID_CHARS = r'[<>:"/\\|?*]'
@@ -13,6 +18,9 @@ DOCUMENT_EXTENSIONS = {".pdf", ".doc", ".docx", ".txt", ".rtf", ".odt"}
 
 BUCKET_NAME = "backups"   
 
+# Shared by the photo, video, audio and document parsers, which are recorded under their media type.
+PARSER_VERSION = 1
+
 
 logger = logging.getLogger(__name__)
 
@@ -25,13 +33,20 @@ def sanitize_and_truncate_filename(file_name: str, max_length: int = 100) -> str
     return safe_name + dot + ext if ext else safe_name
 
 
+@timed_stage(lambda backup_instance, media_type_filter: f"parse:{media_type_filter}")
 def parse_media_type_minio(backup_instance: Backup, media_type_filter: str) -> int:
-    parsed_count = 0
+    delta = SummaryDelta()
 
     prefix = f"{backup_instance.id}/{media_type_filter}s/"
-    objects = minio_client.list_objects(BUCKET_NAME, prefix=prefix, recursive=True)
+    objects = get_storage().list(BUCKET_NAME, prefix)
+    stored = set(
+        MediaFile.objects.filter(backup=backup_instance, minio_path__startswith=prefix).values_list("minio_path", flat=True)
+    )
+    batch = []
 
     for obj in objects:
+        if obj.object_name in stored:
+            continue
         try:
             file_name = obj.object_name.split("/")[-1]
             if not file_name:
@@ -66,12 +81,21 @@ def parse_media_type_minio(backup_instance: Backup, media_type_filter: str) -> i
             )
 
             if serializer.is_valid():
-                serializer.save()
-                parsed_count += 1
+                batch.append(MediaFile(**serializer.validated_data))
             else:
                 logger.error("Validation failed for %s : %s", file_name, serializer.errors)
+                record_failure(f"parse:{media_type_filter}", "invalid")
 
         except Exception as e:
             logger.error("Error processing %s : %s", obj.object_name, e)
-    return parsed_count
+            record_failure(f"parse:{media_type_filter}", "error")
+
+    inserted = insert_new_rows(MediaFile, batch, "minio_path")
+    for media in inserted:
+        delta.add_media(media)
+    delta.apply(backup_instance)
+    record_parser_run(backup_instance, media_type_filter, PARSER_VERSION, len(inserted))
+    if inserted:
+        bump_data_version(backup_instance.id)
+    return len(inserted)
 
@@ -4,13 +4,25 @@ import json
 import zlib
 from ..serializers import MessageParserSerializer
 from django.utils.timezone import make_aware, get_default_timezone
-from ..models import Backup
+from ..models import Backup, Conversation, Message
 import logging 
-from ..utils import minio_client
+from ..utils import normalize_phone, BULK_INSERT_BATCH_SIZE
+from ..storage import get_storage
+from ..summary import SummaryDelta
+from ..response_cache import bump_data_version
+from ..incremental import message_hash, store_records
+from ..parser_runs import record_parser_run
+from ..metrics import record_failure, timed_stage
 
 
 BUCKET_NAME = "backups"
 
+PARSER_NAME = "sms"
+# Bump whenever a change to this module would store different rows for the same backup.
+PARSER_VERSION = 1
+
+SNIPPET_LENGTH = 255
+
 
 logger = logging.getLogger(__name__)
 
@@ -26,21 +38,61 @@ def convert_timestamp(ts):
         return None
 
 
+def _sms_hash(sms) -> str:
+    if not isinstance(sms, dict):
+        return ""
+    return message_hash(sms.get("address"), convert_timestamp(sms.get("date")), sms.get("body"), sms.get("type") != "1")
+
+
+def _stored_conversations(backup_instance: Backup, counterparts) -> dict:
+    stored = Conversation.objects.filter(backup=backup_instance, counterpart__in=counterparts)
+    return {conversation.counterpart: conversation for conversation in stored}
+
+
+def _load_conversations(backup_instance: Backup, counterparts, conversations: dict) -> None:
+    """Add the conversations of `counterparts` missing from `conversations`, creating the new ones in one INSERT."""
+    missing = set(counterparts) - conversations.keys()
+    if missing:
+        conversations.update(_stored_conversations(backup_instance, missing))
+        missing -= conversations.keys()
+    if missing:
+        Conversation.objects.bulk_create(
+            [Conversation(backup=backup_instance, counterpart=counterpart) for counterpart in missing],
+            batch_size=BULK_INSERT_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        conversations.update(_stored_conversations(backup_instance, missing))
+
+
+def _apply_message_to_conversation(conversation: Conversation, message) -> None:
+    message_at = message.received_at or message.sent_at
+    conversation.message_count += 1
+    if message_at is None:
+        return
+    if conversation.first_message_at is None or message_at < conversation.first_message_at:
+        conversation.first_message_at = message_at
+    if conversation.last_message_at is None or message_at >= conversation.last_message_at:
+        conversation.last_message_at = message_at
+        conversation.last_snippet = (message.content or "")[:SNIPPET_LENGTH]
+
+
+@timed_stage(f"parse:{PARSER_NAME}")
 def parse_and_save_sms_minio(backup_instance: Backup):
     prefix = f"{backup_instance.id}/others/"
-    objects = minio_client.list_objects(BUCKET_NAME, prefix=prefix, recursive=True)
+    objects = get_storage().list(BUCKET_NAME, prefix)
     
     count = 0
+    seen = set()
+    conversations = {}
+    changed = {}
+    delta = SummaryDelta()
     for obj in objects:
         
         if "sms" not in obj.object_name.lower():
             continue
         
         try:
-            response = minio_client.get_object(BUCKET_NAME, obj.object_name)
-            compressed_data = response.read()
-            response.close()
-            response.release_conn()
+            compressed_data = get_storage().get(BUCKET_NAME, obj.object_name)
             
             decompressed_data = zlib.decompress(compressed_data)
             json_text = decompressed_data.decode("utf-8", errors="ignore")
@@ -48,17 +100,24 @@ def parse_and_save_sms_minio(backup_instance: Backup):
         
         except Exception as e:
             logger.error("Error reading/parsing object %s from Minio: %s", obj.object_name, e)
+            record_failure(f"parse:{PARSER_NAME}", "read")
 
             continue  
 
+        batch = []
+
         for sms in sms_list:
+            sms_hash = _sms_hash(sms)
+            if sms_hash in seen:
+                continue
             try:
+                address = normalize_phone(sms.get("address")) or None
                 if sms.get("type") == "1":
-                    sender = sms.get("address")
+                    sender = address
                     receiver = None
                 else:
                     sender = None
-                    receiver = sms.get("address")
+                    receiver = address
                 msg_type = "sms" if sms.get("type") == "1" else "mms"
 
                 serializer = MessageParserSerializer(
@@ -71,16 +130,50 @@ def parse_and_save_sms_minio(backup_instance: Backup):
                         'received_at': convert_timestamp(sms.get("date")),
                         'status': int(sms.get("status") or 0),
                         'message_type': msg_type,
+                        'content_hash': sms_hash,
                     }
                 )
 
                 if serializer.is_valid():
-                    serializer.save()
-                    count += 1
+                    batch.append((Message(**serializer.validated_data), address or ""))
+                    if sms_hash:
+                        seen.add(sms_hash)
                 else:
                     logger.error("Validation failed for SMS in %s : %s", obj.bucket_name, serializer.errors)
+                    record_failure(f"parse:{PARSER_NAME}", "invalid")
 
             except Exception as e:
                 logger.error("Error saving SMS from %s : %s", obj.object_name, e)
 
+        try:
+            _load_conversations(backup_instance, (counterpart for _, counterpart in batch), conversations)
+            for message, counterpart in batch:
+                message.conversation = conversations[counterpart]
+            added = {id(message) for message in store_records(Message, backup_instance, [message for message, _ in batch])}
+        except Exception as e:
+            logger.error("Error saving SMS from %s : %s", obj.object_name, e)
+            continue
+
+        for message, counterpart in batch:
+            if id(message) not in added:
+                continue
+            _apply_message_to_conversation(conversations[counterpart], message)
+            changed[counterpart] = conversations[counterpart]
+            delta.add_message(message)
+        count += len(added)
+
+    if changed:
+        Conversation.objects.bulk_update(
+            changed.values(),
+            ["message_count", "first_message_at", "last_message_at", "last_snippet"],
+            batch_size=BULK_INSERT_BATCH_SIZE,
+        )
+    # Conversations created for messages that were all stored already.
+    empty = [conversation.pk for conversation in conversations.values() if conversation.message_count == 0]
+    if empty:
+        Conversation.objects.filter(pk__in=empty, message_count=0).delete()
+    delta.apply(backup_instance)
+    record_parser_run(backup_instance, PARSER_NAME, PARSER_VERSION, count)
+    if count:
+        bump_data_version(backup_instance.id)
     return count
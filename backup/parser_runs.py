@@ -0,0 +1,23 @@
+from django.db import transaction
+from django.utils import timezone
+from .models import Backup, ParserRun
+from .metrics import record_rows
+
+
+def record_parser_run(backup: Backup, parser: str, version: int, row_count: int) -> None:
+    """
+    Remember which parser version produced the rows of a backup. Runs of the same
+    version accumulate row_count; a run of a different version starts it over.
+    """
+    record_rows(parser, row_count)
+    with transaction.atomic():
+        run, created = ParserRun.objects.select_for_update().get_or_create(
+            backup=backup, parser=parser, defaults={"version": version, "row_count": row_count}
+        )
+        if created:
+            return
+
+        run.row_count = run.row_count + row_count if run.version == version else row_count
+        run.version = version
+        run.parsed_at = timezone.now()
+        run.save(update_fields=["version", "row_count", "parsed_at"])
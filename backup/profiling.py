@@ -0,0 +1,129 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+from django.utils import timezone
+from .models import Backup, ProfileCapture
+from .storage import get_storage
+from .utils import BUCKET_NAME, ensure_bucket
+
+
+RSS_SAMPLE_SECONDS = 0.1
+REPORT_TOP_FUNCTIONS = 40
+
+
+logger = logging.getLogger(__name__)
+
+
+def _current_rss() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # No procfs: fall back to the peak of the whole process so far (bytes on macOS, KiB elsewhere).
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+class PeakRSS:
+    """Samples resident memory on a thread, so the peak belongs to this job and not the worker's lifetime."""
+
+    def __init__(self):
+        self.start = self.peak = _current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="peak-rss", daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(RSS_SAMPLE_SECONDS):
+            self.peak = max(self.peak, _current_rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss())
+        return False
+
+
+def _report(stage: str, duration: float, rss: PeakRSS, profiler: cProfile.Profile, error: Optional[BaseException]) -> str:
+    out = io.StringIO()
+    out.write(f"stage: {stage}\n")
+    out.write(f"duration: {duration:.3f}s\n")
+    out.write(f"rss at start: {rss.start / 2**20:.1f} MiB\n")
+    out.write(f"peak rss: {rss.peak / 2**20:.1f} MiB (+{(rss.peak - rss.start) / 2**20:.1f} MiB)\n")
+    if error is not None:
+        out.write(f"failed with: {type(error).__name__}: {error}\n")
+    out.write("\n")
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(REPORT_TOP_FUNCTIONS)
+    return out.getvalue()
+
+
+def _store(backup: Backup, stage: str, job: str, started_at, duration: float, rss: PeakRSS, profiler, error) -> None:
+    prefix = f"{backup.id}/profiles/{started_at:%Y%m%dT%H%M%S%f}-{stage.replace(':', '-')}"
+    storage = get_storage()
+    ensure_bucket()
+
+    with tempfile.NamedTemporaryFile(suffix=".prof", delete=False) as tmp:
+        tmp_path = Path(tmp.name)
+    try:
+        profiler.dump_stats(tmp_path)
+        storage.put_file(BUCKET_NAME, f"{prefix}.prof", tmp_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    report = _report(stage, duration, rss, profiler, error).encode()
+    storage.put(BUCKET_NAME, f"{prefix}.txt", io.BytesIO(report), len(report), content_type="text/plain")
+
+    ProfileCapture.objects.create(
+        backup=backup,
+        stage=stage,
+        job=job,
+        started_at=started_at,
+        duration_seconds=duration,
+        peak_rss_bytes=rss.peak,
+        profile_path=f"{prefix}.prof",
+        report_path=f"{prefix}.txt",
+    )
+
+
+def run_profiled(backup: Backup, stage: str, fn: Callable, job: str = ""):
+    """
+    Run `fn` under cProfile while tracking peak RSS, then upload the pstats dump and a
+    text report under the backup's prefix. A failure to store the capture never fails the job.
+    """
+    profiler = cProfile.Profile()
+    started_at = timezone.now()
+    started = time.perf_counter()
+    rss = PeakRSS()
+    error = None
+    profiler.enable()
+    try:
+        with rss:
+            return fn()
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        profiler.disable()
+        duration = time.perf_counter() - started
+        try:
+            _store(backup, stage, job, started_at, duration, rss, profiler, error)
+        except Exception as e:
+            logger.warning("Could not store profile of %s for backup %s: %s", stage, backup.id, e)
+
+
+def profiled(backup: Backup, stage: str, fn: Callable, force: bool = False, job: str = "") -> Callable:
+    """`fn`, wrapped to run under the profiler when requested for this job or enabled on the backup."""
+    if not (force or backup.profile):
+        return fn
+    return lambda: run_profiled(backup, stage, fn, job)
@@ -0,0 +1,110 @@
+import logging
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional
+from django.db import transaction
+from .models import App, Backup, CallLog, Contact, Conversation, MediaFile, Message, ParserRun
+from .incremental import reset_records
+from .parser import apk_parser, calllog_parser, contacts_parser, media_parser, sms_parser
+from .response_cache import bump_data_version
+from .summary import rebuild_summary
+from .locks import parse_stage, run_exclusive
+from .profiling import profiled
+
+
+logger = logging.getLogger(__name__)
+
+
+# version: current version of the parser; run(backup) -> stored rows; reset(backup) deletes what it stored.
+ParserSpec = namedtuple("ParserSpec", ["version", "run", "reset"])
+
+
+def _media_spec(media_type: str) -> ParserSpec:
+    return ParserSpec(
+        media_parser.PARSER_VERSION,
+        lambda backup: media_parser.parse_media_type_minio(backup, media_type),
+        lambda backup: MediaFile.objects.filter(backup=backup, media_type=media_type).delete(),
+    )
+
+
+def _reset_sms(backup: Backup) -> None:
+    reset_records(backup, Message)
+    Conversation.objects.filter(backup=backup).delete()
+
+
+PARSERS: Dict[str, ParserSpec] = {
+    "photo": _media_spec("photo"),
+    "video": _media_spec("video"),
+    "audio": _media_spec("audio"),
+    "document": _media_spec("document"),
+    sms_parser.PARSER_NAME: ParserSpec(
+        sms_parser.PARSER_VERSION,
+        sms_parser.parse_and_save_sms_minio,
+        _reset_sms,
+    ),
+    apk_parser.PARSER_NAME: ParserSpec(
+        apk_parser.PARSER_VERSION,
+        apk_parser.parse_apks_with_minio,
+        lambda backup: App.objects.filter(backup=backup).delete(),
+    ),
+    calllog_parser.PARSER_NAME: ParserSpec(
+        calllog_parser.PARSER_VERSION,
+        lambda backup: calllog_parser.store_calllogs(backup, calllog_parser.scan_and_extract_calllogs_minio(backup)),
+        lambda backup: reset_records(backup, CallLog),
+    ),
+    contacts_parser.PARSER_NAME: ParserSpec(
+        contacts_parser.PARSER_VERSION,
+        lambda backup: contacts_parser.store_contacts(backup, contacts_parser.scan_and_extract_contacts_minio(backup)),
+        lambda backup: reset_records(backup, Contact),
+    ),
+}
+
+
+def find_stale(parsers: Iterable[str], backup_ids: Optional[Iterable[int]] = None, force: bool = False) -> Dict[int, List[str]]:
+    """
+    {backup_id: [parser, ...]} for every backup whose recorded run of a parser is older
+    than the parser's current version (or any recorded run at all when `force` is set).
+    """
+    stale: Dict[int, List[str]] = {}
+    for name in parsers:
+        runs = ParserRun.objects.filter(parser=name)
+        if not force:
+            runs = runs.filter(version__lt=PARSERS[name].version)
+        if backup_ids is not None:
+            runs = runs.filter(backup_id__in=list(backup_ids))
+        for backup_id in runs.order_by("backup_id").values_list("backup_id", flat=True).iterator():
+            stale.setdefault(backup_id, []).append(name)
+    return dict(sorted(stale.items()))
+
+
+def shard(jobs: Dict[int, List[str]], shards: int) -> List[List[list]]:
+    """Split {backup_id: parsers} round-robin into at most `shards` non-empty job lists."""
+    buckets = [[] for _ in range(max(1, shards))]
+    for index, (backup_id, parsers) in enumerate(jobs.items()):
+        buckets[index % len(buckets)].append([backup_id, parsers])
+    return [bucket for bucket in buckets if bucket]
+
+
+def _reparse_one(backup: Backup, name: str, spec: ParserSpec) -> int:
+    with transaction.atomic():
+        spec.reset(backup)
+        ParserRun.objects.filter(backup=backup, parser=name).delete()
+        return spec.run(backup)
+
+
+def reparse_backup(backup_id: int, parsers: Iterable[str]) -> Dict[str, int]:
+    """
+    Drop the rows each parser stored for the backup and parse them again with the
+    current version. Each parser's delete + re-insert is one transaction, so readers
+    see either the old rows or the new ones.
+    """
+    backup = Backup.objects.get(pk=backup_id)
+    counts = {}
+    for name in parsers:
+        spec = PARSERS[name]
+        stage = parse_stage(name)
+        counts[name] = run_exclusive(backup.id, stage, profiled(backup, stage, lambda: _reparse_one(backup, name, spec)))
+        logger.info("Re-parsed %s of backup %s with v%s: %s rows", name, backup_id, spec.version, counts[name])
+
+    rebuild_summary(backup)
+    bump_data_version(backup.id)
+    return counts
@@ -0,0 +1,197 @@
+import contextvars
+import functools
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.db import connections
+from rest_framework.response import Response
+from . import storage
+from .access import is_internal_request
+from .utils import redis_client
+
+
+PROFILE_HEADER = "X-Profile-Request"
+
+REPORT_KEY_PREFIX = "request-profile"
+REPORT_INDEX_KEY = "request-profile:endpoints"
+REPORT_FIELDS = ("requests", "slow", "total_ms", "sql_queries", "sql_ms", "serializer_ms", "storage_calls", "storage_ms")
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.storage_calls = 0
+        self.storage_seconds = 0.0
+
+    def sql(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_queries += 1
+            self.sql_seconds += time.perf_counter() - started
+
+
+_current: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar("request_profile", default=None)
+
+
+def _on_storage_call(operation: str, seconds: float) -> None:
+    profile = _current.get()
+    if profile is not None:
+        profile.storage_calls += 1
+        profile.storage_seconds += seconds
+
+
+@contextmanager
+def timed_serialization():
+    """Count the block as serializer time of the profiled request; views wrap where they build response data."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serializer_seconds += time.perf_counter() - started
+
+
+class TimedListMixin:
+    """ListModelMixin.list with the serializer time reported to request profiling."""
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        with timed_serialization():
+            data = self.get_serializer(queryset if page is None else page, many=True).data
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+
+@functools.lru_cache(maxsize=None)
+def install_hooks() -> None:
+    """Observe storage calls once per process; a no-op outside a profiled request."""
+    storage.CALL_OBSERVERS.append(_on_storage_call)
+
+
+def _wanted(request) -> bool:
+    mode = settings.REQUEST_PROFILING
+    if mode == "always":
+        return True
+    return mode == "header" and request.headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes")
+
+
+def _trusted(request) -> bool:
+    """Internal clients and staff. JWT users are only known once the view authenticated them, hence after the response."""
+    if is_internal_request(request):
+        return True
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+def _endpoint(request) -> str:
+    match = request.resolver_match
+    return f"{request.method} /{match.route}" if match is not None else f"{request.method} <unresolved>"
+
+
+def server_timing(profile: RequestProfile, total_seconds: float) -> str:
+    return ", ".join([
+        f'db;dur={profile.sql_seconds * 1000:.1f};desc="{profile.sql_queries} queries"',
+        f"serializer;dur={profile.serializer_seconds * 1000:.1f}",
+        f'storage;dur={profile.storage_seconds * 1000:.1f};desc="{profile.storage_calls} calls"',
+        f"total;dur={total_seconds * 1000:.1f}",
+    ])
+
+
+def _record(endpoint: str, profile: RequestProfile, total_seconds: float, slow: bool) -> None:
+    key = f"{REPORT_KEY_PREFIX}:{endpoint}"
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.sadd(REPORT_INDEX_KEY, endpoint)
+        pipe.hincrby(key, "requests", 1)
+        pipe.hincrby(key, "slow", int(slow))
+        pipe.hincrbyfloat(key, "total_ms", total_seconds * 1000)
+        pipe.hincrby(key, "sql_queries", profile.sql_queries)
+        pipe.hincrbyfloat(key, "sql_ms", profile.sql_seconds * 1000)
+        pipe.hincrbyfloat(key, "serializer_ms", profile.serializer_seconds * 1000)
+        pipe.hincrby(key, "storage_calls", profile.storage_calls)
+        pipe.hincrbyfloat(key, "storage_ms", profile.storage_seconds * 1000)
+        pipe.execute()
+    except Exception as e:
+        logger.warning("Could not record request profile: %s", e)
+
+
+def slow_endpoint_report() -> List[Dict]:
+    """Per-endpoint totals of every profiled request, slowest total time first."""
+    endpoints = sorted(e.decode() for e in redis_client.smembers(REPORT_INDEX_KEY))
+    pipe = redis_client.pipeline(transaction=False)
+    for endpoint in endpoints:
+        pipe.hgetall(f"{REPORT_KEY_PREFIX}:{endpoint}")
+
+    rows = []
+    for endpoint, values in zip(endpoints, pipe.execute()):
+        row = {"endpoint": endpoint, **{field: float(values.get(field.encode(), 0)) for field in REPORT_FIELDS}}
+        if row["requests"]:
+            rows.append(row)
+    return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+
+def reset_report() -> None:
+    endpoints = [e.decode() for e in redis_client.smembers(REPORT_INDEX_KEY)]
+    redis_client.delete(REPORT_INDEX_KEY, *(f"{REPORT_KEY_PREFIX}:{endpoint}" for endpoint in endpoints))
+
+
+class RequestProfilingMiddleware:
+    """
+    Counts SQL queries and time, serializer time (where views build response data inside
+    timed_serialization) and storage calls of a request, when
+    REQUEST_PROFILING is "always" or it is "header" and the request sends X-Profile-Request: 1.
+    Only internal clients and staff get the Server-Timing header; in "header" mode only their
+    requests go into the per-endpoint report (`manage.py slow_endpoints`), too. Time spent
+    streaming a response body is not included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_hooks()
+
+    def __call__(self, request):
+        if not _wanted(request):
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.sql))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+
+        trusted = _trusted(request)
+        if not trusted and settings.REQUEST_PROFILING != "always":
+            return response
+
+        if trusted:
+            response["Server-Timing"] = server_timing(profile, total)
+        endpoint = _endpoint(request)
+        slow = total * 1000 >= settings.REQUEST_PROFILING_SLOW_MS
+        if slow:
+            logger.warning(
+                "Slow request %s: %.0f ms, %s queries (%.0f ms), serializer %.0f ms, %s storage calls (%.0f ms)",
+                endpoint, total * 1000, profile.sql_queries, profile.sql_seconds * 1000,
+                profile.serializer_seconds * 1000, profile.storage_calls, profile.storage_seconds * 1000,
+            )
+        _record(endpoint, profile, total, slow)
+        return response
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import logging
+from typing import Optional
+from django.core.cache import cache
+from django.db.models import F
+from rest_framework import status
+from rest_framework.response import Response
+from .models import Backup
+
+
+VERSION_KEY_PREFIX = "backup-version"
+RESPONSE_KEY_PREFIX = "backup-response"
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+
+logger = logging.getLogger(__name__)
+
+
+def _version_key(backup_id) -> str:
+    return f"{VERSION_KEY_PREFIX}:{backup_id}"
+
+
+def _database_version(backup_id) -> Optional[int]:
+    return Backup.objects.filter(pk=backup_id).values_list("data_version", flat=True).first()
+
+
+def get_data_version(backup_id) -> Optional[int]:
+    """
+    Current data version of a backup. The cache holds it and is seeded from the database
+    only with add(), so a reader seeding an old version cannot overwrite a newer bump.
+    """
+    key = _version_key(backup_id)
+    try:
+        version = cache.get(key)
+    except Exception as e:
+        logger.warning("Response cache unavailable: %s", e)
+        return None
+    if version is not None:
+        return version
+
+    seed = _database_version(backup_id)
+    if seed is None:
+        return None
+    try:
+        cache.add(key, seed, timeout=None)
+        return cache.get(key)
+    except Exception as e:
+        logger.warning("Response cache unavailable: %s", e)
+        return None
+
+
+def bump_data_version(backup_id) -> None:
+    """Mark every cached response of a backup as stale. Parse jobs call this after writing rows."""
+    Backup.objects.filter(pk=backup_id).update(data_version=F("data_version") + 1)
+    key = _version_key(backup_id)
+    try:
+        try:
+            cache.incr(key)
+            return
+        except ValueError:
+            pass
+        # Not cached yet. A reader that seeded it meanwhile may have read the version from
+        # before the update, so what it seeded is bumped instead.
+        if not cache.add(key, _database_version(backup_id), timeout=None):
+            cache.incr(key)
+    except Exception as e:
+        logger.warning("Could not invalidate cached version of backup %s: %s", backup_id, e)
+
+
+def _etag_for(data) -> str:
+    payload = json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+    return '"%s"' % hashlib.sha256(payload).hexdigest()
+
+
+def _etag_matches(request, etag: str) -> bool:
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+
+class VersionedResponseCacheMixin:
+    """
+    Caches list responses per (backup, user, endpoint, query params, data version)
+    and answers matching If-None-Match requests with 304 before any query runs.
+    """
+
+    response_cache_timeout = RESPONSE_CACHE_TIMEOUT
+
+    def get_response_cache_variant(self) -> str:
+        return ""
+
+    def _response_cache_key(self, request, backup_id, version) -> str:
+        params = sorted(request.query_params.lists())
+        raw = json.dumps([request.path, params, self.get_response_cache_variant()])
+        digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+        return f"{RESPONSE_KEY_PREFIX}:{backup_id}:{version}:{request.user.pk}:{digest}"
+
+    def list(self, request, *args, **kwargs):
+        backup_id = self.kwargs.get("pk")
+        version = get_data_version(backup_id)
+        if version is None:
+            return super().list(request, *args, **kwargs)
+
+        key = self._response_cache_key(request, backup_id, version)
+        entry = cache.get(key)
+        if entry is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = {"etag": _etag_for(response.data), "data": response.data}
+            cache.set(key, entry, timeout=self.response_cache_timeout)
+
+        headers = {"ETag": entry["etag"], "Cache-Control": "private, no-cache"}
+        if _etag_matches(request, entry["etag"]):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(entry["data"], headers=headers)
@@ -0,0 +1,67 @@
+import logging
+import math
+import time
+from django.conf import settings
+from .utils import redis_client
+
+
+SLOT_KEY_PREFIX = "backup-slots"
+# A slot is dropped after this long even if the worker holding it died without releasing it.
+SLOT_TTL_SECONDS = 6 * 60 * 60
+# How long a job waits before retrying when its user already has the maximum number of jobs running.
+SLOT_RETRY_SECONDS = 30
+
+# Redis transport priorities run 0 (first) .. 9 (last).
+MAX_PRIORITY = 9
+
+
+logger = logging.getLogger(__name__)
+
+
+_ACQUIRE_SCRIPT = redis_client.register_script("""
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZSCORE', KEYS[1], ARGV[3]) or redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[1], ARGV[4], ARGV[3])
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+    return 1
+end
+return 0
+""")
+
+
+def queue_for(size_bytes: int) -> str:
+    if size_bytes >= settings.BACKUP_LARGE_THRESHOLD_BYTES:
+        return settings.BACKUP_LARGE_QUEUE
+    return settings.BACKUP_SMALL_QUEUE
+
+
+def priority_for(size_bytes: int) -> int:
+    """Shortest job first inside a queue: one priority step per 4x in size, starting at 1 MiB."""
+    if size_bytes <= 2**20:
+        return 0
+    return min(MAX_PRIORITY, int(math.log(size_bytes / 2**20, 4)))
+
+
+def _slot_key(user_id) -> str:
+    return f"{SLOT_KEY_PREFIX}:{user_id}"
+
+
+def acquire_user_slot(user_id, backup_id) -> bool:
+    """Take one of the user's BACKUP_USER_CONCURRENCY processing slots; False when all are busy."""
+    now = time.time()
+    try:
+        return bool(_ACQUIRE_SCRIPT(
+            keys=[_slot_key(user_id)],
+            args=[now, settings.BACKUP_USER_CONCURRENCY, backup_id, now + SLOT_TTL_SECONDS, SLOT_TTL_SECONDS],
+        ))
+    except Exception as e:
+        # Fairness is best effort; never block processing because Redis is unreachable.
+        logger.warning("Could not acquire processing slot for user %s: %s", user_id, e)
+        return True
+
+
+def release_user_slot(user_id, backup_id) -> None:
+    try:
+        redis_client.zrem(_slot_key(user_id), backup_id)
+    except Exception as e:
+        logger.warning("Could not release processing slot for user %s: %s", user_id, e)
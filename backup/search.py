@@ -0,0 +1,48 @@
+import re
+from django.db.models.functions import Lower
+from .fast_read import datetime_to_representation
+from .utils import phone_search_key
+
+
+SEARCH_MODES = {"prefix", "substring"}
+MIN_QUERY_LENGTH = 2
+PHONE_QUERY_REGEX = re.compile(r"^\+?[\d\s\-\(\)]+$")
+
+CONTACT_SEARCH_FIELDS = ("id", "backup_id", "name", "phone_number", "email", "created_at")
+
+
+def search_contacts(queryset, query: str, mode: str = "prefix", limit: int = 20):
+    """
+    Name or phone lookup over Contact rows, one row per normalized number.
+
+    Phone-looking queries hit the trigram index on phone_search, anything else the
+    trigram index on UPPER(name), so both prefix and substring LIKEs stay indexed.
+    """
+    if PHONE_QUERY_REGEX.match(query):
+        key = phone_search_key(query)
+        if not key:
+            # "00", "+98" and the like are only a country prefix; an empty key would match every contact.
+            return []
+        lookup = "phone_search__startswith" if mode == "prefix" else "phone_search__contains"
+        queryset = queryset.filter(**{lookup: key})
+    else:
+        lookup = "name__istartswith" if mode == "prefix" else "name__icontains"
+        queryset = queryset.filter(**{lookup: query})
+
+    # DISTINCT ON needs phone_search first in ORDER BY, so pick one row per number in a
+    # subquery and rank the picked rows by name outside it, before the LIMIT.
+    picked = (
+        queryset.exclude(phone_search="")
+        .order_by("phone_search", "-id")
+        .distinct("phone_search")
+        .values("id")
+    )
+    results = list(
+        queryset.model.objects.filter(pk__in=picked)
+        .order_by(Lower("name"), "id")
+        .values(*CONTACT_SEARCH_FIELDS)[:limit]
+    )
+    for row in results:
+        if row["created_at"] is not None:
+            row["created_at"] = datetime_to_representation(row["created_at"])
+    return results
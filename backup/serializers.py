@@ -1,10 +1,10 @@
 from rest_framework import serializers
-from .models import Backup, MediaFile, Message, Contact, CallLog, App
+from .models import Backup, MediaFile, Message, Contact, CallLog, App, Conversation, BackupSummary, ProfileCapture, UploadSession
 from datetime import datetime, timezone
 import re
 import logging
-from datetime import timedelta
-from .utils import minio_client
+from .storage import get_storage
+from .signing import sign_objects, sign_object
 
 
 
@@ -14,16 +14,20 @@ ORIGINAL_BUCKET_NAME = "original-files"
 logger = logging.getLogger(__name__)
 
 def ensure_original_bucket():
-    if not minio_client.bucket_exists(ORIGINAL_BUCKET_NAME):
-        minio_client.make_bucket(ORIGINAL_BUCKET_NAME)
+    get_storage().ensure_bucket(ORIGINAL_BUCKET_NAME)
+
+
+def original_key(backup_id: int, file_name: str) -> str:
+    return f"original_file/{backup_id}/{file_name}"
 
 
 class BackupUploadSerializer(serializers.ModelSerializer):
     original_file = serializers.FileField(write_only=True)
+    device_id = serializers.CharField(max_length=255, required=False, allow_blank=True)
 
     class Meta:
         model = Backup
-        fields = ['original_file']
+        fields = ['original_file', 'device_id', 'profile']
 
     def create(self, validated_data):
         user = self.context['request'].user
@@ -33,12 +37,15 @@ class BackupUploadSerializer(serializers.ModelSerializer):
 
         backup = Backup.objects.create(
             user=user,
-            original_file_name=file_obj.name
+            original_file_name=file_obj.name,
+            device_id=validated_data.get('device_id', ''),
+            size_bytes=file_obj.size or 0,
+            profile=validated_data.get('profile', False)
         )
 
-        file_key = f"original_file/{backup.id}/{file_obj.name}"
+        file_key = original_key(backup.id, file_obj.name)
 
-        minio_client.put_object(
+        get_storage().put(
             ORIGINAL_BUCKET_NAME,
             file_key,
             file_obj,
@@ -53,6 +60,55 @@ class BackupUploadSerializer(serializers.ModelSerializer):
 
 
 
+# Largest object S3/MinIO accepts from a multipart upload.
+MAX_UPLOAD_SIZE = 5 * 2**40
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    file_name = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1, max_value=MAX_UPLOAD_SIZE)
+    device_id = serializers.CharField(max_length=255, required=False, allow_blank=True, default="")
+    part_size = serializers.IntegerField(min_value=1, required=False)
+
+    def validate_file_name(self, value):
+        name = value.replace("\\", "/").split("/")[-1]
+        if not name:
+            raise serializers.ValidationError("File name is required.")
+        return name
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'backup', 'file_name', 'total_size', 'part_size', 'part_count', 'status', 'created_at', 'completed_at']
+
+
+
+
+
+class ProfileCaptureSerializer(serializers.ModelSerializer):
+    profile_url = serializers.SerializerMethodField()
+    report_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProfileCapture
+        fields = ['id', 'stage', 'job', 'started_at', 'duration_seconds', 'peak_rss_bytes', 'profile_url', 'report_url']
+
+    def get_profile_url(self, obj):
+        return sign_object(obj.profile_path)
+
+    def get_report_url(self, obj):
+        return sign_object(obj.report_path)
+
+
+
+class MediaFileListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, "all") else data)
+        self.child.context["signed_urls"] = sign_objects(item.minio_path for item in items)
+        return super().to_representation(items)
 
 
 class MediaFileSerializer(serializers.ModelSerializer):
@@ -61,22 +117,17 @@ class MediaFileSerializer(serializers.ModelSerializer):
     class Meta:
         model = MediaFile
         fields = [ "id", "file_name", "minio_path", "media_type", "mime_type", "size_bytes", "added_at", "file_url",  ]
+        list_serializer_class = MediaFileListSerializer
 
 
     def get_file_url(self, obj):
 
         if not obj.minio_path:
             return None
-        try:
-            url = minio_client.presigned_get_object(
-                "backups",
-                obj.minio_path,
-                expires=timedelta(hours=1)
-            )
-            return url
-        except Exception as e:
-            logger.error(f"Error generating presigned URL for {obj.minio_path}: {e}")
-            return None
+        signed_urls = self.context.get("signed_urls")
+        if signed_urls is not None and obj.minio_path in signed_urls:
+            return signed_urls[obj.minio_path]
+        return sign_object(obj.minio_path)
 
 
 
@@ -88,6 +139,14 @@ class MessageSerializer(serializers.ModelSerializer):
 
 
 
+class ConversationSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Conversation
+        fields = ['id', 'counterpart', 'message_count', 'first_message_at', 'last_message_at', 'last_snippet']
+
+
+
 MOBILE_REGEX = re.compile(r"^(?:\+98|0)?9\d{9}$")
 
 class MessageParserSerializer(serializers.ModelSerializer):
@@ -95,6 +154,9 @@ class MessageParserSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
         fields = "__all__"
+        # Uniqueness is enforced by the database (bulk INSERT ... ON CONFLICT DO NOTHING),
+        # not by a per-row lookup from DRF's UniqueTogetherValidator.
+        validators = []
 
     def validate_sender(self, value):
         if value and not MOBILE_REGEX.match(value):
@@ -137,6 +199,7 @@ class MediaParserSerializer(serializers.ModelSerializer):
     class Meta:
         model = MediaFile
         fields = "__all__"
+        validators = []
 
 
     
@@ -146,7 +209,7 @@ class CallLogSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CallLog
-        fields = "__all__"
+        fields = ['id', 'backup', 'phone_number', 'call_type', 'call_date', 'duration_seconds', 'created_at']
 
 
 
@@ -154,7 +217,7 @@ class ContactSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Contact
-        fields = "__all__"
+        fields = ['id', 'backup', 'name', 'phone_number', 'email', 'group', 'address', 'created_at']
 
 
 
@@ -173,6 +236,7 @@ class ContactParserSerializer(serializers.ModelSerializer):
     class Meta:
         model = Contact
         fields = "__all__"
+        validators = []
 
 
     def validate_name(self, value):
@@ -209,6 +273,7 @@ class CallLogParserSerializer(serializers.ModelSerializer):
     class Meta:
         model = CallLog
         fields = "__all__"
+        validators = []
 
     def validate_phone_number(self, value):
         if not value:
@@ -240,10 +305,23 @@ class CallLogParserSerializer(serializers.ModelSerializer):
     
 
 
+class BackupSummarySerializer(serializers.ModelSerializer):
+    backup_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = BackupSummary
+        fields = [
+            'backup_id', 'message_count', 'contact_count', 'call_count', 'app_count', 'media_count', 'total_bytes',
+            'media_type_counts', 'call_type_counts', 'monthly_counts', 'top_contacts', 'updated_at',
+        ]
+
+
+
 class AppParserSerializer(serializers.ModelSerializer):
     backup = serializers.PrimaryKeyRelatedField(queryset=Backup.objects.all())
     
     class Meta:
         model = App
         fields = "__all__"
+        validators = []
 
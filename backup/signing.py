@@ -0,0 +1,79 @@
+import logging
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, Optional
+from django.core.cache import cache
+from .storage import get_storage
+
+
+BUCKET_NAME = "backups"
+
+# URLs are signed with a request date pinned to the start of a fixed window, so every
+# listing inside the same window gets byte-identical (browser/CDN cacheable) URLs.
+SIGNING_WINDOW_SECONDS = 3600
+# Extra validity past the end of the window, so a URL handed out at the last second is still usable.
+SIGNING_GRACE_SECONDS = 900
+
+CACHE_KEY_PREFIX = "presign"
+
+
+logger = logging.getLogger(__name__)
+
+
+def current_window(now: Optional[float] = None) -> int:
+    now = time.time() if now is None else now
+    return int(now - now % SIGNING_WINDOW_SECONDS)
+
+
+def _cache_key(bucket: str, window: int, object_name: str) -> str:
+    return f"{CACHE_KEY_PREFIX}:{bucket}:{window}:{object_name}"
+
+
+def sign_objects(object_names: Iterable[str], bucket: str = BUCKET_NAME) -> Dict[str, Optional[str]]:
+    """Return {object_name: presigned GET url} for a whole batch, reusing cached signatures."""
+    names = list(dict.fromkeys(name for name in object_names if name))
+    if not names:
+        return {}
+
+    now = time.time()
+    window = current_window(now)
+    keys = {name: _cache_key(bucket, window, name) for name in names}
+
+    try:
+        cached = cache.get_many(keys.values())
+    except Exception as e:
+        logger.warning("Presigned URL cache unavailable: %s", e)
+        cached = {}
+
+    urls = {name: cached.get(key) for name, key in keys.items()}
+    missing = [name for name, url in urls.items() if url is None]
+    if not missing:
+        return urls
+
+    request_date = datetime.fromtimestamp(window, tz=dt_timezone.utc)
+    expires = timedelta(seconds=SIGNING_WINDOW_SECONDS + SIGNING_GRACE_SECONDS)
+    storage = get_storage()
+    fresh = {}
+    for name in missing:
+        try:
+            url = storage.presign_get(bucket, name, expires, request_date)
+        except Exception as e:
+            logger.error("Error generating presigned URL for %s: %s", name, e)
+            continue
+        urls[name] = url
+        fresh[keys[name]] = url
+
+    if fresh:
+        timeout = max(1, int(window + SIGNING_WINDOW_SECONDS - now))
+        try:
+            cache.set_many(fresh, timeout=timeout)
+        except Exception as e:
+            logger.warning("Could not cache presigned URLs: %s", e)
+
+    return urls
+
+
+def sign_object(object_name: Optional[str], bucket: str = BUCKET_NAME) -> Optional[str]:
+    if not object_name:
+        return None
+    return sign_objects([object_name], bucket).get(object_name)
@@ -0,0 +1,422 @@
+import functools
+import inspect
+import logging
+import mmap
+import os
+import shutil
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+
+READ_CHUNK_SIZE = 256 * 1024
+# Partially written files get this prefix and are renamed into place once complete.
+LOCAL_TEMP_PREFIX = ".partial-"
+LOCAL_SIGNING_SALT = "backup.storage.local"
+
+
+logger = logging.getLogger(__name__)
+
+
+# Called as observer(operation, seconds) after every storage call, e.g. by request profiling.
+CALL_OBSERVERS: List[Callable[[str, float], None]] = []
+
+
+StoredObject = namedtuple("StoredObject", ["bucket_name", "object_name", "size"])
+UploadedPart = namedtuple("UploadedPart", ["part_number", "size", "etag"])
+
+
+class StorageError(Exception):
+    pass
+
+
+class ObjectNotFound(StorageError):
+    pass
+
+
+class StoredFile:
+    """Open object body: read() it whole or iterate stream(); always close()."""
+
+    def read(self) -> bytes:
+        return b"".join(self.stream())
+
+    def stream(self, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+def _notify(operation: str, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    for observer in CALL_OBSERVERS:
+        observer(operation, elapsed)
+
+
+def _observed(operation: str, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except Exception:
+            _notify(operation, started)
+            raise
+        if not inspect.isgenerator(result):
+            _notify(operation, started)
+            return result
+
+        def drain():
+            try:
+                yield from result
+            finally:
+                _notify(operation, started)
+        return drain()
+    return wrapper
+
+
+class Storage:
+    """
+    Object storage used for originals, extracted files and media. Keys are
+    "/"-separated; buckets are flat namespaces created with ensure_bucket().
+    """
+
+    supports_multipart = False
+
+    OBSERVED_OPERATIONS = (
+        "put", "put_file", "open", "get_range", "get_file", "list", "presign_get", "delete",
+        "create_multipart", "presign_part", "list_parts", "complete_multipart", "abort_multipart",
+    )
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in cls.OBSERVED_OPERATIONS:
+            if name in cls.__dict__:
+                setattr(cls, name, _observed(name, cls.__dict__[name]))
+
+    def ensure_bucket(self, bucket: str) -> None:
+        raise NotImplementedError
+
+    def put(self, bucket: str, key: str, data: BinaryIO, length: int, content_type: str = "application/octet-stream") -> None:
+        raise NotImplementedError
+
+    def put_file(self, bucket: str, key: str, path, content_type: str = "application/octet-stream") -> None:
+        raise NotImplementedError
+
+    def open(self, bucket: str, key: str) -> StoredFile:
+        raise NotImplementedError
+
+    def get(self, bucket: str, key: str) -> bytes:
+        body = self.open(bucket, key)
+        try:
+            return body.read()
+        finally:
+            body.close()
+
+    def get_range(self, bucket: str, key: str, offset: int, length: int) -> bytes:
+        raise NotImplementedError
+
+    def get_file(self, bucket: str, key: str, path) -> None:
+        """Download the object to a local path."""
+        raise NotImplementedError
+
+    def list(self, bucket: str, prefix: str = "") -> Iterator[StoredObject]:
+        """Every object under `prefix`, recursively, in key order."""
+        raise NotImplementedError
+
+    def presign_get(self, bucket: str, key: str, expires: timedelta, request_date: Optional[datetime] = None) -> str:
+        raise NotImplementedError
+
+    def delete(self, bucket: str, key: str) -> None:
+        raise NotImplementedError
+
+    # Multipart uploads, only where supports_multipart is set.
+
+    def create_multipart(self, bucket: str, key: str, content_type: str = "application/octet-stream") -> str:
+        raise StorageError(f"{type(self).__name__} does not support multipart uploads")
+
+    def presign_part(self, bucket: str, key: str, upload_id: str, part_number: int, expires: timedelta) -> str:
+        raise StorageError(f"{type(self).__name__} does not support multipart uploads")
+
+    def list_parts(self, bucket: str, key: str, upload_id: str) -> List[UploadedPart]:
+        raise StorageError(f"{type(self).__name__} does not support multipart uploads")
+
+    def complete_multipart(self, bucket: str, key: str, upload_id: str, parts: List[Tuple[int, str]]) -> None:
+        raise StorageError(f"{type(self).__name__} does not support multipart uploads")
+
+    def abort_multipart(self, bucket: str, key: str, upload_id: str) -> None:
+        raise StorageError(f"{type(self).__name__} does not support multipart uploads")
+
+
+def _storage_error(error) -> StorageError:
+    if error.code in ("NoSuchKey", "NoSuchBucket"):
+        return ObjectNotFound(str(error))
+    return StorageError(str(error))
+
+
+def _translate_s3_errors(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        from minio.error import S3Error
+
+        try:
+            return method(*args, **kwargs)
+        except S3Error as e:
+            raise _storage_error(e) from e
+    return wrapper
+
+
+class _MinioFile(StoredFile):
+
+    def __init__(self, response):
+        self._response = response
+
+    def read(self) -> bytes:
+        return self._response.read()
+
+    def stream(self, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        return self._response.stream(chunk_size)
+
+    def close(self) -> None:
+        self._response.close()
+        self._response.release_conn()
+
+
+class MinioStorage(Storage):
+    supports_multipart = True
+
+    def __init__(self):
+        # The MinIO SDK is slow to import; processes that never touch storage don't pay for it.
+        from minio import Minio
+
+        self.client = Minio(
+            settings.MINIO_STORAGE_ENDPOINT,
+            access_key=settings.MINIO_STORAGE_ACCESS_KEY,
+            secret_key=settings.MINIO_STORAGE_SECRET_KEY,
+            secure=settings.MINIO_STORAGE_USE_SSL,
+        )
+
+    @_translate_s3_errors
+    def ensure_bucket(self, bucket):
+        if not self.client.bucket_exists(bucket):
+            self.client.make_bucket(bucket)
+
+    @_translate_s3_errors
+    def put(self, bucket, key, data, length, content_type="application/octet-stream"):
+        self.client.put_object(bucket, key, data, length=length, content_type=content_type)
+
+    @_translate_s3_errors
+    def put_file(self, bucket, key, path, content_type="application/octet-stream"):
+        self.client.fput_object(bucket, key, str(path), content_type=content_type)
+
+    @_translate_s3_errors
+    def open(self, bucket, key):
+        return _MinioFile(self.client.get_object(bucket, key))
+
+    @_translate_s3_errors
+    def get_range(self, bucket, key, offset, length):
+        body = _MinioFile(self.client.get_object(bucket, key, offset=offset, length=length))
+        try:
+            return body.read()
+        finally:
+            body.close()
+
+    @_translate_s3_errors
+    def get_file(self, bucket, key, path):
+        self.client.fget_object(bucket, key, str(path))
+
+    def list(self, bucket, prefix=""):
+        from minio.error import S3Error
+
+        try:
+            for obj in self.client.list_objects(bucket, prefix=prefix, recursive=True):
+                yield StoredObject(obj.bucket_name, obj.object_name, obj.size)
+        except S3Error as e:
+            raise _storage_error(e) from e
+
+    @_translate_s3_errors
+    def presign_get(self, bucket, key, expires, request_date=None):
+        return self.client.presigned_get_object(bucket, key, expires=expires, request_date=request_date)
+
+    @_translate_s3_errors
+    def delete(self, bucket, key):
+        self.client.remove_object(bucket, key)
+
+    # The SDK has no public multipart calls, so these use its underscore methods. requirements.txt
+    # pins minio to the exact version they were written against; MinioMultipartTests covers them.
+    @_translate_s3_errors
+    def create_multipart(self, bucket, key, content_type="application/octet-stream"):
+        return self.client._create_multipart_upload(bucket, key, {"Content-Type": content_type})
+
+    @_translate_s3_errors
+    def presign_part(self, bucket, key, upload_id, part_number, expires):
+        return self.client.get_presigned_url(
+            "PUT", bucket, key, expires=expires,
+            extra_query_params={"uploadId": upload_id, "partNumber": str(part_number)},
+        )
+
+    @_translate_s3_errors
+    def list_parts(self, bucket, key, upload_id):
+        parts, marker = [], None
+        while True:
+            result = self.client._list_parts(bucket, key, upload_id, max_parts=1000, part_number_marker=marker)
+            parts.extend(UploadedPart(part.part_number, part.size, part.etag) for part in result.parts)
+            if not result.is_truncated:
+                return parts
+            marker = result.next_part_number_marker
+
+    @_translate_s3_errors
+    def complete_multipart(self, bucket, key, upload_id, parts):
+        from minio.datatypes import Part
+
+        self.client._complete_multipart_upload(bucket, key, upload_id, [Part(number, etag) for number, etag in parts])
+
+    @_translate_s3_errors
+    def abort_multipart(self, bucket, key, upload_id):
+        self.client._abort_multipart_upload(bucket, key, upload_id)
+
+
+def _sendfile(src: BinaryIO, dst: BinaryIO, count: int) -> None:
+    """Copy `count` bytes between two files inside the kernel."""
+    offset = 0
+    while offset < count:
+        sent = os.sendfile(dst.fileno(), src.fileno(), offset, count - offset)
+        if sent == 0:
+            break
+        offset += sent
+
+
+class _LocalFile(StoredFile):
+
+    def __init__(self, path: Path):
+        self._file = open(path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        # mmap refuses empty files; they simply have no chunks.
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    def read(self) -> bytes:
+        return self.read_range(0, self.size)
+
+    def read_range(self, offset: int, length: int) -> bytes:
+        return self._map[offset:offset + length] if self._map is not None else b""
+
+    def stream(self, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        if self._map is None:
+            return
+        for offset in range(0, len(self._map), chunk_size):
+            yield self._map[offset:offset + chunk_size]
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+class LocalStorage(Storage):
+    """
+    Buckets are directories under BACKUP_STORAGE_ROOT. Reads are mmapped, copies go
+    through os.sendfile, and presigned URLs point at a Django view that checks a signature.
+    """
+
+    def __init__(self, root=None):
+        self.root = Path(root or settings.BACKUP_STORAGE_ROOT).resolve()
+
+    def local_path(self, bucket: str, key: str = "") -> Path:
+        bucket_dir = self.root / bucket
+        path = (bucket_dir / key).resolve()
+        if bucket_dir.resolve().parent != self.root or not path.is_relative_to(bucket_dir):
+            raise StorageError(f"Key {key!r} escapes bucket {bucket!r}")
+        return path
+
+    def _write(self, path: Path, copy) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(f"{LOCAL_TEMP_PREFIX}{uuid.uuid4().hex}-{path.name}")
+        try:
+            with open(temp, "wb") as dst:
+                copy(dst)
+            os.replace(temp, path)
+        except OSError as e:
+            temp.unlink(missing_ok=True)
+            raise StorageError(str(e)) from e
+
+    def ensure_bucket(self, bucket):
+        self.local_path(bucket).mkdir(parents=True, exist_ok=True)
+
+    def put(self, bucket, key, data, length, content_type="application/octet-stream"):
+        self._write(self.local_path(bucket, key), lambda dst: shutil.copyfileobj(data, dst, READ_CHUNK_SIZE))
+
+    def put_file(self, bucket, key, path, content_type="application/octet-stream"):
+        def copy(dst):
+            with open(path, "rb") as src:
+                _sendfile(src, dst, os.fstat(src.fileno()).st_size)
+        self._write(self.local_path(bucket, key), copy)
+
+    def open(self, bucket, key):
+        try:
+            return _LocalFile(self.local_path(bucket, key))
+        except FileNotFoundError as e:
+            raise ObjectNotFound(f"{bucket}/{key}") from e
+        except OSError as e:
+            raise StorageError(str(e)) from e
+
+    def get_range(self, bucket, key, offset, length):
+        body = self.open(bucket, key)
+        try:
+            return body.read_range(offset, length)
+        finally:
+            body.close()
+
+    def get_file(self, bucket, key, path):
+        source = self.local_path(bucket, key)
+        try:
+            with open(source, "rb") as src, open(path, "wb") as dst:
+                _sendfile(src, dst, os.fstat(src.fileno()).st_size)
+        except FileNotFoundError as e:
+            raise ObjectNotFound(f"{bucket}/{key}") from e
+        except OSError as e:
+            raise StorageError(str(e)) from e
+
+    def list(self, bucket, prefix=""):
+        bucket_dir = self.local_path(bucket)
+        start = self.local_path(bucket, prefix.rpartition("/")[0])
+        keys = []
+        for directory, _, files in os.walk(start):
+            for name in files:
+                if name.startswith(LOCAL_TEMP_PREFIX):
+                    continue
+                key = Path(directory, name).relative_to(bucket_dir).as_posix()
+                if key.startswith(prefix):
+                    keys.append(key)
+        for key in sorted(keys):
+            try:
+                size = (bucket_dir / key).stat().st_size
+            except FileNotFoundError:
+                continue
+            yield StoredObject(bucket, key, size)
+
+    def presign_get(self, bucket, key, expires, request_date=None):
+        expires_at = int(((request_date or datetime.now().astimezone()) + expires).timestamp())
+        url = reverse("storage-object", kwargs={"bucket": bucket, "key": key})
+        query = urlencode({"expires": expires_at, "signature": local_signature(bucket, key, expires_at)})
+        return f"{url}?{query}"
+
+    def delete(self, bucket, key):
+        self.local_path(bucket, key).unlink(missing_ok=True)
+
+
+def local_signature(bucket: str, key: str, expires_at: int) -> str:
+    return signing.Signer(salt=LOCAL_SIGNING_SALT).signature(f"{bucket}/{key}:{expires_at}")
+
+
+@functools.lru_cache(maxsize=None)
+def get_storage() -> Storage:
+    """The engine configured by BACKUP_STORAGE_ENGINE, built on first use."""
+    return import_string(settings.BACKUP_STORAGE_ENGINE)()
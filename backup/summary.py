@@ -0,0 +1,96 @@
+from collections import Counter
+from django.db import transaction
+from .incremental import backup_rows
+from .models import App, Backup, BackupSummary, CallLog, Contact, MediaFile, Message
+from .utils import normalize_phone
+
+
+TOP_CONTACTS_LIMIT = 10
+
+
+def _month_key(value) -> str:
+    return value.strftime("%Y-%m") if value else "unknown"
+
+
+def _merge_counts(target: dict, delta: Counter) -> dict:
+    for key, value in delta.items():
+        target[key] = target.get(key, 0) + value
+    return target
+
+
+class SummaryDelta:
+    """Counts collected while a parser inserts rows, folded into BackupSummary in one locked update."""
+
+    def __init__(self):
+        self.totals = Counter()
+        self.total_bytes = 0
+        self.media_types = Counter()
+        self.call_types = Counter()
+        self.months = {"messages": Counter(), "calls": Counter()}
+        self.interactions = Counter()
+
+    def add_media(self, media) -> None:
+        self.totals["media_count"] += 1
+        self.total_bytes += media.size_bytes or 0
+        self.media_types[media.media_type] += 1
+
+    def add_call(self, call) -> None:
+        self.totals["call_count"] += 1
+        self.call_types[call.call_type] += 1
+        self.months["calls"][_month_key(call.call_date)] += 1
+        self.interactions[normalize_phone(call.phone_number)] += 1
+
+    def add_message(self, message) -> None:
+        self.totals["message_count"] += 1
+        self.months["messages"][_month_key(message.received_at or message.sent_at)] += 1
+        self.interactions[normalize_phone(message.sender or message.receiver)] += 1
+
+    def add_contact(self, contact) -> None:
+        self.totals["contact_count"] += 1
+
+    def add_app(self, app) -> None:
+        self.totals["app_count"] += 1
+
+    def apply(self, backup: Backup) -> None:
+        if not self.totals:
+            return
+
+        with transaction.atomic():
+            summary, _ = BackupSummary.objects.select_for_update().get_or_create(backup=backup)
+
+            for field, value in self.totals.items():
+                setattr(summary, field, getattr(summary, field) + value)
+            summary.total_bytes += self.total_bytes
+            _merge_counts(summary.media_type_counts, self.media_types)
+            _merge_counts(summary.call_type_counts, self.call_types)
+
+            for kind, months in self.months.items():
+                for month, value in months.items():
+                    bucket = summary.monthly_counts.setdefault(month, {})
+                    bucket[kind] = bucket.get(kind, 0) + value
+
+            if self.interactions:
+                _merge_counts(summary.interaction_counts, self.interactions)
+                top = Counter(summary.interaction_counts).most_common(TOP_CONTACTS_LIMIT + 1)
+                summary.top_contacts = [
+                    {"phone_number": number, "count": count} for number, count in top if number
+                ][:TOP_CONTACTS_LIMIT]
+
+            summary.save()
+
+
+def rebuild_summary(backup: Backup) -> None:
+    """Recompute the summary from the stored rows, used after rows were deleted for a re-parse."""
+    delta = SummaryDelta()
+    for media in MediaFile.objects.filter(backup=backup).only("size_bytes", "media_type").iterator():
+        delta.add_media(media)
+    for call in backup_rows(CallLog, backup).only("call_type", "call_date", "phone_number").iterator():
+        delta.add_call(call)
+    for message in backup_rows(Message, backup).only("received_at", "sent_at", "sender", "receiver").iterator():
+        delta.add_message(message)
+    delta.totals["contact_count"] = backup_rows(Contact, backup).count()
+    delta.totals["app_count"] = App.objects.filter(backup=backup).count()
+
+    with transaction.atomic():
+        BackupSummary.objects.filter(backup=backup).delete()
+        delta.apply(backup)
@@ -0,0 +1,320 @@
+import io
+import json
+import random
+import sqlite3
+import struct
+import tarfile
+import tempfile
+import zipfile
+import zlib
+from collections import namedtuple
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+
+
+# Unencrypted version-5 backup with a zlib-compressed tar, as written by `adb backup`.
+AB_HEADER = b"ANDROID BACKUP\n5\n1\nnone\n"
+
+# Fixed timestamps keep archives byte-identical for the same size and seed.
+ARCHIVE_MTIME = 1_704_067_200
+MESSAGES_START_MS = 1_672_531_200_000
+MESSAGES_SPAN_MS = 365 * 24 * 3600 * 1000
+
+SMS_PER_CHUNK = 1000
+PREFS_PER_APP = 8
+TELEPHONY_PACKAGE = "com.android.providers.telephony"
+CONTACTS_PACKAGE = "com.android.providers.contacts"
+
+# Share of the size budget taken by each kind of file; messages, databases and prefs scale with it separately.
+MEDIA_SHARES = {"photos": 0.50, "videos": 0.30, "apks": 0.10, "audios": 0.05, "documents": 0.05}
+MEDIA_TYPICAL_SIZE = {"photos": 3 * 2**20, "videos": 25 * 2**20, "apks": 8 * 2**20, "audios": 2**20, "documents": 512 * 2**10}
+MEDIA_MINIMUM_COUNT = {"photos": 4, "videos": 1, "apks": 2, "audios": 1, "documents": 1}
+
+# What one megabyte of backup holds besides media, roughly as on a phone with a year of use.
+SMS_PER_MB = 40
+CONTACTS_PER_MB = 5
+CALLS_PER_MB = 15
+PREFS_PER_MB = 25
+
+# Magic bytes, so sniffing tools see the files as what their extension says.
+MEDIA_MAGIC = {
+    "photos": b"\xff\xd8\xff\xe0\x00\x10JFIF\x00",
+    "videos": b"\x00\x00\x00\x18ftypmp42",
+    "audios": b"\x00\x00\x00\x1cftypM4A ",
+    "documents": b"%PDF-1.7\n",
+}
+
+SyntheticBackup = namedtuple(
+    "SyntheticBackup", ["path", "size_bytes", "files", "sms", "contacts", "calls", "prefs", "photos", "videos", "apks", "audios", "documents"]
+)
+
+
+def _plan(size_bytes: int) -> Dict[str, int]:
+    mb = size_bytes / 2**20
+    counts = {
+        "sms": max(20, int(mb * SMS_PER_MB)),
+        "contacts": max(10, int(mb * CONTACTS_PER_MB)),
+        "calls": max(10, int(mb * CALLS_PER_MB)),
+        "prefs": max(16, int(mb * PREFS_PER_MB)),
+    }
+    for kind, share in MEDIA_SHARES.items():
+        counts[kind] = max(MEDIA_MINIMUM_COUNT[kind], round(size_bytes * share / MEDIA_TYPICAL_SIZE[kind]))
+    return counts
+
+
+def _sizes(rng: random.Random, count: int, budget: int) -> List[int]:
+    """`count` sizes within ±30% of budget/count."""
+    mean = max(budget // max(count, 1), 64)
+    return [int(mean * rng.uniform(0.7, 1.3)) for _ in range(count)]
+
+
+def _phone(rng: random.Random) -> str:
+    return rng.choice(("+98912", "0912", "0935", "+98935", "0901")) + f"{rng.randrange(10**7):07d}"
+
+
+def _words(rng: random.Random, count: int) -> str:
+    vocabulary = ("salam", "ok", "see", "you", "tomorrow", "call", "me", "when", "free", "code", "is", "your", "meeting", "at", "home", "thanks")
+    return " ".join(rng.choice(vocabulary) for _ in range(count))
+
+
+def _sms_chunks(rng: random.Random, total: int, phones: List[str]) -> Iterator[bytes]:
+    for start in range(0, total, SMS_PER_CHUNK):
+        messages = []
+        for _ in range(min(SMS_PER_CHUNK, total - start)):
+            date = MESSAGES_START_MS + rng.randrange(MESSAGES_SPAN_MS)
+            messages.append({
+                "address": rng.choice(phones),
+                "body": _words(rng, rng.randint(1, 30)),
+                "date": str(date),
+                "date_sent": str(date - rng.randrange(5000)),
+                "status": "-1",
+                "type": rng.choice(("1", "1", "2")),
+                "read": "1",
+                "recipients": [],
+            })
+        yield zlib.compress(json.dumps(messages).encode())
+
+
+def _sqlite_bytes(build) -> bytes:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "db"
+        conn = sqlite3.connect(path)
+        with conn:
+            build(conn)
+        conn.close()
+        return path.read_bytes()
+
+
+def _contacts_db(rng: random.Random, phones: List[str]) -> bytes:
+    def build(conn):
+        conn.execute("CREATE TABLE accounts (account_name TEXT, account_type TEXT)")
+        conn.execute("INSERT INTO accounts VALUES ('user@example.com', 'com.google')")
+        conn.execute("CREATE TABLE properties (property_key TEXT, property_value TEXT)")
+        conn.execute("INSERT INTO properties VALUES ('database_time_created', '1672531200000')")
+        conn.execute(
+            "CREATE TABLE contacts (_id INTEGER PRIMARY KEY, display_name TEXT, number TEXT, email TEXT, label TEXT, date_added INTEGER)"
+        )
+        conn.executemany(
+            "INSERT INTO contacts (display_name, number, email, label, date_added) VALUES (?, ?, ?, ?, ?)",
+            (
+                (f"Contact {i:05d}", phone, f"contact{i}@example.com" if i % 3 == 0 else None,
+                 rng.choice(("Family", "Work", "Friends", None)), MESSAGES_START_MS + rng.randrange(MESSAGES_SPAN_MS))
+                for i, phone in enumerate(phones)
+            ),
+        )
+    return _sqlite_bytes(build)
+
+
+def _calllog_db(rng: random.Random, phones: List[str], total: int) -> bytes:
+    def build(conn):
+        conn.execute(
+            "CREATE TABLE calls (_id INTEGER PRIMARY KEY, number TEXT, date INTEGER, duration INTEGER, type INTEGER, new INTEGER, countryiso TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO calls (number, date, duration, type, new, countryiso) VALUES (?, ?, ?, ?, 0, 'IR')",
+            (
+                (rng.choice(phones), MESSAGES_START_MS + i * (MESSAGES_SPAN_MS // total), rng.randrange(3600), rng.choice((1, 2, 3)))
+                for i in range(total)
+            ),
+        )
+    return _sqlite_bytes(build)
+
+
+def _prefs_xml(rng: random.Random, package: str) -> bytes:
+    entries = [f'    <string name="{package}.key{i}">{_words(rng, rng.randint(1, 6))}</string>' for i in range(rng.randint(2, 12))]
+    entries.append(f'    <boolean name="first_run" value="{rng.choice(("true", "false"))}" />')
+    entries.append(f'    <long name="last_sync" value="{MESSAGES_START_MS + rng.randrange(MESSAGES_SPAN_MS)}" />')
+    return ("<?xml version='1.0' encoding='utf-8' standalone='yes' ?>\n<map>\n" + "\n".join(entries) + "\n</map>\n").encode()
+
+
+# Binary XML (AXML) chunk types and the framework ids of the manifest attributes used below.
+_RES_STRING_POOL = 0x0001
+_RES_XML = 0x0003
+_RES_XML_START_NAMESPACE = 0x0100
+_RES_XML_END_NAMESPACE = 0x0101
+_RES_XML_START_ELEMENT = 0x0102
+_RES_XML_END_ELEMENT = 0x0103
+_RES_XML_RESOURCE_MAP = 0x0180
+_TYPE_STRING = 0x03
+_TYPE_INT_DEC = 0x10
+_NO_INDEX = 0xFFFFFFFF
+ANDROID_NS = "http://schemas.android.com/apk/res/android"
+_ANDROID_ATTRIBUTE_IDS = {"label": 0x01010001, "name": 0x01010003, "versionCode": 0x0101021B, "versionName": 0x0101021C}
+
+
+def _axml_manifest(package: str, label: str, version_code: int, permissions: List[str]) -> bytes:
+    """AndroidManifest.xml compiled to the binary form aapt writes, as much of it as APK readers need."""
+    strings = list(_ANDROID_ATTRIBUTE_IDS) + ["android", ANDROID_NS, "manifest", "package", "uses-permission", "application"]
+    index = {}
+
+    def ref(value: str) -> int:
+        if value not in index:
+            if value not in strings:
+                strings.append(value)
+            index[value] = strings.index(value)
+        return index[value]
+
+    version_name = f"{version_code // 100}.{version_code % 100}"
+    # (name, [(android attribute?, attribute, value)]) opens an element, None closes the innermost open one.
+    elements = [("manifest", [(True, "versionCode", version_code), (True, "versionName", version_name), (False, "package", package)])]
+    for permission in permissions:
+        elements += [("uses-permission", [(True, "name", permission)]), None]
+    elements += [("application", [(True, "label", label)]), None, None]
+    # Every string must be in the pool before it is written out.
+    for element in elements:
+        if element is not None:
+            ref(element[0])
+            for _, attribute, value in element[1]:
+                ref(attribute)
+                if isinstance(value, str):
+                    ref(value)
+    ns_prefix, ns_uri = ref("android"), ref(ANDROID_NS)
+
+    body = io.BytesIO()
+    body.write(struct.pack("<HHIIIII", _RES_XML_START_NAMESPACE, 16, 24, 1, _NO_INDEX, ns_prefix, ns_uri))
+    open_elements = []
+    for line, element in enumerate(elements, start=2):
+        if element is None:
+            name = open_elements.pop()
+            body.write(struct.pack("<HHIIIII", _RES_XML_END_ELEMENT, 16, 24, line, _NO_INDEX, _NO_INDEX, ref(name)))
+            continue
+        name, attributes = element
+        open_elements.append(name)
+        body.write(struct.pack("<HHII", _RES_XML_START_ELEMENT, 16, 36 + 20 * len(attributes), line))
+        body.write(struct.pack("<IIIHHHHHH", _NO_INDEX, _NO_INDEX, ref(name), 20, 20, len(attributes), 0, 0, 0))
+        for is_android, attribute, value in attributes:
+            namespace = ns_uri if is_android else _NO_INDEX
+            if isinstance(value, str):
+                body.write(struct.pack("<IIIHBBI", namespace, ref(attribute), ref(value), 8, 0, _TYPE_STRING, ref(value)))
+            else:
+                body.write(struct.pack("<IIIHBBI", namespace, ref(attribute), _NO_INDEX, 8, 0, _TYPE_INT_DEC, value))
+    body.write(struct.pack("<HHIIIII", _RES_XML_END_NAMESPACE, 16, 24, len(elements) + 2, _NO_INDEX, ns_prefix, ns_uri))
+
+    encoded = []
+    for value in strings:
+        data = value.encode("utf-16-le")
+        encoded.append(struct.pack("<H", len(value)) + data + b"\x00\x00")
+    offsets, position = [], 0
+    for data in encoded:
+        offsets.append(position)
+        position += len(data)
+    string_data = b"".join(encoded)
+    string_data += b"\x00" * (-len(string_data) % 4)
+    strings_start = 28 + 4 * len(strings)
+    pool = struct.pack("<HHIIIIII", _RES_STRING_POOL, 28, strings_start + len(string_data), len(strings), 0, 0, strings_start, 0)
+    pool += struct.pack(f"<{len(offsets)}I", *offsets) + string_data
+
+    ids = list(_ANDROID_ATTRIBUTE_IDS.values())
+    resource_map = struct.pack("<HHI", _RES_XML_RESOURCE_MAP, 8, 8 + 4 * len(ids)) + struct.pack(f"<{len(ids)}I", *ids)
+
+    chunks = pool + resource_map + body.getvalue()
+    return struct.pack("<HHI", _RES_XML, 8, 8 + len(chunks)) + chunks
+
+
+def _apk(rng: random.Random, package: str, size: int) -> bytes:
+    permissions = rng.sample((
+        "android.permission.INTERNET", "android.permission.CAMERA", "android.permission.READ_CONTACTS",
+        "android.permission.ACCESS_FINE_LOCATION", "android.permission.RECORD_AUDIO", "android.permission.READ_SMS",
+        "android.permission.POST_NOTIFICATIONS", "android.permission.VIBRATE",
+    ), rng.randint(1, 5))
+    manifest = _axml_manifest(package, package.rsplit(".", 1)[-1].title(), rng.randint(100, 99999), permissions)
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as apk:
+        for name, data, method in (
+            ("AndroidManifest.xml", manifest, zipfile.ZIP_DEFLATED),
+            ("classes.dex", b"dex\n035\x00" + rng.randbytes(max(size // 2, 64)), zipfile.ZIP_DEFLATED),
+            ("res/raw/asset.bin", rng.randbytes(max(size // 2, 64)), zipfile.ZIP_STORED),
+        ):
+            info = zipfile.ZipInfo(name, date_time=(2024, 1, 1, 0, 0, 0))
+            info.compress_type = method
+            apk.writestr(info, data)
+    return out.getvalue()
+
+
+def _members(size_bytes: int, seed: int, counts: Dict[str, int]) -> Iterator[Tuple[str, bytes]]:
+    """(path inside the backup tar, contents) of every file, in the layout `adb backup` uses."""
+    rng = random.Random(seed)
+    phones = [_phone(rng) for _ in range(counts["contacts"])]
+
+    for i, chunk in enumerate(_sms_chunks(rng, counts["sms"], phones)):
+        yield f"apps/{TELEPHONY_PACKAGE}/d_f/{i:06d}_sms_backup", chunk
+    yield f"apps/{CONTACTS_PACKAGE}/db/contacts2.db", _contacts_db(rng, phones)
+    yield f"apps/{CONTACTS_PACKAGE}/db/calllog.db", _calllog_db(rng, phones, counts["calls"])
+
+    packages = [f"com.example.app{i:04d}" for i in range(max(counts["apks"], -(-counts["prefs"] // PREFS_PER_APP)))]
+    for i in range(counts["prefs"]):
+        package = packages[i // PREFS_PER_APP]
+        yield f"apps/{package}/sp/{package}_prefs{i % PREFS_PER_APP}.xml", _prefs_xml(rng, package)
+
+    # Uploads keep only the file name, so every name below is unique to keep the counts checkable.
+    for package, size in zip(packages, _sizes(rng, counts["apks"], int(size_bytes * MEDIA_SHARES["apks"]))):
+        yield f"apps/{package}/a/{package}.apk", _apk(rng, package, size)
+    layout = {
+        "photos": "shared/0/DCIM/Camera/IMG_{:06d}.jpg",
+        "videos": "shared/0/DCIM/Camera/VID_{:06d}.mp4",
+        "audios": "shared/0/Recordings/Voice_{:06d}.m4a",
+        "documents": "shared/0/Documents/Scan_{:06d}.pdf",
+    }
+    for kind, pattern in layout.items():
+        for i, size in enumerate(_sizes(rng, counts[kind], int(size_bytes * MEDIA_SHARES[kind]))):
+            yield pattern.format(i), MEDIA_MAGIC[kind] + rng.randbytes(size)
+
+
+class _ZlibWriter:
+    """Write-only file object that deflates into `out`, for tarfile's stream mode."""
+
+    def __init__(self, out: BinaryIO):
+        self.out = out
+        self.compressor = zlib.compressobj(level=1)
+
+    def write(self, data: bytes) -> int:
+        self.out.write(self.compressor.compress(data))
+        return len(data)
+
+    def close(self) -> None:
+        self.out.write(self.compressor.flush())
+
+
+def write_synthetic_ab(path, size_bytes: int, seed: int = 0) -> SyntheticBackup:
+    """
+    Write a realistic, unencrypted .ab of about `size_bytes` (before compression) to `path`:
+    SMS JSON blobs, contacts2.db and calllog.db, prefs, APKs and camera/recorder media.
+    The same size and seed always give the same bytes.
+    """
+    counts = _plan(size_bytes)
+    path = Path(path)
+    total = files = 0
+    with path.open("wb") as out:
+        out.write(AB_HEADER)
+        stream = _ZlibWriter(out)
+        with tarfile.open(fileobj=stream, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+            for name, data in _members(size_bytes, seed, counts):
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = ARCHIVE_MTIME
+                info.mode = 0o600
+                tar.addfile(info, io.BytesIO(data))
+                total += len(data)
+                files += 1
+        stream.close()
+    return SyntheticBackup(path=path, size_bytes=total, files=files, **counts)
@@ -1,10 +1,17 @@
 from celery import shared_task
+from celery.signals import heartbeat_sent
 from .models import Backup
 from . import utils
 import logging
 import tempfile
 from pathlib import Path
-from .utils import minio_client
+from .storage import get_storage
+from .metrics import StageTimer
+from .profiling import profiled
+from .reparse import reparse_backup
+from .admission import report_scratch_usage
+from .locks import Lease, PROCESS_STAGE, current_job
+from .scheduling import acquire_user_slot, priority_for, queue_for, release_user_slot, SLOT_RETRY_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -12,22 +19,78 @@ logger = logging.getLogger(__name__)
 
 ORIGINAL_BUCKET_NAME = "original-files"
 
-@shared_task
-def process_backup_task(backup_id: int):
+@heartbeat_sent.connect
+def _report_scratch_usage(sender=None, **kwargs):
+    report_scratch_usage()
+
+
+def enqueue_backup_processing(backup_id: int, size_bytes: int):
+    """
+    Queue processing on the small or large queue, prioritised by the size of the original.
+    If the backup is already being processed, return that job instead of queueing another.
+    """
+    running = current_job(backup_id, PROCESS_STAGE)
+    if running:
+        return process_backup_task.AsyncResult(running)
+    return process_backup_task.apply_async((backup_id,), queue=queue_for(size_bytes), priority=priority_for(size_bytes))
+
+
+@shared_task(bind=True, max_retries=None)
+def process_backup_task(self, backup_id: int, profile: bool = False):
+    """Unwrap, extract and store one backup. `profile` captures a profile even if the backup doesn't ask for one."""
+    lease = Lease(backup_id, PROCESS_STAGE, job=self.request.id or "")
     try:
-        backup = Backup.objects.get(id=backup_id)
+        acquired = lease.acquire()
+    except Exception as e:
+        logger.warning("Processing backup %s without a lease: %s", backup_id, e)
+        lease, acquired = None, True
+    if not acquired:
+        running = current_job(backup_id, PROCESS_STAGE)
+        logger.info("Backup %s is already being processed by task %s; not starting it twice", backup_id, running)
+        return {"status": "attached", "task_id": running}
+
+    try:
+        user_id = Backup.objects.filter(id=backup_id).values_list("user_id", flat=True).first()
+        if user_id is None or self.request.called_directly:
+            return _process_backup(backup_id, profile, self.request.id or "")
+        if not acquire_user_slot(user_id, backup_id):
+            # Keep the lease while waiting for a slot; the retry runs under the same task id and takes it over.
+            if lease is not None:
+                lease.hand_over(SLOT_RETRY_SECONDS)
+                lease = None
+            raise self.retry(countdown=SLOT_RETRY_SECONDS)
+        try:
+            return _process_backup(backup_id, profile, self.request.id or "")
+        finally:
+            release_user_slot(user_id, backup_id)
+    finally:
+        if lease is not None:
+            lease.release()
 
-        if not backup.original_minio_path:
-            raise ValueError("Uploaded backup file path is missing.")
 
+def _run_pipeline(backup: Backup) -> dict:
+    with StageTimer("process") as stage:
         with tempfile.NamedTemporaryFile(delete=False, suffix=".ab") as tmp_file:
-            response = minio_client.get_object(ORIGINAL_BUCKET_NAME, backup.original_minio_path)
-            tmp_file.write(response.read())
             tmp_file_path = Path(tmp_file.name)
+        with StageTimer("download") as download:
+            get_storage().get_file(ORIGINAL_BUCKET_NAME, backup.original_minio_path, tmp_file_path)
+            download.bytes = stage.bytes = tmp_file_path.stat().st_size
 
         stats = utils.process_ab_file(str(tmp_file_path), backup.id)
+        stage.entries = sum(stats.values())
+
+    tmp_file_path.unlink(missing_ok=True)
+    return stats
 
-        tmp_file_path.unlink(missing_ok=True)
+
+def _process_backup(backup_id: int, profile: bool = False, job: str = ""):
+    try:
+        backup = Backup.objects.get(id=backup_id)
+
+        if not backup.original_minio_path:
+            raise ValueError("Uploaded backup file path is missing.")
+
+        stats = profiled(backup, PROCESS_STAGE, lambda: _run_pipeline(backup), force=profile, job=job)()
 
         backup.processed = True
         backup.error_message = None
@@ -45,3 +108,16 @@ def process_backup_task(backup_id: int):
         except Exception:
             pass
         return {"status": "error", "error": str(exc)}
+
+
+@shared_task
+def reparse_backups_task(jobs):
+    """Re-parse one shard of [[backup_id, [parser, ...]], ...], one backup at a time."""
+    results = {}
+    for backup_id, parsers in jobs:
+        try:
+            results[str(backup_id)] = {"status": "success", "counts": reparse_backup(backup_id, parsers)}
+        except Exception as exc:
+            logger.exception("Error re-parsing backup %s", backup_id)
+            results[str(backup_id)] = {"status": "error", "error": str(exc)}
+    return results
@@ -1,3 +1,988 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import zipfile
+import zlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from importlib.util import find_spec
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+import redis
+from celery.exceptions import Retry
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from . import admission, locks, metrics, request_profiling, response_cache, scheduling, signing, storage, tasks
+from .admission import declared_size
+from .benchmark import run_benchmark
+from .incremental import backup_rows, conversation_messages, insert_new_rows
+from .locks import JobRunning, Lease, PROCESS_STAGE, current_job, run_exclusive
+from .media_archive import stream_media_zip
+from .models import App, Backup, BackupSummary, CallLog, Contact, Conversation, MediaFile, Message, ParserRun, UploadQuota, UploadSession
+from .response_cache import bump_data_version, get_data_version
+from .parser import calllog_parser, contacts_parser, sms_parser
+from .reparse import PARSERS, reparse_backup
+from .scheduling import acquire_user_slot
+from .synthetic import AB_HEADER, write_synthetic_ab
+from .utils import phone_search_key
 
-# Create your tests here.
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class ImportTimeTests(SimpleTestCase):
+    """Web processes, workers and management commands must start without loading the heavy dependencies."""
+
+    ENTRYPOINTS = ("backup.urls", "backup.tasks", "backup.management.commands.reparse")
+    LAZY_MODULES = ("androguard", "libarchive", "minio")
+    BUDGET_SECONDS = 1.0
+
+    def importtime(self, module):
+        """{module: cumulative import seconds} as reported by `python -X importtime`, after django.setup()."""
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import django; django.setup(); import {module}"],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "config.settings")},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        timings = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line.split("|")
+            timings[name.strip()] = int(cumulative) / 1_000_000
+        return timings
+
+    def test_heavy_dependencies_are_not_imported(self):
+        for entrypoint in self.ENTRYPOINTS:
+            timings = self.importtime(entrypoint)
+            for module in self.LAZY_MODULES:
+                with self.subTest(entrypoint=entrypoint, module=module):
+                    self.assertNotIn(module, timings)
+
+    def test_modules_import_first(self):
+        # Each in a fresh interpreter, so nothing else has imported its dependencies beforehand.
+        for module in ("backup.metrics", "backup.parser_runs", "backup.utils"):
+            with self.subTest(module=module):
+                self.assertIn(module, self.importtime(module))
+
+    def test_views_import_within_budget(self):
+        timings = self.importtime("backup.views")
+        self.assertLess(timings["backup.views"], self.BUDGET_SECONDS)
+
+
+class SyntheticBackupTests(SimpleTestCase):
+    SIZE_BYTES = 2 * 2**20
+
+    def test_same_seed_writes_same_bytes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first = write_synthetic_ab(Path(tmp) / "a.ab", self.SIZE_BYTES, seed=7)
+            second = write_synthetic_ab(Path(tmp) / "b.ab", self.SIZE_BYTES, seed=7)
+            third = write_synthetic_ab(Path(tmp) / "c.ab", self.SIZE_BYTES, seed=8)
+            self.assertEqual(first.path.read_bytes(), second.path.read_bytes())
+            self.assertNotEqual(first.path.read_bytes(), third.path.read_bytes())
+
+    def test_archive_holds_what_it_reports(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            synthetic = write_synthetic_ab(Path(tmp) / "s.ab", self.SIZE_BYTES)
+            raw = synthetic.path.read_bytes()
+        self.assertTrue(raw.startswith(AB_HEADER))
+        with tarfile.open(fileobj=io.BytesIO(zlib.decompress(raw[len(AB_HEADER):]))) as tar:
+            members = {member.name: tar.extractfile(member).read() for member in tar}
+
+        self.assertEqual(len(members), synthetic.files)
+        self.assertEqual(sum(len(data) for data in members.values()), synthetic.size_bytes)
+        self.assertEqual(len({name.rsplit("/", 1)[-1] for name in members}), synthetic.files)
+        messages = [
+            message for name, data in members.items() if name.endswith("_sms_backup")
+            for message in json.loads(zlib.decompress(data))
+        ]
+        self.assertEqual(len(messages), synthetic.sms)
+        self.assertEqual(sum(name.endswith(".apk") for name in members), synthetic.apks)
+        self.assertEqual(sum("/sp/" in name for name in members), synthetic.prefs)
+        self.assertIn("apps/com.android.providers.contacts/db/contacts2.db", members)
+        self.assertIn("apps/com.android.providers.contacts/db/calllog.db", members)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LocalStorageTestCase(TestCase):
+    """Runs against the local storage engine in a temporary directory."""
+
+    def setUp(self):
+        root = tempfile.mkdtemp(prefix="backup-tests-")
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        overridden = override_settings(BACKUP_STORAGE_ENGINE="backup.storage.LocalStorage", BACKUP_STORAGE_ROOT=root)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        storage.get_storage.cache_clear()
+        self.addCleanup(storage.get_storage.cache_clear)
+        self.user = User.objects.create(username="tests")
+
+    def put(self, key: str, data: bytes) -> None:
+        storage.get_storage().put("backups", key, io.BytesIO(data), len(data))
+
+    def put_sqlite(self, key: str, create: str, insert: str, rows) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "data.db"
+            with sqlite3.connect(path) as conn:
+                conn.execute(create)
+                conn.executemany(insert, rows)
+            conn.close()
+            self.put(key, path.read_bytes())
+
+    def put_device_data(self, backup: Backup, contacts, calls, messages) -> None:
+        self.put_sqlite(
+            f"{backup.id}/databases/contacts2.db",
+            "CREATE TABLE contacts (name TEXT, phone_number TEXT, email TEXT, created_at INTEGER)",
+            "INSERT INTO contacts VALUES (?, ?, ?, 1700000000000)", contacts,
+        )
+        self.put_sqlite(
+            f"{backup.id}/databases/calllog.db",
+            "CREATE TABLE calls (number TEXT, date INTEGER, type INTEGER, duration INTEGER)",
+            "INSERT INTO calls VALUES (?, ?, ?, ?)", calls,
+        )
+        sms = [
+            {"address": address, "date": str(date), "date_sent": str(date), "body": body, "type": "1", "status": "0"}
+            for address, date, body in messages
+        ]
+        self.put(f"{backup.id}/others/device_sms_backup", zlib.compress(json.dumps(sms).encode()))
+
+    def parse(self, backup: Backup) -> dict:
+        return {
+            "contacts": contacts_parser.store_contacts(backup, contacts_parser.scan_and_extract_contacts_minio(backup)),
+            "calllog": calllog_parser.store_calllogs(backup, calllog_parser.scan_and_extract_calllogs_minio(backup)),
+            "sms": sms_parser.parse_and_save_sms_minio(backup),
+        }
+
+
+class LocalStorageTests(LocalStorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage = storage.get_storage()
+        self.put("1/photos/a.jpg", b"photo")
+        self.put("1/photos/b.jpg", b"other")
+
+    def test_keys_cannot_escape_their_bucket(self):
+        for bucket, key in [("backups", "../original-files/a.ab"), ("backups", "1/../../etc/passwd"), ("..", "etc/passwd"), ("a/b", "c")]:
+            with self.subTest(bucket=bucket, key=key):
+                with self.assertRaises(storage.StorageError):
+                    self.storage.local_path(bucket, key)
+        with self.assertRaises(storage.StorageError):
+            self.storage.put("backups", "../escaped", io.BytesIO(b"x"), 1)
+
+    def test_reads_and_listing(self):
+        self.assertEqual(self.storage.get("backups", "1/photos/a.jpg"), b"photo")
+        self.assertEqual(self.storage.get_range("backups", "1/photos/a.jpg", 1, 3), b"hot")
+        self.assertEqual([obj.object_name for obj in self.storage.list("backups", "1/photos/")], ["1/photos/a.jpg", "1/photos/b.jpg"])
+        with self.assertRaises(storage.ObjectNotFound):
+            self.storage.open("backups", "1/photos/missing.jpg")
+
+    def test_presigned_urls_are_checked(self):
+        url = self.storage.presign_get("backups", "1/photos/a.jpg", timedelta(minutes=5))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"photo")
+
+        path, query = url.split("?")
+        params = parse_qs(query)
+        for name, forged in [
+            ("other key", path.replace("a.jpg", "b.jpg") + "?" + query),
+            ("bad signature", f"{path}?expires={params['expires'][0]}&signature=forged"),
+            ("later expiry", f"{path}?expires={int(params['expires'][0]) + 3600}&signature={params['signature'][0]}"),
+            ("expired", self.storage.presign_get("backups", "1/photos/a.jpg", timedelta(minutes=5), datetime(2020, 1, 1, tzinfo=dt_timezone.utc))),
+        ]:
+            with self.subTest(name):
+                self.assertEqual(self.client.get(forged).status_code, 403)
+
+
+class PresignCacheTests(LocalStorageTestCase):
+    NAMES = ["1/photos/a.jpg", "1/photos/b.jpg"]
+    WINDOW_START = 1_700_000_000 - 1_700_000_000 % signing.SIGNING_WINDOW_SECONDS
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        patch = mock.patch.object(
+            storage.LocalStorage, "presign_get", autospec=True, side_effect=storage.LocalStorage.presign_get
+        )
+        self.presign_get = patch.start()
+        self.addCleanup(patch.stop)
+
+    def sign(self, at, names=NAMES):
+        with mock.patch.object(signing.time, "time", return_value=at):
+            return signing.sign_objects(names)
+
+    def test_urls_are_signed_once_per_window(self):
+        first = self.sign(self.WINDOW_START + 10)
+        self.assertEqual(self.presign_get.call_count, 2)
+        self.assertEqual(self.sign(self.WINDOW_START + 3000), first)
+        self.assertEqual(self.presign_get.call_count, 2)
+
+        later = self.sign(self.WINDOW_START + signing.SIGNING_WINDOW_SECONDS)
+        self.assertEqual(self.presign_get.call_count, 4)
+        self.assertNotEqual(later, first)
+
+    def test_urls_match_across_processes_without_the_cache(self):
+        first = self.sign(self.WINDOW_START + 10)
+        cache.clear()
+        self.assertEqual(self.sign(self.WINDOW_START + 20), first)
+
+    def test_cache_outage_and_signing_failures(self):
+        with mock.patch.object(cache, "get_many", side_effect=ConnectionError("down")):
+            self.assertEqual(set(self.sign(self.WINDOW_START)), set(self.NAMES))
+
+        self.presign_get.side_effect = storage.StorageError("down")
+        self.assertEqual(self.sign(self.WINDOW_START + 10, ["1/photos/new.jpg"]), {"1/photos/new.jpg": None})
+
+
+class IdempotentParseTests(LocalStorageTestCase):
+    CONTACTS = [
+        ("Sara", "00989121234567", None),
+        ("Sara", "+98 912 123 4567", None),  # the same number, normalized
+        ("Sara", "+989121234567", "sara@example.com"),
+        ("Reza", "09350000000", None),
+    ]
+    CALLS = [
+        ("+989121234567", 1700000000123, 1, 60),
+        ("00989121234567", 1700000000123, 1, 60),
+        ("+989121234567", 1700000000456, 1, 60),  # same second, another call
+    ]
+    MESSAGES = [
+        ("+989121234567", 1700000000000, "hi"),
+        ("00989121234567", 1700000000000, "hi"),
+        ("09350000000", 1700000100000, "yo"),
+    ]
+
+    def test_parsing_twice_stores_and_counts_each_record_once(self):
+        backup = Backup.objects.create(user=self.user, original_minio_path="tests/a.ab")
+        self.put_device_data(backup, self.CONTACTS, self.CALLS, self.MESSAGES)
+
+        self.assertEqual(self.parse(backup), {"contacts": 3, "calllog": 2, "sms": 2})
+        self.assertEqual(self.parse(backup), {"contacts": 0, "calllog": 0, "sms": 0})
+
+        self.assertEqual(Contact.objects.filter(backup=backup).count(), 3)
+        self.assertEqual(CallLog.objects.filter(backup=backup).count(), 2)
+        self.assertEqual(Message.objects.filter(backup=backup).count(), 2)
+        summary = BackupSummary.objects.get(backup=backup)
+        self.assertEqual((summary.contact_count, summary.call_count, summary.message_count), (3, 2, 2))
+        self.assertEqual(
+            dict(ParserRun.objects.filter(backup=backup).values_list("parser", "row_count")),
+            {"contacts": 3, "calllog": 2, "sms": 2},
+        )
+        self.assertEqual(
+            dict(Conversation.objects.filter(backup=backup).values_list("counterpart", "message_count")),
+            {"+989121234567": 1, "09350000000": 1},
+        )
+
+    def test_conversations_are_written_in_bulk_and_only_when_changed(self):
+        backup = Backup.objects.create(user=self.user, original_minio_path="tests/a.ab")
+        self.put_device_data(backup, [], [], self.MESSAGES + [("bad number", 1700000300000, "x")])
+        table = Conversation._meta.db_table
+
+        def conversation_writes():
+            with CaptureQueriesContext(connection) as queries:
+                sms_parser.parse_and_save_sms_minio(backup)
+            return [
+                query["sql"].split()[0] for query in queries.captured_queries
+                if f'"{table}"' in query["sql"] and not query["sql"].startswith("SELECT")
+            ]
+
+        self.assertEqual(conversation_writes(), ["INSERT", "UPDATE"])
+        self.assertEqual(conversation_writes(), [])
+        self.assertEqual(Conversation.objects.filter(backup=backup).count(), 2)
+
+    def test_insert_returns_only_new_rows_with_their_own_ids(self):
+        backup = Backup.objects.create(user=self.user, original_minio_path="tests/a.ab")
+        Contact.objects.create(backup=backup, name="old", phone_number="1", content_hash="b")
+        rows = [
+            Contact(backup=backup, name=name, phone_number="1", content_hash=row_hash)
+            for name, row_hash in [("c", "c"), ("dup", "b"), ("a", "a"), ("again", "a"), ("x", ""), ("y", "")]
+        ]
+        inserted = insert_new_rows(Contact, rows, "content_hash")
+        self.assertEqual(sorted(row.name for row in inserted), ["a", "c", "x", "y"])
+        stored = dict(Contact.objects.filter(backup=backup).values_list("id", "name"))
+        self.assertEqual({row.pk: row.name for row in inserted}, {pk: name for pk, name in stored.items() if name != "old"})
+
+
+class IncrementalBackupTests(LocalStorageTestCase):
+    """A newer backup of a device stores only its delta but still reads, counts and diffs as a whole."""
+
+    CONTACTS = [("Sara", "+989121234567", None), ("Reza", "09350000000", None), ("Ali", "09120000000", None)]
+    CALLS = [("+989121234567", 1700000000000, 1, 60), ("09350000000", 1700000100000, 2, 30)]
+    MESSAGES = [("+989121234567", 1700000000000, "hi"), ("+989121234567", 1700000200000, "bye"), ("09350000000", 1700000100000, "yo")]
+
+    def setUp(self):
+        super().setUp()
+        self.older = Backup.objects.create(user=self.user, original_minio_path="tests/old.ab", device_id="phone")
+        self.newer = Backup.objects.create(user=self.user, original_minio_path="tests/new.ab", device_id="phone")
+        self.put_device_data(self.older, self.CONTACTS, self.CALLS, self.MESSAGES)
+        # Ali was deleted from the phone, Nima and a new message arrived.
+        self.put_device_data(
+            self.newer,
+            self.CONTACTS[:2] + [("Nima", "09190000000", None)],
+            self.CALLS,
+            self.MESSAGES + [("09350000000", 1700000300000, "later")],
+        )
+        self.parse(self.older)
+        self.assertEqual(self.parse(self.newer), {"contacts": 3, "calllog": 2, "sms": 4})
+
+    def diff(self, dataset: str) -> dict:
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse("backup-diff", args=[self.newer.id, self.older.id]), {"dataset": dataset})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assert_newer_backup_is_complete(self):
+        self.assertEqual(
+            sorted(backup_rows(Contact, self.newer).values_list("name", flat=True)), ["Nima", "Reza", "Sara"]
+        )
+        self.assertEqual(backup_rows(CallLog, self.newer).count(), 2)
+        self.assertEqual(backup_rows(Message, self.newer).count(), 4)
+        summary = BackupSummary.objects.get(backup=self.newer)
+        self.assertEqual((summary.contact_count, summary.call_count, summary.message_count), (3, 2, 4))
+
+        conversations = {c.counterpart: c for c in Conversation.objects.filter(backup=self.newer)}
+        self.assertEqual({counterpart: c.message_count for counterpart, c in conversations.items()}, {"+989121234567": 2, "09350000000": 2})
+        self.assertEqual(
+            sorted(conversation_messages(conversations["09350000000"]).values_list("content", flat=True)), ["later", "yo"]
+        )
+
+    def test_newer_backup_stores_only_its_delta(self):
+        self.assertEqual(Contact.objects.filter(backup=self.newer).count(), 1)
+        self.assertEqual(CallLog.objects.filter(backup=self.newer).count(), 0)
+        self.assertEqual(Message.objects.filter(backup=self.newer).count(), 1)
+        self.assert_newer_backup_is_complete()
+
+    def test_lists_report_the_requested_backup_without_internal_columns(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for name in ("contact-list", "calllog-list"):
+            with self.subTest(view=name):
+                url = reverse(name, args=[self.newer.id])
+                rows = client.get(url).json()["results"]
+                self.assertTrue(rows)
+                self.assertEqual({row["backup"] for row in rows}, {self.newer.id})
+                self.assertTrue(all("content_hash" not in row for row in rows))
+                self.assertEqual(client.get(url, {"fields": "content_hash"}).status_code, 400)
+
+    def test_diff_reports_only_what_changed(self):
+        contacts = self.diff("contacts")
+        self.assertEqual((contacts["added_count"], contacts["removed_count"]), (1, 1))
+        self.assertEqual([row["name"] for row in contacts["added"]], ["Nima"])
+        calls = self.diff("calllogs")
+        self.assertEqual((calls["added_count"], calls["removed_count"]), (0, 0))
+        messages = self.diff("messages")
+        self.assertEqual((messages["added_count"], messages["removed_count"]), (1, 0))
+        self.assertEqual([row["content"] for row in messages["added"]], ["later"])
+
+    def test_deleting_the_older_backup_keeps_the_newer_complete(self):
+        self.older.delete()
+
+        self.assertEqual(Contact.objects.filter(backup=self.newer).count(), 3)
+        self.assertEqual(CallLog.objects.filter(backup=self.newer).count(), 2)
+        self.assertEqual(Message.objects.filter(backup=self.newer).count(), 4)
+        self.assertFalse(Message.objects.filter(conversation__isnull=True).exists())
+        self.assertEqual(Contact.objects.count(), 3)
+        self.assert_newer_backup_is_complete()
+
+    def test_reparsing_the_older_backup_keeps_the_newer_complete(self):
+        counts = reparse_backup(self.older.id, ["contacts", "calllog", "sms"])
+
+        self.assertEqual(counts, {"contacts": 3, "calllog": 2, "sms": 3})
+        self.assertEqual(backup_rows(Contact, self.older).count(), 3)
+        self.assertEqual(backup_rows(Message, self.older).count(), 3)
+        self.assert_newer_backup_is_complete()
+
+
+class MediaArchiveTests(LocalStorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.backup = Backup.objects.create(user=self.user, original_minio_path="tests/a.ab")
+        self.files = {f"{self.backup.id}/photos/{folder}/x.jpg": folder.encode() * 1000 for folder in ("a", "b", "c")}
+        for path, data in self.files.items():
+            self.put(path, data)
+            MediaFile.objects.create(backup=self.backup, file_name="x.jpg", media_type="photo", minio_path=path)
+
+    def test_bodies_are_downloaded_on_the_pool(self):
+        read_on, stream = [], storage._LocalFile.stream
+
+        def recording_stream(body, *args):
+            read_on.append(threading.current_thread())
+            return stream(body, *args)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch.object(storage._LocalFile, "stream", recording_stream):
+            response = client.get(reverse("media-zip", args=[self.backup.id]), {"type": "photo"})
+            archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+
+        self.assertEqual(
+            {info.filename: archive.read(info) for info in archive.infolist()},
+            {path.split("/", 1)[1]: data for path, data in self.files.items()},
+        )
+        self.assertEqual(len(read_on), 3)
+        self.assertNotIn(threading.main_thread(), read_on)
+
+    def test_entry_names_stay_unique(self):
+        other = Backup.objects.create(user=self.user, original_minio_path="tests/b.ab")
+        self.put(f"{other.id}/photos/a/x.jpg", b"other")
+        media = [
+            MediaFile(backup=self.backup, minio_path=f"{self.backup.id}/photos/a/x.jpg"),
+            MediaFile(backup=other, minio_path=f"{other.id}/photos/a/x.jpg"),
+        ]
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(stream_media_zip(media))))
+        self.assertEqual(archive.namelist(), ["photos/a/x.jpg", "photos/a/x (1).jpg"])
+        self.assertEqual(archive.read("photos/a/x (1).jpg"), b"other")
+
+
+class ExportTests(TestCase):
+    ROWS = 3000  # more than one query chunk and one write buffer
+
+    def setUp(self):
+        self.user = User.objects.create(username="tests")
+        self.backup = Backup.objects.create(user=self.user, original_minio_path="tests/a.ab")
+        Contact.objects.bulk_create(
+            Contact(backup=self.backup, name=f'Sara "{i}", سارا', phone_number=f"+98912{i:07d}", address="line 1\nline 2")
+            for i in range(self.ROWS)
+        )
+        App.objects.create(backup=self.backup, package_name="org.example", permissions=["android.permission.CAMERA"])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, dataset, **params):
+        response = self.client.get(reverse("export-data", args=[self.backup.id, dataset]), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content)
+
+    def test_csv_round_trips_through_gzip(self):
+        plain_response, plain = self.export("contacts", output="csv")
+        gzip_response, compressed = self.export("contacts", output="csv", compress="gzip")
+        self.assertEqual(plain_response["Content-Type"], "text/csv")
+        self.assertEqual(gzip_response["Content-Type"], "application/gzip")
+        self.assertIn('filename="backup-%d-contacts.csv.gz"' % self.backup.id, gzip_response["Content-Disposition"])
+        self.assertEqual(gzip.decompress(compressed), plain)
+
+        header, *rows = csv.reader(io.StringIO(plain.decode()))
+        self.assertEqual(header, ["id", "name", "phone_number", "email", "group", "address", "created_at"])
+        self.assertEqual(len(rows), self.ROWS)
+        self.assertEqual(rows[0][1:4], ['Sara "0", سارا', "+989120000000", ""])
+        self.assertEqual(rows[0][5], "line 1\nline 2")
+
+    def test_ndjson_keeps_json_values(self):
+        _, body = self.export("apps")
+        [app] = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(app["permissions"], ["android.permission.CAMERA"])
+        _, body = self.export("apps", output="csv")
+        self.assertIn('"[""android.permission.CAMERA""]"', body.decode())
+
+    def test_unknown_dataset_or_format(self):
+        self.assertEqual(self.client.get(reverse("export-data", args=[self.backup.id, "passwords"])).status_code, 400)
+        self.assertEqual(self.client.get(reverse("export-data", args=[self.backup.id, "contacts"]), {"output": "xml"}).status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FilterBackendTests(TestCase):
+    SARA, REZA = "+989121234567", "09350000000"
+
+    def setUp(self):
+        self.user = User.objects.create(username="tests")
+        self.backup = Backup.objects.create(user=self.user, original_minio_path="tests/a.ab")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        def at(day):
+            return datetime(2024, 1, day, tzinfo=dt_timezone.utc)
+
+        self.calls = {
+            name: CallLog.objects.create(backup=self.backup, phone_number=phone, call_type=kind, call_date=at(day), duration_seconds=seconds)
+            for name, phone, kind, day, seconds in [
+                ("sara-in", self.SARA, "incoming", 1, 30),
+                ("sara-missed", self.SARA, "missed", 2, 0),
+                ("reza-out", self.REZA, "outgoing", 3, 300),
+            ]
+        }
+        self.messages = {
+            name: Message.objects.create(backup=self.backup, sender=sender, receiver=receiver, sent_at=at(day), received_at=at(day + 1))
+            for name, sender, receiver, day in [
+                ("from-sara", self.SARA, None, 1),
+                ("to-sara", None, self.SARA, 2),
+                ("from-reza", self.REZA, None, 3),
+            ]
+        }
+
+    def assert_filters(self, url_name, rows, cases):
+        for params, expected in cases:
+            with self.subTest(params=params):
+                response = self.client.get(reverse(url_name, args=[self.backup.id]), {**params, "fields": "id"})
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertEqual({row["id"] for row in response.json()["results"]}, {rows[name].id for name in expected})
+
+    def test_call_log_filters(self):
+        self.assert_filters("calllog-list", self.calls, [
+            ({"phone": "0098 912 123 4567"}, ["sara-in", "sara-missed"]),
+            ({"call_type": "MISSED"}, ["sara-missed"]),
+            ({"min_duration": 30, "max_duration": 60}, ["sara-in"]),
+            ({"date_from": "2024-01-02T00:00:00Z"}, ["sara-missed", "reza-out"]),
+            ({"phone": self.SARA, "date_to": "2024-01-01T12:00:00Z"}, ["sara-in"]),
+        ])
+
+    def test_message_filters(self):
+        self.assert_filters("sms-list", self.messages, [
+            ({"phone": self.SARA}, ["from-sara", "to-sara"]),
+            ({"phone": self.SARA, "direction": "incoming"}, ["from-sara"]),
+            ({"direction": "outgoing"}, ["to-sara"]),
+            ({"sent_from": "2024-01-02T00:00:00Z", "sent_to": "2024-01-02T23:59:59Z"}, ["to-sara"]),
+            ({"received_from": "2024-01-04T00:00:00Z"}, ["from-reza"]),
+        ])
+
+    def test_invalid_values_are_rejected(self):
+        for url_name, params in [
+            ("calllog-list", {"call_type": "dropped"}),
+            ("calllog-list", {"min_duration": "-1"}),
+            ("calllog-list", {"date_from": "yesterday"}),
+            ("sms-list", {"direction": "sideways"}),
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get(reverse(url_name, args=[self.backup.id]), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(next(iter(params)), response.json())
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tests")
+        self.backup = Backup.objects.create(user=self.user, original_minio_path="tests/a.ab")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.noon = datetime(2024, 1, 1, 12, tzinfo=dt_timezone.utc)
+        self.earlier = datetime(2024, 1, 1, 11, tzinfo=dt_timezone.utc)
+        # Most events share one timestamp, so pages break inside runs of equal timestamps and kinds.
+        for at in [self.noon] * 3 + [self.earlier]:
+            Message.objects.create(backup=self.backup, sender="+989121234567", received_at=at)
+        for at in [self.noon] * 3 + [self.earlier]:
+            CallLog.objects.create(backup=self.backup, phone_number="+989121234567", call_type="incoming", call_date=at)
+
+    def expected(self, descending):
+        events = [(at, "message", pk) for pk, at in Message.objects.values_list("id", "received_at")]
+        events += [(at, "call", pk) for pk, at in CallLog.objects.values_list("id", "call_date")]
+        return [(kind, pk) for _, kind, pk in sorted(events, reverse=descending)]
+
+    def pages(self, **params):
+        seen, url = [], reverse("timeline", args=[self.backup.id])
+        while True:
+            body = self.client.get(url, {**params, "page_size": 3}).json()
+            seen += [(event["kind"], event["id"]) for event in body["results"]]
+            if body["next"] is None:
+                return seen
+            params = {**params, "cursor": parse_qs(urlsplit(body["next"]).query)["cursor"][0]}
+            params.pop("at", None)
+
+    def test_pages_cover_equal_timestamps_once_in_order(self):
+        for order in ("desc", "asc"):
+            with self.subTest(order=order):
+                self.assertEqual(self.pages(order=order), self.expected(order == "desc"))
+
+    def test_seeking_includes_events_at_the_timestamp(self):
+        self.assertEqual(self.pages(order="desc", at=self.noon.isoformat()), self.expected(True))
+        self.assertEqual(self.pages(order="asc", at=self.noon.isoformat()), self.expected(False)[2:])
+
+
+class AppPermissionTests(TestCase):
+    CAMERA, INTERNET, READ_SMS = ("android.permission." + name for name in ("CAMERA", "INTERNET", "READ_SMS"))
+
+    def setUp(self):
+        self.user = User.objects.create(username="tests")
+        self.first = Backup.objects.create(user=self.user, original_minio_path="tests/a.ab")
+        self.second = Backup.objects.create(user=self.user, original_minio_path="tests/b.ab")
+        stranger = Backup.objects.create(user=User.objects.create(username="other"), original_minio_path="tests/c.ab")
+        self.apps = {
+            name: App.objects.create(backup=backup, package_name=name, permissions=permissions)
+            for name, backup, permissions in [
+                ("camera", self.first, [self.CAMERA, self.INTERNET]),
+                ("notes", self.first, [self.INTERNET]),
+                ("chat", self.second, [self.INTERNET, self.READ_SMS]),
+                ("broken", self.second, {"not": "a list"}),
+                ("theirs", stranger, [self.CAMERA]),
+            ]
+        }
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def app_names(self, url, permission):
+        response = self.client.get(url, {"permission": permission})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row["package_name"] for row in response.json()["results"]]
+
+    def test_apps_are_found_by_contained_permission(self):
+        url = reverse("app-permissions")
+        self.assertEqual(self.app_names(url, "camera"), ["camera"])
+        self.assertEqual(self.app_names(url, self.INTERNET), ["camera", "notes", "chat"])
+        self.assertEqual(self.app_names(reverse("backup-app-permissions", args=[self.second.id]), "internet"), ["chat"])
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+    def test_histogram_counts_apps_and_backups_per_permission(self):
+        self.assertEqual(self.client.get(reverse("permission-histogram")).json()["results"], [
+            {"permission": self.INTERNET, "app_count": 3, "backup_count": 2},
+            {"permission": self.CAMERA, "app_count": 1, "backup_count": 1},
+            {"permission": self.READ_SMS, "app_count": 1, "backup_count": 1},
+        ])
+        self.assertEqual(self.client.get(reverse("backup-permission-histogram", args=[self.second.id])).json()["results"], [
+            {"permission": self.INTERNET, "app_count": 1, "backup_count": 1},
+            {"permission": self.READ_SMS, "app_count": 1, "backup_count": 1},
+        ])
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    BACKUP_STORAGE_ENGINE="backup.storage.LocalStorage",
+    ADMISSION_RETRY_AFTER_SECONDS=42,
+    ADMISSION_MAX_QUEUE_DEPTH=10,
+    ADMISSION_MAX_SCRATCH_USAGE=0.9,
+    ADMISSION_MAX_INFLIGHT_BYTES=1000,
+)
+class AdmissionTests(TestCase):
+    def setUp(self):
+        storage.get_storage.cache_clear()
+        self.addCleanup(storage.get_storage.cache_clear)
+        self.user = User.objects.create(username="tests")
+        UploadQuota.objects.create(user=self.user, max_pending_backups=2, max_pending_bytes=500)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.load = {"queue_depth": 0, "scratch_usage": 0.0}
+        for name in self.load:
+            patch = mock.patch.object(admission, name, side_effect=lambda name=name: self.load[name])
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def upload(self, size):
+        # The local engine has no multipart uploads, so an admitted session request ends in 501.
+        return self.client.post(reverse("upload-session-create"), {"file_name": "a.ab", "size": size}, format="json")
+
+    def pending(self, user, size):
+        Backup.objects.create(user=user, original_minio_path="tests/a.ab", size_bytes=size)
+
+    def assert_refused(self, response, status_code):
+        self.assertEqual(response.status_code, status_code)
+        self.assertEqual(response["Retry-After"], "42")
+
+    def test_user_limits_answer_429(self):
+        self.assertEqual(self.upload(10_000).status_code, 501)  # a single upload larger than the byte limit gets in
+        self.pending(self.user, 300)
+        self.assert_refused(self.upload(300), 429)
+        self.assertEqual(self.upload(200).status_code, 501)
+        self.pending(self.user, 100)
+        self.assert_refused(self.upload(1), 429)
+
+    def test_saturated_pipeline_answers_503(self):
+        for name, value in [("queue_depth", 10), ("scratch_usage", 0.95)]:
+            with self.subTest(signal=name), mock.patch.dict(self.load, {name: value}):
+                self.assert_refused(self.upload(1), 503)
+        self.pending(User.objects.create(username="other"), 900)
+        self.assert_refused(self.upload(200), 503)
+        self.assertEqual(self.upload(100).status_code, 501)
+
+    def test_declared_size(self):
+        factory = RequestFactory()
+        self.assertEqual(declared_size(factory.post("/", data=b"x" * 5, content_type="application/octet-stream")), 5)
+        self.assertEqual(declared_size(factory.get("/")), 0)
+        self.assertEqual(declared_size(factory.post("/", HTTP_CONTENT_LENGTH="lots")), 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="tests")
+        self.backup = Backup.objects.create(user=self.user, original_minio_path="tests/a.ab")
+        Contact.objects.create(backup=self.backup, name="Sara", phone_number="+989121234567")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("contact-list", args=[self.backup.id])
+
+    def test_unchanged_list_answers_304_until_the_backup_changes(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Contact.objects.create(backup=self.backup, name="Reza", phone_number="09350000000")
+        bump_data_version(self.backup.id)
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()["count"], 2)
+        self.assertNotEqual(changed["ETag"], etag)
+
+    def test_a_reader_seeding_an_old_version_cannot_undo_a_bump(self):
+        read_version = response_cache._database_version
+        bumped = []
+
+        def read_then_bump(backup_id):
+            version = read_version(backup_id)
+            if not bumped:
+                # A parse finishes between the reader's database read and its cache write.
+                bumped.append(True)
+                bump_data_version(backup_id)
+            return version
+
+        with mock.patch.object(response_cache, "_database_version", side_effect=read_then_bump):
+            self.assertEqual(get_data_version(self.backup.id), 1)
+        self.assertEqual(get_data_version(self.backup.id), 1)
+
+    def test_cache_outage_serves_uncached_responses(self):
+        with mock.patch.object(cache, "get", side_effect=ConnectionError("down")):
+            self.assertIsNone(get_data_version(self.backup.id))
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ContactSearchTests(TestCase):
+    CONTACTS = [("Zara", "09120000001"), ("Yas", "09120000002"), ("Ali", "09120000009"), ("Ali", "+98 912 000 0009")]
+
+    def setUp(self):
+        self.user = User.objects.create(username="tests")
+        self.backup = Backup.objects.create(user=self.user, original_minio_path="tests/a.ab")
+        for name, phone in self.CONTACTS:
+            Contact.objects.create(backup=self.backup, name=name, phone_number=phone, phone_search=phone_search_key(phone))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_limit_applies_after_ranking_by_name(self):
+        response = self.client.get(reverse("contact-search"), {"q": "0912", "limit": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["name"] for row in response.json()["results"]], ["Ali", "Yas"])
+
+    def test_contact_list_hides_the_search_key(self):
+        rows = self.client.get(reverse("contact-list", args=[self.backup.id])).json()["results"]
+        self.assertTrue(all("phone_search" not in row for row in rows))
+
+
+@skipUnless(find_spec("fakeredis") and find_spec("lupa"), "fakeredis with Lua support is needed for the lease scripts")
+@override_settings(CACHES=LOCMEM_CACHES)
+class LeaseTests(TestCase):
+    def setUp(self):
+        import fakeredis
+        self.redis = fakeredis.FakeRedis()
+        patches = [mock.patch.object(locks, "redis_client", self.redis)]
+        patches += [
+            mock.patch.object(script, "registered_client", self.redis)
+            for script in (locks._ACQUIRE, locks._RENEW, locks._RELEASE, scheduling._ACQUIRE_SCRIPT)
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        cache.clear()
+
+    def test_acquire_renew_release(self):
+        first, second = Lease(1, PROCESS_STAGE, "task-1"), Lease(1, PROCESS_STAGE, "task-2")
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertEqual(current_job(1, PROCESS_STAGE), "task-1")
+        self.assertEqual(locks._RENEW(keys=[first.key], args=[first.token, 5000]), 1)
+        self.assertEqual(locks._RENEW(keys=[first.key], args=[second.token, 5000]), 0)
+
+        first.release()
+        self.assertIsNone(current_job(1, PROCESS_STAGE))
+        self.assertTrue(second.acquire())
+        second.release()
+
+    def test_duplicate_attaches_to_the_running_job(self):
+        holder = Lease(1, "parse:sms")
+        self.assertTrue(holder.acquire())
+
+        def finish():
+            cache.set(locks._result_key(holder, holder.token), {"result": 7})
+            holder.release()
+
+        run = mock.Mock(return_value=1)
+        with self.assertRaises(JobRunning):
+            run_exclusive(1, "parse:sms", run, attach=False)
+        threading.Timer(0.2, finish).start()
+        with mock.patch.object(locks, "ATTACH_POLL_SECONDS", 0.05):
+            self.assertEqual(run_exclusive(1, "parse:sms", run), 7)
+        run.assert_not_called()
+
+    @override_settings(BACKUP_USER_CONCURRENCY=1)
+    def test_lease_is_kept_while_waiting_for_a_slot(self):
+        user = User.objects.create(username="tests")
+        waiting = Backup.objects.create(user=user, original_minio_path="tests/a.ab")
+        self.assertTrue(acquire_user_slot(user.id, "other"))
+
+        with mock.patch.object(tasks.process_backup_task, "retry", side_effect=Retry()):
+            tasks.process_backup_task.apply((waiting.id,), task_id="task-1")
+        self.assertEqual(current_job(waiting.id, PROCESS_STAGE), "task-1")
+        self.assertGreater(self.redis.pttl(Lease(waiting.id, PROCESS_STAGE).key), locks.LEASE_TTL_SECONDS * 1000)
+
+        with mock.patch.object(tasks.process_backup_task, "apply_async") as apply_async:
+            self.assertEqual(tasks.enqueue_backup_processing(waiting.id, 1024).id, "task-1")
+        apply_async.assert_not_called()
+        self.assertFalse(Lease(waiting.id, PROCESS_STAGE, "task-2").acquire())
+
+        retry = Lease(waiting.id, PROCESS_STAGE, "task-1")
+        self.assertTrue(retry.acquire())
+        retry.release()
+
+
+@skipUnless(find_spec("minio"), "the MinIO SDK is not installed")
+@override_settings(BACKUP_STORAGE_ENGINE="backup.storage.MinioStorage")
+class MinioMultipartTests(TestCase):
+    """Upload sessions against an autospec of the pinned SDK client, so renamed or re-signed calls fail here."""
+
+    PART_SIZE = 5 * 2**20
+
+    def setUp(self):
+        patch = mock.patch("minio.Minio", autospec=True)
+        self.client = patch.start().return_value
+        self.addCleanup(patch.stop)
+        storage.get_storage.cache_clear()
+        self.addCleanup(storage.get_storage.cache_clear)
+        self.client._create_multipart_upload.return_value = "upload-1"
+
+        self.user = User.objects.create(username="tests")
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        with mock.patch("backup.views.check_admission"):
+            response = self.api.post(
+                reverse("upload-session-create"), {"file_name": "a.ab", "size": self.PART_SIZE + 10, "part_size": self.PART_SIZE}, format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+        self.session = UploadSession.objects.get(pk=response.json()["id"])
+
+    def list_parts(self, *parts):
+        from minio.datatypes import ListPartsResult
+
+        xml = "<ListPartsResult><IsTruncated>false</IsTruncated>{}</ListPartsResult>".format("".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag><Size>{size}</Size></Part>"
+            for number, etag, size in parts
+        ))
+        self.client._list_parts.return_value = ListPartsResult(mock.Mock(data=xml.encode()))
+
+    def complete(self):
+        with mock.patch("backup.upload_sessions.enqueue_backup_processing") as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.api.post(reverse("upload-session-complete", args=[self.session.id]))
+        return response, enqueue
+
+    def test_part_urls_sign_the_upload_id(self):
+        self.client.get_presigned_url.return_value = "https://minio/part"
+        response = self.api.post(reverse("upload-session-parts", args=[self.session.id]), {"part_numbers": [2]}, format="json")
+        self.assertEqual(response.json()["urls"], {"2": "https://minio/part"})
+        self.assertEqual(
+            self.client.get_presigned_url.call_args.kwargs["extra_query_params"], {"uploadId": "upload-1", "partNumber": "2"}
+        )
+
+    def test_complete_stitches_the_parts_and_queues_processing(self):
+        from minio.datatypes import Part
+
+        self.list_parts((1, "e1", self.PART_SIZE), (2, "e2", 10))
+        response, enqueue = self.complete()
+        self.assertEqual(response.status_code, 200)
+        self.client._complete_multipart_upload.assert_called_once_with(
+            "original-files", self.session.object_key, "upload-1", [Part(1, "e1"), Part(2, "e2")]
+        )
+        enqueue.assert_called_once_with(self.session.backup_id, self.PART_SIZE + 10)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, "completed")
+
+    def test_complete_reports_missing_parts(self):
+        self.list_parts((1, "e1", self.PART_SIZE))
+        response, enqueue = self.complete()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["missing_parts"], ["2"])
+        self.client._complete_multipart_upload.assert_not_called()
+        enqueue.assert_not_called()
+
+    def test_abort(self):
+        self.assertEqual(self.api.delete(reverse("upload-session-detail", args=[self.session.id])).status_code, 204)
+        self.client._abort_multipart_upload.assert_called_once_with("original-files", self.session.object_key, "upload-1")
+
+
+class MetricsTests(SimpleTestCase):
+    def redis(self, **methods):
+        return mock.patch.object(metrics, "_redis", return_value=mock.Mock(**methods))
+
+    def test_render_exposes_recorded_samples(self):
+        recorded = {b"backup_stage_runs_total|stage=parse:sms": b"3", b"backup_rows_inserted_total|parser=sms": b"12.0"}
+        with self.redis(hgetall=mock.Mock(return_value=recorded)):
+            text = metrics.render()
+        self.assertIn("backup_metrics_up 1\n", text)
+        self.assertIn('backup_stage_runs_total{stage="parse:sms"} 3\n', text)
+        self.assertIn('backup_rows_inserted_total{parser="sms"} 12\n', text)
+        self.assertIn("# TYPE backup_stage_duration_seconds histogram\n", text)
+
+    def test_redis_outage_is_scraped_as_down(self):
+        with self.redis(hgetall=mock.Mock(side_effect=redis.ConnectionError("down"))):
+            response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("backup_metrics_up 0\n", response.content.decode())
+
+    def test_redis_outage_does_not_fail_the_measured_work(self):
+        pipeline = mock.Mock(execute=mock.Mock(side_effect=redis.ConnectionError("down")))
+        with self.redis(pipeline=mock.Mock(return_value=pipeline)):
+            metrics.record_rows("sms", 5)
+            with metrics.StageTimer("parse:sms") as timer:
+                timer.entries = 5
+        self.assertEqual(pipeline.execute.call_count, 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, REQUEST_PROFILING="always")
+class RequestProfilingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tests")
+        self.backup = Backup.objects.create(user=self.user, original_minio_path="tests/a.ab")
+        Contact.objects.create(backup=self.backup, name="Sara", phone_number="+989121234567")
+        Conversation.objects.create(backup=self.backup, counterpart="+989121234567", message_count=1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def profile_of(self, url):
+        with mock.patch.object(request_profiling, "_record") as record:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("serializer;dur=", response["Server-Timing"])
+        (endpoint, profile, total, slow), _ = record.call_args
+        return profile
+
+    def test_serializer_time_is_counted_for_fast_and_serializer_lists(self):
+        for name in ("contact-list", "conversation-list"):
+            with self.subTest(view=name):
+                profile = self.profile_of(reverse(name, args=[self.backup.id]))
+                self.assertGreater(profile.serializer_seconds, 0)
+                self.assertGreater(profile.sql_queries, 0)
+
+    def test_serializers_are_not_patched(self):
+        self.client.get(reverse("contact-list", args=[self.backup.id]))
+        for cls in (serializers.Serializer, serializers.ListSerializer):
+            self.assertEqual(cls.data.fget.__module__, "rest_framework.serializers")
+
+
+@skipUnless(shutil.which("hoardy-adb"), "hoardy-adb is needed to unwrap .ab files")
+class IngestBenchmarkTests(TestCase):
+    """A small end-to-end run: every parser stores exactly what the generator put in the archive."""
+
+    def test_every_parser_stores_the_generated_rows(self):
+        synthetic, results = run_benchmark(size_mb=2, repeat=1)
+        self.assertEqual(set(results), {"process", *PARSERS})
+        for stage, result in results.items():
+            with self.subTest(stage=stage):
+                self.assertEqual(result["rows"], result["expected_rows"])
+                self.assertGreater(result["rows_per_s"], 0)
+                self.assertGreater(result["peak_rss_mib"], 0)
@@ -0,0 +1,120 @@
+import base64
+import heapq
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from .fast_read import datetime_to_representation
+from .incremental import backup_rows
+from .models import Backup, CallLog, Message
+
+
+MESSAGE_KIND = "message"
+CALL_KIND = "call"
+
+# Sentinels that sort before / after every real kind, used to seek to a point in time.
+KIND_MIN = ""
+KIND_MAX = "~"
+
+Cursor = Tuple[datetime, str, int]
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    timestamp, kind, pk = cursor
+    raw = json.dumps([timestamp.isoformat(), kind, pk]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(value: str) -> Cursor:
+    try:
+        timestamp, kind, pk = json.loads(base64.urlsafe_b64decode(value.encode("ascii")))
+        return datetime.fromisoformat(timestamp), str(kind), int(pk)
+    except Exception:
+        raise ValidationError({"cursor": "Invalid cursor."})
+
+
+def _keyset_q(field: str, kind: str, cursor: Optional[Cursor], descending: bool) -> Q:
+    """Rows of `kind` that come strictly after `cursor` in (timestamp, kind, id) order."""
+    if cursor is None:
+        return Q(**{f"{field}__isnull": False})
+
+    timestamp, cursor_kind, pk = cursor
+    after, after_or_equal, id_after = ("lt", "lte", "id__lt") if descending else ("gt", "gte", "id__gt")
+
+    kind_after = kind < cursor_kind if descending else kind > cursor_kind
+    if kind == cursor_kind:
+        return Q(**{f"{field}__{after}": timestamp}) | Q(**{field: timestamp, id_after: pk})
+    if kind_after:
+        return Q(**{f"{field}__{after_or_equal}": timestamp})
+    return Q(**{f"{field}__{after}": timestamp})
+
+
+def _message_events(backup: Backup, cursor, descending, limit, phone) -> List[dict]:
+    queryset = backup_rows(Message, backup).filter(_keyset_q("received_at", MESSAGE_KIND, cursor, descending))
+    if phone:
+        queryset = queryset.filter(Q(sender=phone) | Q(receiver=phone))
+    ordering = ("-received_at", "-id") if descending else ("received_at", "id")
+    rows = queryset.order_by(*ordering).values_list("id", "received_at", "sender", "receiver", "content", "message_type")[:limit]
+    return [
+        {
+            "kind": MESSAGE_KIND,
+            "id": pk,
+            "timestamp": received_at,
+            "phone_number": sender or receiver,
+            "direction": "incoming" if sender else "outgoing",
+            "content": content,
+            "message_type": message_type,
+        }
+        for pk, received_at, sender, receiver, content, message_type in rows
+    ]
+
+
+def _call_events(backup: Backup, cursor, descending, limit, phone) -> List[dict]:
+    queryset = backup_rows(CallLog, backup).filter(_keyset_q("call_date", CALL_KIND, cursor, descending))
+    if phone:
+        queryset = queryset.filter(phone_number=phone)
+    ordering = ("-call_date", "-id") if descending else ("call_date", "id")
+    rows = queryset.order_by(*ordering).values_list("id", "call_date", "phone_number", "call_type", "duration_seconds")[:limit]
+    return [
+        {
+            "kind": CALL_KIND,
+            "id": pk,
+            "timestamp": call_date,
+            "phone_number": phone_number,
+            "call_type": call_type,
+            "duration_seconds": duration_seconds,
+        }
+        for pk, call_date, phone_number, call_type, duration_seconds in rows
+    ]
+
+
+def _sort_key(event) -> tuple:
+    return event["timestamp"], event["kind"], event["id"]
+
+
+def fetch_timeline(backup: Backup, cursor: Optional[Cursor], limit: int, descending: bool = True, phone: str = "") -> Tuple[List[dict], Optional[Cursor]]:
+    """
+    k-way merge of the message and call streams. Each stream is read with a keyset
+    predicate and LIMIT, so a page costs two index range scans regardless of depth.
+    """
+    streams = [
+        _message_events(backup, cursor, descending, limit, phone),
+        _call_events(backup, cursor, descending, limit, phone),
+    ]
+    merged = heapq.merge(*streams, key=_sort_key, reverse=descending)
+    events = [event for _, event in zip(range(limit), merged)]
+
+    next_cursor = None
+    more = sum(len(stream) for stream in streams) > limit or any(len(stream) == limit for stream in streams)
+    if len(events) == limit and more:
+        next_cursor = _sort_key(events[-1])
+
+    for event in events:
+        event["timestamp"] = datetime_to_representation(event["timestamp"])
+    return events, next_cursor
+
+
+def seek_cursor(timestamp: datetime, descending: bool) -> Cursor:
+    """Pseudo cursor that starts a page at `timestamp` (inclusive)."""
+    return (timestamp, KIND_MAX, 0) if descending else (timestamp, KIND_MIN, 0)
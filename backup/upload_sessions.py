@@ -0,0 +1,123 @@
+import logging
+import math
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .models import Backup, UploadSession
+from .serializers import ORIGINAL_BUCKET_NAME, ensure_original_bucket, original_key
+from .tasks import enqueue_backup_processing
+from .storage import UploadedPart, get_storage
+
+
+# S3 multipart limits: every part but the last is at least 5 MiB, at most 5 GiB, and 10,000 parts per upload.
+MIN_PART_SIZE = 5 * 2**20
+MAX_PART_SIZE = 5 * 2**30
+MAX_PARTS = 10000
+DEFAULT_PART_SIZE = 64 * 2**20
+
+PART_URL_EXPIRES = timedelta(hours=6)
+MAX_PART_URLS = 1000
+
+
+logger = logging.getLogger(__name__)
+
+
+def plan_part_size(total_size: int, requested: Optional[int] = None) -> int:
+    """Requested (or default) part size, clamped to S3 limits and grown until the upload fits in MAX_PARTS."""
+    part_size = min(max(requested or DEFAULT_PART_SIZE, MIN_PART_SIZE), MAX_PART_SIZE)
+    return max(part_size, math.ceil(total_size / MAX_PARTS))
+
+
+def start_session(user, file_name: str, total_size: int, device_id: str = "", part_size: Optional[int] = None) -> UploadSession:
+    """Register the backup and initiate a multipart upload of its original."""
+    file_name = Path(file_name).name
+    part_size = plan_part_size(total_size, part_size)
+    ensure_original_bucket()
+
+    with transaction.atomic():
+        backup = Backup.objects.create(user=user, original_file_name=file_name, device_id=device_id, size_bytes=total_size)
+        backup.original_minio_path = original_key(backup.id, file_name)
+        backup.save(update_fields=["original_minio_path"])
+
+        upload_id = get_storage().create_multipart(ORIGINAL_BUCKET_NAME, backup.original_minio_path)
+        return UploadSession.objects.create(
+            user=user,
+            backup=backup,
+            object_key=backup.original_minio_path,
+            upload_id=upload_id,
+            file_name=file_name,
+            total_size=total_size,
+            part_size=part_size,
+            part_count=max(1, math.ceil(total_size / part_size)),
+        )
+
+
+def _require_active(session: UploadSession) -> None:
+    if session.status != "active":
+        raise ValidationError({"error": f"Upload session is {session.status}."})
+
+
+def presign_parts(session: UploadSession, part_numbers: Iterable[int]) -> Dict[int, str]:
+    """Presigned PUT URLs the client uploads each part to directly; bytes never pass through Django."""
+    _require_active(session)
+    storage = get_storage()
+    urls = {}
+    for number in part_numbers:
+        if not 1 <= number <= session.part_count:
+            raise ValidationError({"part_numbers": f"Part numbers must be between 1 and {session.part_count}."})
+        urls[number] = storage.presign_part(
+            ORIGINAL_BUCKET_NAME, session.object_key, session.upload_id, number, PART_URL_EXPIRES
+        )
+    return urls
+
+
+def uploaded_parts(session: UploadSession) -> List[UploadedPart]:
+    """Parts storage already holds for the session, used to resume and to complete."""
+    return get_storage().list_parts(ORIGINAL_BUCKET_NAME, session.object_key, session.upload_id)
+
+
+def _expected_size(session: UploadSession, number: int) -> int:
+    if number < session.part_count:
+        return session.part_size
+    return session.total_size - session.part_size * (session.part_count - 1)
+
+
+def complete_session(session: UploadSession) -> Backup:
+    """Stitch the uploaded parts together and hand the backup to the processing pipeline."""
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        _require_active(session)
+        parts = {part.part_number: part for part in uploaded_parts(session)}
+
+        numbers = range(1, session.part_count + 1)
+        missing = [n for n in numbers if n not in parts]
+        if missing:
+            raise ValidationError({"missing_parts": missing})
+        wrong = [n for n in numbers if parts[n].size != _expected_size(session, n)]
+        if wrong:
+            raise ValidationError({"wrong_size_parts": wrong})
+
+        get_storage().complete_multipart(
+            ORIGINAL_BUCKET_NAME, session.object_key, session.upload_id, [(n, parts[n].etag) for n in numbers]
+        )
+        session.status = "completed"
+        session.completed_at = timezone.now()
+        session.save(update_fields=["status", "completed_at"])
+
+        backup_id, size_bytes = session.backup_id, session.total_size
+        transaction.on_commit(lambda: enqueue_backup_processing(backup_id, size_bytes))
+    return session.backup
+
+
+def abort_session(session: UploadSession) -> None:
+    _require_active(session)
+    try:
+        get_storage().abort_multipart(ORIGINAL_BUCKET_NAME, session.object_key, session.upload_id)
+    except Exception as e:
+        logger.warning("Could not abort multipart upload %s: %s", session.upload_id, e)
+    session.status = "aborted"
+    session.save(update_fields=["status"])
+    Backup.objects.filter(pk=session.backup_id).update(error_message="Upload aborted.")
@@ -4,7 +4,15 @@ from . import views
 
 urlpatterns = [
     path('upload/', views.BackupUploadView.as_view(), name='upload-backup'),
+    path('uploads/', views.UploadSessionCreateView.as_view(), name='upload-session-create'),
+    path('uploads/<int:session_id>/', views.UploadSessionDetailView.as_view(), name='upload-session-detail'),
+    path('uploads/<int:session_id>/parts/', views.UploadSessionPartURLsView.as_view(), name='upload-session-parts'),
+    path('uploads/<int:session_id>/complete/', views.UploadSessionCompleteView.as_view(), name='upload-session-complete'),
+    path('contact-search/', views.ContactSearchAPIView.as_view(), name='contact-search'),
+    path('app-permissions/', views.AppPermissionListAPIView.as_view(), name='app-permissions'),
+    path('permission-histogram/', views.PermissionHistogramView.as_view(), name='permission-histogram'),
     path('<int:pk>/status/', views.BackupStatusView.as_view(), name='backup-status'),
+    path('<int:pk>/summary/', views.BackupSummaryView.as_view(), name='backup-summary'),
     path('<int:pk>/parse-photos/', views.ParsePhotosView.as_view(), name='parse_photo'),
     path('<int:pk>/parse-videos/', views.ParseVideosView.as_view(), name='parse_videos'),
     path('<int:pk>/parse-audios/', views.ParseAudiosView.as_view(), name='parse_audios'),
@@ -14,9 +22,19 @@ urlpatterns = [
     path('<int:pk>/parse-contact/', views.ParseContactsAPIView.as_view(), name='parse-contact'),
     path('<int:pk>/parse-calllog/', views.ParseCallLogsAPIView.as_view(), name='parse-calllog'),
     path('<int:pk>/sms-list/', views.MessageListAPIView.as_view(), name='sms-list'),
+    path('<int:pk>/conversations/', views.ConversationListAPIView.as_view(), name='conversation-list'),
+    path('<int:pk>/conversations/<int:conversation_id>/messages/', views.ConversationMessageListAPIView.as_view(), name='conversation-messages'),
+    path('<int:pk>/export/<str:dataset>/', views.ExportDataView.as_view(), name='export-data'),
+    path('<int:pk>/media-zip/', views.MediaArchiveView.as_view(), name='media-zip'),
+    path('<int:pk>/media-urls/', views.MediaSignURLsView.as_view(), name='media-urls'),
+    path('storage/<str:bucket>/<path:key>', views.StorageObjectView.as_view(), name='storage-object'),
+    path('<int:pk>/diff/<int:other_pk>/', views.BackupDiffView.as_view(), name='backup-diff'),
+    path('<int:pk>/timeline/', views.TimelineAPIView.as_view(), name='timeline'),
     path('<int:pk>/media-list/',  views.MediaListAPIView.as_view(), name='media-list'),
     path('<int:pk>/contact-list/', views.ContactListAPIView.as_view(), name='contact-list'),
     path('<int:pk>/calllog-list/', views.CallLogListAPIView.as_view(), name='calllog-list'),
     path('<int:pk>/app-list/', views.AppListAPIView.as_view(), name='app-list'),
+    path('<int:pk>/app-permissions/', views.AppPermissionListAPIView.as_view(), name='backup-app-permissions'),
+    path('<int:pk>/permission-histogram/', views.PermissionHistogramView.as_view(), name='backup-permission-histogram'),
 
 ]
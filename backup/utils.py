@@ -1,40 +1,33 @@
 from pathlib import Path
+import hashlib
 import subprocess
 import tarfile
 import mimetypes
 import re
-from minio import Minio
-from minio.error import S3Error
+import redis
 import tempfile
 import shutil
-import libarchive.public
 import logging
 from decouple import config
 from datetime import datetime, timezone as dt_timezone
 from typing import Dict, Iterable, Optional
+from .storage import StorageError, get_storage
+from .metrics import StageTimer, record_failure
 
 
 
-MINIO_ENDPOINT = config("MINIO_STORAGE_ENDPOINT")
-MINIO_ACCESS_KEY = config("MINIO_STORAGE_ACCESS_KEY")
-MINIO_SECRET_KEY = config("MINIO_STORAGE_SECRET_KEY")
-MINIO_SECURE = config("MINIO_STORAGE_USE_SSL",default=False, cast=bool)
-
-minio_client = Minio(
-    MINIO_ENDPOINT,
-    access_key=MINIO_ACCESS_KEY,
-    secret_key=MINIO_SECRET_KEY,
-    secure=MINIO_SECURE
-)
+# Shared by coordination code (scheduling slots, locks) that needs Redis primitives beyond the cache API.
+redis_client = redis.Redis.from_url(config("REDIS_CACHE_URL", default="redis://redis:6379/1"))
 
 BUCKET_NAME = "backups"
 
+BULK_INSERT_BATCH_SIZE = 1000
+
 
 logger = logging.getLogger(__name__)
 
 def ensure_bucket():
-    if not minio_client.bucket_exists(BUCKET_NAME):
-        minio_client.make_bucket(BUCKET_NAME)
+    get_storage().ensure_bucket(BUCKET_NAME)
 
 INVALID_CHARS = r'[<>:"/\\|?*]'
 
@@ -71,32 +64,43 @@ def categorize_media_file(file_path: Path) -> str:
 def ab_to_tar_with_hoardy(ab_file_path: str) -> Path:
     temp_tar = Path(tempfile.mktemp(suffix=".tar"))
     cmd = ["hoardy-adb", "unwrap", ab_file_path, str(temp_tar)]
-    subprocess.run(cmd, check=True)
+    with StageTimer("unwrap") as stage:
+        subprocess.run(cmd, check=True)
+        stage.bytes = Path(ab_file_path).stat().st_size
     return temp_tar
 
 
 def extract_tar_to_temp(tar_path: Path) -> Path:
+    # Imported here: only processing workers extract archives, every other process skips loading libarchive.
+    import libarchive.public
+
     temp_dir = Path(tempfile.mkdtemp())
-    try:
-        with libarchive.public.file_reader(str(tar_path)) as archive:
-            for entry in archive:
-                try:
+    with StageTimer("extract") as stage:
+        stage.bytes = stage.entries = 0
+        try:
+            with libarchive.public.file_reader(str(tar_path)) as archive:
+                for entry in archive:
+                    try:
 
-                    safe_name = "/".join(sanitize_filename(part) for part in entry.pathname.split("/"))
-                    dest_path = temp_dir / safe_name
-                    dest_path.parent.mkdir(parents=True, exist_ok=True)
+                        safe_name = "/".join(sanitize_filename(part) for part in entry.pathname.split("/"))
+                        dest_path = temp_dir / safe_name
+                        dest_path.parent.mkdir(parents=True, exist_ok=True)
 
 
-                    if entry.size > 0:
-                        with open(dest_path, "wb") as f:
-                            for block in entry.get_blocks():
-                                f.write(block)
+                        if entry.size > 0:
+                            with open(dest_path, "wb") as f:
+                                for block in entry.get_blocks():
+                                    f.write(block)
+                            stage.bytes += entry.size
+                        stage.entries += 1
 
-                except Exception as e:
-                    logger.warning("⚠️ Failed to extract", entry.pathname, e)
+                    except Exception as e:
+                        logger.warning("⚠️ Failed to extract", entry.pathname, e)
+                        record_failure("extract", "entry")
 
-    except Exception as e:
-        logger.error("❌ Failed to open archive:", e)
+        except Exception as e:
+            logger.error("❌ Failed to open archive:", e)
+            record_failure("extract", "archive")
 
     return temp_dir
 
@@ -105,19 +109,26 @@ def extract_tar_to_temp(tar_path: Path) -> Path:
 
 def organize_extracted_files_to_minio(extracted_dir: Path, backup_id: int) -> dict:
     ensure_bucket()
+    storage = get_storage()
     stats = {cat: 0 for cat in MEDIA_CATEGORIES.keys()}
     stats["others"] = 0
-    for file_path in extracted_dir.rglob("*"):
-        if not file_path.is_file():
-            continue
-        category = categorize_media_file(file_path)
-        object_name = f"{backup_id}/{category}/{file_path.name}"
-        try:
-            minio_client.fput_object(BUCKET_NAME, object_name, str(file_path))
-            stats[category] += 1
-            file_path.unlink()  
-        except S3Error as e:
-            logger.error("Failed to upload %s -> %s", file_path, e)
+    with StageTimer("upload") as stage:
+        stage.bytes = stage.entries = 0
+        for file_path in extracted_dir.rglob("*"):
+            if not file_path.is_file():
+                continue
+            category = categorize_media_file(file_path)
+            object_name = f"{backup_id}/{category}/{file_path.name}"
+            try:
+                size = file_path.stat().st_size
+                storage.put_file(BUCKET_NAME, object_name, file_path)
+                stats[category] += 1
+                stage.bytes += size
+                stage.entries += 1
+                file_path.unlink()  
+            except StorageError as e:
+                logger.error("Failed to upload %s -> %s", file_path, e)
+                record_failure("upload", category)
     return stats
 
 def process_ab_file(ab_file_path: str, backup_id: int) -> dict:
@@ -149,6 +160,18 @@ def normalize_phone(value: str) -> str:
     return s
 
 
+def phone_search_key(value: str) -> str:
+    digits = re.sub(r"\D", "", normalize_phone(value))
+    if digits.startswith("98"):
+        return digits[2:]
+    return digits.lstrip("0")
+
+
+def content_hash(*parts) -> str:
+    raw = "\x1f".join("" if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
 def _from_epoch_like(num: float) -> Optional[datetime]:
     try:
         length = len(str(int(num)))
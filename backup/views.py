@@ -1,19 +1,46 @@
 from rest_framework import status, views, generics
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+import time
+import uuid
 from pathlib import Path
 import logging
-from .models import Backup, MediaFile, Message, Contact, CallLog, App
-from .serializers import BackupUploadSerializer, MediaFileSerializer, MessageSerializer, ContactSerializer, CallLogSerializer, AppParserSerializer
+from .models import Backup, MediaFile, Message, Contact, CallLog, App, Conversation, BackupSummary, UploadSession
+from .serializers import BackupUploadSerializer, UploadSessionCreateSerializer, UploadSessionSerializer, ProfileCaptureSerializer, MediaFileSerializer, MessageSerializer, ContactSerializer, CallLogSerializer, AppParserSerializer, ConversationSerializer, BackupSummarySerializer
 from django.shortcuts import get_object_or_404
-from .pagination import StandardResultsSetPagination 
+from .pagination import StandardResultsSetPagination, ConversationPagination, ConversationMessagePagination
 from .parser.media_parser import  parse_media_type_minio
 from .parser.sms_parser import parse_and_save_sms_minio
 from .parser.apk_parser import parse_apks_with_minio
 from .parser.calllog_parser import scan_and_extract_calllogs_minio, store_calllogs
 from .parser.contacts_parser import scan_and_extract_contacts_minio, store_contacts
-from .tasks import process_backup_task
+from .tasks import enqueue_backup_processing
+from .export import EXPORT_DATASETS, EXPORT_FORMATS, stream_export
+from .media_archive import stream_media_zip
+from .signing import sign_objects, current_window
+from .response_cache import VersionedResponseCacheMixin
+from .fast_read import FastListMixin
+from .request_profiling import TimedListMixin, timed_serialization
+from .renderers import FastJSONRenderer
+from .filters import CallLogFilterBackend, MessageFilterBackend
+from .timeline import fetch_timeline, decode_cursor, encode_cursor, seek_cursor
+from .utils import normalize_phone, parse_datetime_flexible
+from .search import search_contacts, SEARCH_MODES, MIN_QUERY_LENGTH
+from .app_permissions import filter_apps_by_permission, permission_histogram
+from .incremental import backup_rows, conversation_messages, rows_missing_from
+from .access import MetricsAccess
+from .admission import check_admission, declared_size
+from .metrics import render as render_metrics
+from .locks import JobInProgress, parse_stage, run_exclusive
+from .profiling import profiled
+from .upload_sessions import MAX_PART_URLS, abort_session, complete_session, presign_parts, start_session, uploaded_parts
+from .storage import LocalStorage, StorageError, get_storage, local_signature
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+from rest_framework.renderers import BrowsableAPIRenderer
 
 
 logger = logging.getLogger(__name__)
@@ -22,6 +49,9 @@ class BackupUploadView(views.APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
+        # Before request.data is touched, so a refused upload is never spooled to disk.
+        check_admission(request.user, declared_size(request))
+
         serializer = BackupUploadSerializer(data=request.data, context={'request': request})
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -32,7 +62,7 @@ class BackupUploadView(views.APIView):
             if not backup.original_minio_path:
                 raise ValueError("Uploaded backup file is missing.")
 
-            process_backup_task.delay(backup.id)
+            enqueue_backup_processing(backup.id, backup.size_bytes)
 
             return Response({
                 "message": "Backup uploaded successfully. Processing will continue in the background.",
@@ -47,6 +77,100 @@ class BackupUploadView(views.APIView):
 
 
 
+class UploadSessionCreateView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        check_admission(request.user, data["size"])
+        if not get_storage().supports_multipart:
+            return Response({"error": "Resumable uploads are not supported by the configured storage."}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        try:
+            session = start_session(request.user, data["file_name"], data["size"], data["device_id"], data.get("part_size"))
+        except StorageError as e:
+            logger.error("Could not start multipart upload: %s", e)
+            return Response({"error": "Storage is unavailable, try again later."}, status=status.HTTP_502_BAD_GATEWAY)
+
+        with timed_serialization():
+            data = UploadSessionSerializer(session).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class UploadSessionDetailView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, session_id):
+        session = get_object_or_404(UploadSession, pk=session_id, user=request.user)
+        with timed_serialization():
+            data = UploadSessionSerializer(session).data
+
+        if session.status == "active":
+            try:
+                parts = uploaded_parts(session)
+            except StorageError as e:
+                logger.error("Could not list parts of upload session %s: %s", session.id, e)
+                return Response({"error": "Storage is unavailable, try again later."}, status=status.HTTP_502_BAD_GATEWAY)
+            data["uploaded_parts"] = [
+                {"part_number": part.part_number, "size": part.size, "etag": part.etag} for part in parts
+            ]
+        return Response(data, status=status.HTTP_200_OK)
+
+    def delete(self, request, session_id):
+        session = get_object_or_404(UploadSession, pk=session_id, user=request.user)
+        abort_session(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadSessionPartURLsView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, session_id):
+        session = get_object_or_404(UploadSession, pk=session_id, user=request.user)
+        numbers = request.data.get("part_numbers")
+
+        if numbers is not None:
+            if not isinstance(numbers, list) or not all(isinstance(n, int) and not isinstance(n, bool) for n in numbers):
+                return Response({"error": "part_numbers must be a list of integers"}, status=status.HTTP_400_BAD_REQUEST)
+            if len(numbers) > MAX_PART_URLS:
+                return Response({"error": f"At most {MAX_PART_URLS} part URLs can be requested at once"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            if numbers is None:
+                # Resume: sign every part MinIO does not hold yet.
+                done = {part.part_number for part in uploaded_parts(session)}
+                numbers = [n for n in range(1, session.part_count + 1) if n not in done][:MAX_PART_URLS]
+            urls = presign_parts(session, numbers)
+        except StorageError as e:
+            logger.error("Could not sign parts of upload session %s: %s", session.id, e)
+            return Response({"error": "Storage is unavailable, try again later."}, status=status.HTTP_502_BAD_GATEWAY)
+        return Response({
+            "part_size": session.part_size,
+            "urls": {str(number): url for number, url in urls.items()},
+        }, status=status.HTTP_200_OK)
+
+
+class UploadSessionCompleteView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, session_id):
+        session = get_object_or_404(UploadSession, pk=session_id, user=request.user)
+
+        try:
+            backup = complete_session(session)
+        except StorageError as e:
+            logger.error("Could not complete upload session %s: %s", session.id, e)
+            return Response({"error": "Storage is unavailable, try again later."}, status=status.HTTP_502_BAD_GATEWAY)
+
+        return Response({
+            "message": "Upload complete. Processing will continue in the background.",
+            "backup_id": backup.id
+        }, status=status.HTTP_200_OK)
+
+
 class BackupStatusView(views.APIView):
     permission_classes = [IsAuthenticated]
 
@@ -54,15 +178,49 @@ class BackupStatusView(views.APIView):
         try:
             backup = Backup.objects.get(pk=pk)
             
-            return Response({
+            data = {
                 "backup_id": backup.id,
                 "processed": backup.processed,
                 "error_message": backup.error_message
-            })
+            }
+            if backup.user_id == request.user.id:
+                with timed_serialization():
+                    data["profiles"] = ProfileCaptureSerializer(backup.profiles.order_by("-started_at"), many=True).data
+            return Response(data)
         except Backup.DoesNotExist:
             return Response({"error": "Backup not found"}, status=404)
 
 
+class BackupSummaryView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        summary = (
+            BackupSummary.objects.defer("interaction_counts")
+            .filter(backup_id=pk, backup__user=request.user)
+            .first()
+        )
+        if summary is None:
+            backup = get_object_or_404(Backup, pk=pk, user=request.user)
+            summary = BackupSummary(backup=backup)
+
+        with timed_serialization():
+            data = BackupSummarySerializer(summary).data
+        return Response(data, status=status.HTTP_200_OK)
+
+
+def _run_parse(request, backup, parser, fn):
+    """
+    Run one parser for the backup: once at a time per backup, profiled on ?profile=true or when
+    the backup asks for it. A duplicate gets 202 with the running job's id (JobRunning) instead of
+    holding a web worker until that job ends.
+    """
+    stage = parse_stage(parser)
+    force = request.query_params.get("profile", "").lower() in ("1", "true", "yes")
+    job = uuid.uuid4().hex
+    return run_exclusive(backup.id, stage, profiled(backup, stage, fn, force=force, job=job), job=job, attach=False)
+
+
 class ParsePhotosView(views.APIView):
     permission_classes = [IsAuthenticated]
 
@@ -79,11 +237,13 @@ class ParsePhotosView(views.APIView):
             )
 
         try:
-            count = parse_media_type_minio(backup, media_type)
+            count = _run_parse(self.request, backup, media_type, lambda: parse_media_type_minio(backup, media_type))
             return Response(
                 {"message": f"{media_type.capitalize()}s parsed successfully", "count": count},
                 status=status.HTTP_200_OK
             )
+        except JobInProgress:
+            raise
         except ValueError as e:
             return Response(
                 {"error": str(e)},
@@ -119,7 +279,12 @@ class ParseSMSBackupView(views.APIView):
         except Backup.DoesNotExist:
             return Response({"error": "Backup not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        total_count = parse_and_save_sms_minio(backup)
+        try:
+            total_count = _run_parse(request, backup, "sms", lambda: parse_and_save_sms_minio(backup))
+        except JobInProgress:
+            raise
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         return Response({
             "message": "SMS files parsed successfully.",
@@ -138,9 +303,11 @@ class ParseApksView(views.APIView):
             return Response({"error": "backup not found"}, status=status.HTTP_404_NOT_FOUND)
 
         try:
-            count = parse_apks_with_minio(backup)
+            count = _run_parse(request, backup, "apk", lambda: parse_apks_with_minio(backup))
             return Response({
                 "message" : f"{count} apks parsed successfully."}, status=status.HTTP_200_OK)
+        except JobInProgress:
+            raise
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -152,16 +319,23 @@ class ParseContactsAPIView(views.APIView):
     def post(self, request, pk):
         backup = get_object_or_404(Backup, pk=pk, user=request.user)
 
-        contacts_data = scan_and_extract_contacts_minio(backup)
+        def parse():
+            contacts_data = scan_and_extract_contacts_minio(backup)
+            return store_contacts(backup, contacts_data) if contacts_data else None
 
-        if not contacts_data:
+        try:
+            contacts_stored = _run_parse(request, backup, "contacts", parse)
+        except JobInProgress:
+            raise
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        if contacts_stored is None:
             return Response(
                 {"error": "No contact data found in Minio backup"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        contacts_stored = store_contacts(backup, contacts_data)
-
         return Response({
             "message": "Parsing complete",
             "contacts_stored": contacts_stored,
@@ -175,16 +349,23 @@ class ParseCallLogsAPIView(views.APIView):
     def post(self, request, pk):
         backup = get_object_or_404(Backup, pk=pk, user=request.user)
         
-        calllogs_data = scan_and_extract_calllogs_minio(backup)
+        def parse():
+            calllogs_data = scan_and_extract_calllogs_minio(backup)
+            return store_calllogs(backup, calllogs_data) if calllogs_data else None
+
+        try:
+            calllogs_stored = _run_parse(request, backup, "calllog", parse)
+        except JobInProgress:
+            raise
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        if not calllogs_data:
+        if calllogs_stored is None:
             return Response({
                 "error": "No Calllog data found in Minio backup"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        calllogs_stored = store_calllogs(backup, calllogs_data)
-
         return Response({
             "message" : "Parsing complete",
             "CallLogs_stored" : calllogs_stored,
@@ -192,11 +373,138 @@ class ParseCallLogsAPIView(views.APIView):
 
 
 
-class MediaListAPIView(generics.ListAPIView):
+class ExportDataView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, dataset):
+        backup = get_object_or_404(Backup, pk=pk, user=request.user)
+
+        if dataset not in EXPORT_DATASETS:
+            return Response(
+                {"error": f"Unknown dataset. Choose one of: {', '.join(EXPORT_DATASETS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        export_format = request.query_params.get("output", "ndjson")
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"Unknown output format. Choose one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        gzip = request.query_params.get("compress") == "gzip"
+        file_name = f"backup-{backup.id}-{dataset}.{export_format}"
+
+        response = StreamingHttpResponse(
+            stream_export(backup, dataset, export_format, gzip=gzip),
+            content_type="application/gzip" if gzip else EXPORT_FORMATS[export_format],
+        )
+        if gzip:
+            file_name += ".gz"
+        response["Content-Disposition"] = f'attachment; filename="{file_name}"'
+        return response
+
+
+
+class MediaArchiveView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        backup = get_object_or_404(Backup, pk=pk, user=request.user)
+        media_type = request.query_params.get("type")
+        ids = request.query_params.get("ids")
+
+        queryset = MediaFile.objects.filter(backup=backup, minio_path__isnull=False)
+
+        if media_type in ["photo", "video", "audio", "document"]:
+            queryset = queryset.filter(media_type=media_type)
+
+        if ids:
+            try:
+                queryset = queryset.filter(id__in=[int(i) for i in ids.split(",") if i.strip()])
+            except ValueError:
+                return Response({"error": "ids must be a comma separated list of integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        media_files = queryset.only("id", "minio_path", "added_at").order_by("id").iterator(chunk_size=500)
+
+        response = StreamingHttpResponse(stream_media_zip(media_files), content_type="application/zip")
+        response["Content-Disposition"] = f'attachment; filename="backup-{backup.id}-{media_type or "media"}.zip"'
+        return response
+
+
+
+MAX_SIGN_IDS = 500
+
+
+class MediaSignURLsView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        backup = get_object_or_404(Backup, pk=pk, user=request.user)
+        ids = request.data.get("ids")
+
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return Response({"error": "ids must be a list of integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > MAX_SIGN_IDS:
+            return Response({"error": f"At most {MAX_SIGN_IDS} ids can be signed at once"}, status=status.HTTP_400_BAD_REQUEST)
+
+        paths = dict(
+            MediaFile.objects.filter(backup=backup, id__in=ids, minio_path__isnull=False)
+            .values_list("id", "minio_path")
+        )
+        urls = sign_objects(paths.values())
+
+        return Response({
+            "urls": {str(media_id): urls.get(path) for media_id, path in paths.items()}
+        }, status=status.HTTP_200_OK)
+
+
+class MetricsView(views.APIView):
+    """Prometheus scrape target, for internal networks or holders of the metrics token."""
+    authentication_classes = []
+    permission_classes = [MetricsAccess]
+
+    def get(self, request):
+        return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class StorageObjectView(views.APIView):
+    """Target of presigned URLs when objects live on the local filesystem engine."""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request, bucket, key):
+        storage = get_storage()
+        if not isinstance(storage, LocalStorage):
+            raise Http404
+
+        try:
+            expires_at = int(request.query_params.get("expires", ""))
+        except ValueError:
+            return Response({"error": "Invalid signature"}, status=status.HTTP_403_FORBIDDEN)
+        signature = request.query_params.get("signature", "")
+        if not constant_time_compare(signature, local_signature(bucket, key, expires_at)):
+            return Response({"error": "Invalid signature"}, status=status.HTTP_403_FORBIDDEN)
+        if expires_at < time.time():
+            return Response({"error": "URL has expired"}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            path = storage.local_path(bucket, key)
+            # FileResponse hands the open file to the server's wsgi.file_wrapper (sendfile where supported).
+            return FileResponse(open(path, "rb"), filename=path.name)
+        except (StorageError, FileNotFoundError, IsADirectoryError):
+            raise Http404
+
+
+
+class MediaListAPIView(VersionedResponseCacheMixin, TimedListMixin, generics.ListAPIView):
     serializer_class = MediaFileSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
 
+    def get_response_cache_variant(self):
+        return str(current_window())
+
     def get_queryset(self):
         user = self.request.user
         pk = self.kwargs.get("pk")
@@ -213,9 +521,11 @@ class MediaListAPIView(generics.ListAPIView):
 
 
 
-class MessageListAPIView(generics.ListAPIView):
+class MessageListAPIView(VersionedResponseCacheMixin, FastListMixin, generics.ListAPIView):
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    filter_backends = [MessageFilterBackend]
     pagination_class = StandardResultsSetPagination
 
     def get_queryset(self):
@@ -224,15 +534,133 @@ class MessageListAPIView(generics.ListAPIView):
 
         backup = get_object_or_404(Backup, pk=pk, user=user)
 
-        queryset = Message.objects.filter(backup=backup)
+        queryset = backup_rows(Message, backup)
 
         return queryset.order_by('created_at')
 
 
 
-class ContactListAPIView(generics.ListAPIView):
+class ConversationListAPIView(VersionedResponseCacheMixin, TimedListMixin, generics.ListAPIView):
+    serializer_class = ConversationSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ConversationPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        pk = self.kwargs.get("pk")
+
+        backup = get_object_or_404(Backup, pk=pk, user=user)
+
+        return Conversation.objects.filter(backup=backup)
+
+
+
+class ConversationMessageListAPIView(VersionedResponseCacheMixin, TimedListMixin, generics.ListAPIView):
+    serializer_class = MessageSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ConversationMessagePagination
+
+    def get_queryset(self):
+        user = self.request.user
+        pk = self.kwargs.get("pk")
+        conversation_id = self.kwargs.get("conversation_id")
+
+        conversation = get_object_or_404(Conversation, pk=conversation_id, backup_id=pk, backup__user=user)
+
+        return conversation_messages(conversation)
+
+
+
+class TimelineAPIView(views.APIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    default_page_size = 50
+    max_page_size = 200
+
+    def get(self, request, pk):
+        backup = get_object_or_404(Backup, pk=pk, user=request.user)
+        params = request.query_params
+
+        order = params.get("order", "desc")
+        if order not in ("asc", "desc"):
+            return Response({"error": "order must be 'asc' or 'desc'"}, status=status.HTTP_400_BAD_REQUEST)
+        descending = order == "desc"
+
+        try:
+            page_size = min(int(params.get("page_size", self.default_page_size)), self.max_page_size)
+        except ValueError:
+            return Response({"error": "page_size must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if page_size < 1:
+            return Response({"error": "page_size must be positive"}, status=status.HTTP_400_BAD_REQUEST)
+
+        cursor = None
+        if params.get("cursor"):
+            cursor = decode_cursor(params["cursor"])
+        elif params.get("at"):
+            at = parse_datetime_flexible(params["at"])
+            if at is None:
+                return Response({"error": "at must be an ISO 8601 datetime or a unix timestamp"}, status=status.HTTP_400_BAD_REQUEST)
+            cursor = seek_cursor(at, descending)
+
+        events, next_cursor = fetch_timeline(
+            backup, cursor, page_size, descending=descending, phone=normalize_phone(params.get("phone"))
+        )
+
+        next_url = None
+        if next_cursor is not None:
+            next_url = remove_query_param(request.build_absolute_uri(), "at")
+            next_url = replace_query_param(next_url, "cursor", encode_cursor(next_cursor))
+
+        return Response({"next": next_url, "results": events}, status=status.HTTP_200_OK)
+
+
+
+class ContactSearchAPIView(views.APIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request):
+        query = (request.query_params.get("q") or "").strip()
+        mode = request.query_params.get("mode", "prefix")
+        backup_id = request.query_params.get("backup")
+
+        if len(query) < MIN_QUERY_LENGTH:
+            return Response({"error": f"q must be at least {MIN_QUERY_LENGTH} characters"}, status=status.HTTP_400_BAD_REQUEST)
+        if mode not in SEARCH_MODES:
+            return Response({"error": "mode must be 'prefix' or 'substring'"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get("limit", self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Contact.objects.filter(backup__user=request.user)
+        if backup_id:
+            if not backup_id.isdigit():
+                return Response({"error": "backup must be an integer id"}, status=status.HTTP_400_BAD_REQUEST)
+            backup = get_object_or_404(Backup, pk=backup_id, user=request.user)
+            queryset = backup_rows(Contact, backup)
+
+        results = search_contacts(queryset, query, mode=mode, limit=max(limit, 1))
+        if backup_id:
+            for row in results:
+                row["backup_id"] = backup.id
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+
+class RequestedBackupMixin:
+    """Rows shared with an earlier backup of the device belong to it; lists report the backup that was asked for."""
+
+    def get_fast_overrides(self):
+        return {"backup": self.kwargs["pk"]}
+
+
+class ContactListAPIView(VersionedResponseCacheMixin, RequestedBackupMixin, FastListMixin, generics.ListAPIView):
     serializer_class = ContactSerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     pagination_class = StandardResultsSetPagination
 
     def get_queryset(self):
@@ -241,15 +669,17 @@ class ContactListAPIView(generics.ListAPIView):
 
         backup = get_object_or_404(Backup, pk=pk, user=user)
 
-        queryset = Contact.objects.filter(backup=backup)
+        queryset = backup_rows(Contact, backup)
 
         return queryset.order_by('created_at')
     
 
 
-class CallLogListAPIView(generics.ListAPIView):
+class CallLogListAPIView(VersionedResponseCacheMixin, RequestedBackupMixin, FastListMixin, generics.ListAPIView):
     serializer_class = CallLogSerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    filter_backends = [CallLogFilterBackend]
     pagination_class = StandardResultsSetPagination
 
     def get_queryset(self):
@@ -258,16 +688,17 @@ class CallLogListAPIView(generics.ListAPIView):
 
         backup = get_object_or_404(Backup, pk=pk, user=user)
 
-        queryset = CallLog.objects.filter(backup=backup)
+        queryset = backup_rows(CallLog, backup)
 
         return queryset.order_by('created_at')
     
 
 
 
-class AppListAPIView(generics.ListAPIView):
+class AppListAPIView(VersionedResponseCacheMixin, FastListMixin, generics.ListAPIView):
     serializer_class = AppParserSerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     pagination_class = StandardResultsSetPagination
 
     def get_queryset(self):
@@ -278,4 +709,77 @@ class AppListAPIView(generics.ListAPIView):
 
         queryset = App.objects.filter(backup=backup)
 
-        return queryset.order_by('created_at')
\ No newline at end of file
+        return queryset.order_by('created_at')
+
+
+
+class AppPermissionListAPIView(FastListMixin, generics.ListAPIView):
+    serializer_class = AppParserSerializer
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    pagination_class = StandardResultsSetPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        pk = self.kwargs.get("pk")
+        permission = self.request.query_params.get("permission")
+
+        if not permission:
+            raise ValidationError({"permission": "This query parameter is required."})
+
+        if pk is not None:
+            backup = get_object_or_404(Backup, pk=pk, user=user)
+            queryset = App.objects.filter(backup=backup)
+        else:
+            queryset = App.objects.filter(backup__user=user)
+
+        return filter_apps_by_permission(queryset, permission).order_by('backup_id', 'id')
+
+
+
+class PermissionHistogramView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk=None):
+        if pk is not None:
+            get_object_or_404(Backup, pk=pk, user=request.user)
+
+        return Response({
+            "results": permission_histogram(request.user.id, backup_id=pk)
+        }, status=status.HTTP_200_OK)
+
+
+
+DIFF_DATASETS = ("messages", "contacts", "calllogs")
+
+
+class BackupDiffView(views.APIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    default_limit = 100
+    max_limit = 1000
+
+    def get(self, request, pk, other_pk):
+        backup = get_object_or_404(Backup, pk=pk, user=request.user)
+        other = get_object_or_404(Backup, pk=other_pk, user=request.user)
+
+        dataset = request.query_params.get("dataset", "messages")
+        if dataset not in DIFF_DATASETS:
+            return Response({"error": f"dataset must be one of: {', '.join(DIFF_DATASETS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get("limit", self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        model, fields = EXPORT_DATASETS[dataset]
+        added = rows_missing_from(model, backup.id, other.id)
+        removed = rows_missing_from(model, other.id, backup.id)
+
+        return Response({
+            "dataset": dataset,
+            "backup_id": backup.id,
+            "compared_to": other.id,
+            "added_count": added.count(),
+            "removed_count": removed.count(),
+            "added": list(added.order_by("id").values(*fields)[:max(limit, 0)]),
+        }, status=status.HTTP_200_OK)
@@ -17,12 +17,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'backup',
     'rest_framework',
 ]
 
 
 MIDDLEWARE = [
+    'backup.request_profiling.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -93,6 +95,55 @@ REST_FRAMEWORK = {
 
 
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_CACHE_URL', default='redis://redis:6379/1'),
+    }
+}
+
+
+
+# Backup processing is routed by original size: small backups never wait behind a large one,
+# and within a queue smaller backups carry a higher Redis priority.
+BACKUP_SMALL_QUEUE = 'small'
+BACKUP_LARGE_QUEUE = 'large'
+BACKUP_LARGE_THRESHOLD_BYTES = config('BACKUP_LARGE_THRESHOLD_BYTES', default=1024 ** 3, cast=int)
+BACKUP_USER_CONCURRENCY = config('BACKUP_USER_CONCURRENCY', default=2, cast=int)
+
+# Uploads are refused with 503 (system-wide limits) or 429 (per-user limits, overridable
+# per user with UploadQuota) plus Retry-After instead of queueing without bound.
+ADMISSION_MAX_QUEUE_DEPTH = config('ADMISSION_MAX_QUEUE_DEPTH', default=500, cast=int)
+ADMISSION_MAX_INFLIGHT_BYTES = config('ADMISSION_MAX_INFLIGHT_BYTES', default=200 * 1024 ** 3, cast=int)
+ADMISSION_MAX_SCRATCH_USAGE = config('ADMISSION_MAX_SCRATCH_USAGE', default=0.9, cast=float)
+ADMISSION_USER_MAX_PENDING_BACKUPS = config('ADMISSION_USER_MAX_PENDING_BACKUPS', default=20, cast=int)
+ADMISSION_USER_MAX_PENDING_BYTES = config('ADMISSION_USER_MAX_PENDING_BYTES', default=50 * 1024 ** 3, cast=int)
+ADMISSION_RETRY_AFTER_SECONDS = config('ADMISSION_RETRY_AFTER_SECONDS', default=60, cast=int)
+
+# Client networks (CIDR) trusted as internal, e.g. the Prometheus host. /metrics answers only these,
+# or requests sending `Authorization: Bearer <METRICS_BEARER_TOKEN>` when a token is set.
+INTERNAL_NETWORKS = config('INTERNAL_NETWORKS', cast=Csv(), default='127.0.0.1/32,::1/128')
+METRICS_BEARER_TOKEN = config('METRICS_BEARER_TOKEN', default='')
+
+# Per-request SQL/serializer/storage profiling: 'off', 'header' (requests sending X-Profile-Request: 1
+# from INTERNAL_NETWORKS or staff users) or 'always'. Results go to Server-Timing and `manage.py slow_endpoints`.
+REQUEST_PROFILING = config('REQUEST_PROFILING', default='off')
+REQUEST_PROFILING_SLOW_MS = config('REQUEST_PROFILING_SLOW_MS', default=500, cast=int)
+
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+
+
+
+# Where originals, extracted files and media live: MinIO, or a directory on this machine
+# ('backup.storage.LocalStorage') for single-node deployments, tests and benchmarks.
+BACKUP_STORAGE_ENGINE = config('BACKUP_STORAGE_ENGINE', default='backup.storage.MinioStorage')
+BACKUP_STORAGE_ROOT = config('BACKUP_STORAGE_ROOT', default=str(BASE_DIR / 'storage'))
+
 DEFAULT_FILE_STORAGE = 'minio_storage.storage.MinioMediaStorage'
 MINIO_STORAGE_ENDPOINT = config('MINIO_STORAGE_ENDPOINT', default='minio:9000')
 MINIO_STORAGE_ACCESS_KEY = config('MINIO_STORAGE_ACCESS_KEY', default='minio')